@@ -17,3 +17,39 @@ __title__ = "labkey"
 __version__ = "3.0.0"
 __author__ = "LabKey"
 __license__ = "Apache License 2.0"
+
+# Submodules are imported on first access, e.g. "import labkey; labkey.query.select_rows(...)", so that "import labkey"
+# does not pay for modules that are never used.
+_SUBMODULES = {
+    "api_wrapper",
+    "circuit_breaker",
+    "container",
+    "deadline",
+    "diff",
+    "domain",
+    "exceptions",
+    "experiment",
+    "inference",
+    "instrumentation",
+    "profiling",
+    "query",
+    "security",
+    "server_context",
+    "storage",
+    "throttle",
+    "transport",
+    "utils",
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        import importlib
+
+        return importlib.import_module("." + name, __name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
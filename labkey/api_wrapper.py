@@ -1,10 +1,54 @@
-from .container import ContainerWrapper
-from .domain import DomainWrapper
-from .experiment import ExperimentWrapper
-from .query import QueryWrapper
-from .security import SecurityWrapper
-from .storage import StorageWrapper
-from .server_context import ServerContext
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .container import ContainerWrapper
+    from .domain import DomainWrapper
+    from .experiment import ExperimentWrapper
+    from .query import QueryWrapper
+    from .security import SecurityWrapper
+    from .storage import StorageWrapper
+    from .server_context import ServerContext
+
+# The API modules, and requests via ServerContext, are only imported once they are used so that importing APIWrapper
+# stays cheap for short-lived scripts.
+_LAZY_ATTRIBUTES = {
+    "ContainerWrapper": ".container",
+    "DomainWrapper": ".domain",
+    "ExperimentWrapper": ".experiment",
+    "QueryWrapper": ".query",
+    "SecurityWrapper": ".security",
+    "StorageWrapper": ".storage",
+    "ServerContext": ".server_context",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __package__), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazyWrapper:
+    """
+    Creates an API wrapper the first time it is accessed on an APIWrapper instance, importing its module then.
+    """
+
+    def __init__(self, wrapper_name: str):
+        self.wrapper_name = wrapper_name
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        wrapper = __getattr__(self.wrapper_name)(instance.server_context)
+        # Cache on the instance, later lookups no longer reach this descriptor
+        instance.__dict__[self.name] = wrapper
+        return wrapper
 
 
 class APIWrapper:
@@ -13,6 +57,13 @@ class APIWrapper:
     the supported API methods without having to manually pass around a ServerContext object.
     """
 
+    container: "ContainerWrapper" = _LazyWrapper("ContainerWrapper")
+    domain: "DomainWrapper" = _LazyWrapper("DomainWrapper")
+    experiment: "ExperimentWrapper" = _LazyWrapper("ExperimentWrapper")
+    query: "QueryWrapper" = _LazyWrapper("QueryWrapper")
+    security: "SecurityWrapper" = _LazyWrapper("SecurityWrapper")
+    storage: "StorageWrapper" = _LazyWrapper("StorageWrapper")
+
     def __init__(
         self,
         domain,
@@ -22,7 +73,14 @@ class APIWrapper:
         verify_ssl=True,
         api_key=None,
         disable_csrf=False,
+        http2=False,
+        transport=None,
+        throttle=None,
+        circuit_breaker=None,
+        coalesce_reads=False,
     ):
+        from .server_context import ServerContext
+
         self.server_context = ServerContext(
             domain=domain,
             container_path=container_path,
@@ -31,10 +89,9 @@ class APIWrapper:
             verify_ssl=verify_ssl,
             api_key=api_key,
             disable_csrf=disable_csrf,
+            http2=http2,
+            transport=transport,
+            throttle=throttle,
+            circuit_breaker=circuit_breaker,
+            coalesce_reads=coalesce_reads,
         )
-        self.container = ContainerWrapper(self.server_context)
-        self.domain = DomainWrapper(self.server_context)
-        self.experiment = ExperimentWrapper(self.server_context)
-        self.query = QueryWrapper(self.server_context)
-        self.security = SecurityWrapper(self.server_context)
-        self.storage = StorageWrapper(self.server_context)
@@ -0,0 +1,122 @@
+"""
+Circuit breaker for ServerContext. After failure_threshold consecutive requests fail because the server could not be
+reached, timed out, or answered with a 5xx status, the breaker opens and requests fail immediately with a
+CircuitOpenError instead of each waiting for its timeout. Once reset_timeout seconds have passed, the next request
+first probes the server with a cheap whoami.api request, and the breaker closes again if the server answers:
+
+    from labkey.circuit_breaker import CircuitBreaker
+
+    api = APIWrapper("example.com", "project", circuit_breaker=CircuitBreaker(failure_threshold=5))
+"""
+import threading
+import time
+
+from .exceptions import CircuitOpenError
+
+
+class CircuitState:
+    """
+    Enum of circuit breaker states
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_reset_timeout: float = 300.0,
+        probe_timeout: float = 5.0,
+    ):
+        """
+        :param failure_threshold: consecutive failed requests that open the breaker
+        :param reset_timeout: seconds the breaker stays open before probing the server
+        :param max_reset_timeout: each failed probe doubles the time until the next one, up to this many seconds
+        :param probe_timeout: timeout in seconds of the whoami.api probe
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._open_for = reset_timeout
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def retry_in(self) -> float:
+        """
+        Seconds until the server is probed again, 0 if the breaker is not open.
+        """
+        if self.state != CircuitState.OPEN:
+            return 0.0
+
+        return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def _open(self):
+        self.state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+
+    def before_request(self, server_context):
+        """
+        Raises CircuitOpenError if the breaker is open. Probes the server first if the breaker has been open for long
+        enough, only one thread probes at a time while the others keep failing fast.
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return
+
+            if self.state == CircuitState.HALF_OPEN or self.retry_in > 0:
+                raise CircuitOpenError(server_context, self.failures, self.retry_in)
+
+            self.state = CircuitState.HALF_OPEN
+
+        healthy = False
+
+        try:
+            healthy = server_context._probe(self.probe_timeout)
+        finally:
+            # Also reached when the probe raises, e.g. the transport fails with an unexpected error, so the breaker
+            # never stays half open
+            with self._lock:
+                if healthy:
+                    self.state = CircuitState.CLOSED
+                    self.failures = 0
+                    self._open_for = self.reset_timeout
+                else:
+                    self._open_for = min(self._open_for * 2, self.max_reset_timeout)
+                    self._open()
+
+        if not healthy:
+            raise CircuitOpenError(server_context, self.failures, self.retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+            if self.state == CircuitState.CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def reset(self):
+        """
+        Closes the breaker.
+        """
+        with self._lock:
+            self.state = CircuitState.CLOSED
+            self.failures = 0
+            self._open_for = self.reset_timeout
+
+    def __repr__(self):
+        return "<CircuitBreaker [{} failures={}]>".format(self.state, self.failures)
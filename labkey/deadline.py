@@ -0,0 +1,106 @@
+"""
+Deadlines for groups of requests. Every request made inside a deadline block, on the same thread or asyncio task, has
+its timeout shortened to the time left, and once the deadline has passed requests fail right away with a
+DeadlineExceededError instead of being sent:
+
+    from labkey.deadline import deadline
+
+    with deadline(30):
+        for row in api.query.iter_rows("lists", "Samples"):
+            ...
+
+Time a request spends waiting for a Throttle counts against the deadline. Requests that run out of time are not
+counted as server failures by a CircuitBreaker, and don't make a Throttle back off. Request listeners see them fail
+with a DeadlineExceededError.
+
+Deadlines nest, an inner block can only shorten the deadline. query.iter_rows and query.QueryBatcher keep the deadline
+that was active when they were created, so pages fetched and batches flushed later (or from the batcher's timer
+thread) still respect it.
+
+Because timeouts limit how long the client waits to connect and between bytes received, a response that keeps
+trickling in can finish slightly after the deadline.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from .exceptions import DeadlineExceededError
+
+# Absolute time.monotonic() deadline, or None
+_deadline: ContextVar[Optional[float]] = ContextVar("labkey_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Requests made inside the with block must finish within seconds.
+    """
+    with deadline_at(time.monotonic() + seconds):
+        yield
+
+
+@contextmanager
+def deadline_at(at: Optional[float]):
+    """
+    Like deadline, but takes an absolute time.monotonic() value as returned by current(). None leaves the current
+    deadline unchanged.
+    """
+    current_at = _deadline.get()
+
+    if at is None or (current_at is not None and current_at <= at):
+        yield
+        return
+
+    token = _deadline.set(at)
+
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current() -> Optional[float]:
+    """
+    :return: the active deadline as a time.monotonic() value, None if there is no deadline
+    """
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """
+    :return: seconds left until the active deadline, None if there is no deadline
+    """
+    at = _deadline.get()
+
+    if at is None:
+        return None
+
+    return at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def limit_timeout(timeout):
+    """
+    Shortens a request timeout, either seconds or a (connect, read) tuple, to the time left until the active deadline.
+    :raises DeadlineExceededError: if the deadline has passed
+    """
+    left = remaining()
+
+    if left is None:
+        return timeout
+
+    if left <= 0:
+        raise DeadlineExceededError()
+
+    if timeout is None:
+        return left
+
+    if isinstance(timeout, (tuple, list)):
+        return tuple(left if t is None else min(t, left) for t in timeout)
+
+    return min(timeout, left)
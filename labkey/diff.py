@@ -0,0 +1,253 @@
+"""
+Compare two sets of query rows, e.g. yesterday's export of a query with today's, in bounded memory.
+
+Rows can come from query.iter_rows, from a select_rows response, or from a snapshot file written by write_snapshot:
+
+    from labkey import diff
+
+    diff.write_snapshot(api.query.iter_rows("lists", "Samples", sort="Key"), "samples.jsonl.gz")
+    ...
+    old_rows = diff.read_snapshot("samples.jsonl.gz")
+    new_rows = api.query.iter_rows("lists", "Samples", sort="Key")
+
+    for change in diff.diff_rows(old_rows, new_rows, key="Key", presorted=True):
+        print(change.change_type, change.key)
+
+presorted=True compares keys with Python's ordering, so it only suits keys the server sorts the same way: numbers, or
+text when the database collation orders by code point. Many databases sort text case-insensitively ("b" before "C"),
+leave presorted off for text keys unless you are sure of the collation.
+"""
+import gzip
+import json
+import os
+import tempfile
+import zlib
+from collections.abc import Mapping
+from typing import Iterable, Iterator, List, Union
+
+from .utils import json_dumps
+
+
+class ChangeType:
+    """
+    Enum of row change types
+    """
+
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+
+
+class RowChange:
+    def __init__(self, change_type: str, key: any, old_row: dict = None, new_row: dict = None):
+        self.change_type = change_type
+        self.key = key
+        self.old_row = old_row
+        self.new_row = new_row
+
+    @property
+    def changed_columns(self) -> List[str]:
+        if self.old_row is None or self.new_row is None:
+            return []
+
+        columns = dict.fromkeys(list(self.old_row) + list(self.new_row))
+        return [c for c in columns if self.old_row.get(c) != self.new_row.get(c)]
+
+    def __eq__(self, other):
+        if not isinstance(other, RowChange):
+            return NotImplemented
+
+        return (self.change_type, self.key, self.old_row, self.new_row) == (
+            other.change_type,
+            other.key,
+            other.old_row,
+            other.new_row,
+        )
+
+    def __repr__(self):
+        return "<RowChange [{} {}]>".format(self.change_type, self.key)
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+
+    return open(path, mode, encoding="utf-8")
+
+
+def write_snapshot(rows: Iterable[Mapping], path: str) -> int:
+    """
+    Writes rows to a JSON lines file, one row per line. Paths ending in ".gz" are gzip compressed.
+    :param rows: rows to write, e.g. from query.iter_rows
+    :param path: file to write
+    :return: number of rows written
+    """
+    count = 0
+
+    with _open(path, "w") as f:
+        for row in rows:
+            f.write(json_dumps(dict(row)) + "\n")
+            count += 1
+
+    return count
+
+
+def read_snapshot(path: str) -> Iterator[dict]:
+    """
+    Iterates over the rows of a snapshot file written by write_snapshot.
+    :param path: file to read
+    :return: iterator of rows
+    """
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _key_getter(key: Union[str, List[str]]):
+    if isinstance(key, str):
+        return lambda row: row[key]
+
+    columns = list(key)
+    return lambda row: tuple(row[c] for c in columns)
+
+
+def _normalize(row: Mapping, ignore_columns: set) -> dict:
+    # Round trip through json so rows read from a snapshot compare equal to rows fresh from the server
+    row = json.loads(json_dumps(dict(row)))
+
+    for column in ignore_columns:
+        row.pop(column, None)
+
+    return row
+
+
+def _compare(key, old_row, new_row):
+    if old_row != new_row:
+        return RowChange(ChangeType.CHANGED, key, old_row, new_row)
+
+    return None
+
+
+def _merge_diff(old_rows, new_rows, get_key, ignore_columns):
+    def keyed(rows, label):
+        first = True
+        previous = None
+
+        for row in rows:
+            row = _normalize(row, ignore_columns)
+            key = get_key(row)
+
+            if not first and key <= previous:
+                raise ValueError(
+                    "{} rows are not sorted by key with unique values: {} followed by {}. Text keys sorted by "
+                    "the server may use a different collation, pass presorted=False to compare them.".format(
+                        label, previous, key
+                    )
+                )
+
+            first = False
+            previous = key
+            yield key, row
+
+    old_iter = keyed(old_rows, "Old")
+    new_iter = keyed(new_rows, "New")
+    old = next(old_iter, None)
+    new = next(new_iter, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield RowChange(ChangeType.REMOVED, old[0], old_row=old[1])
+            old = next(old_iter, None)
+        elif old is None or new[0] < old[0]:
+            yield RowChange(ChangeType.ADDED, new[0], new_row=new[1])
+            new = next(new_iter, None)
+        else:
+            change = _compare(old[0], old[1], new[1])
+
+            if change is not None:
+                yield change
+
+            old = next(old_iter, None)
+            new = next(new_iter, None)
+
+
+def _partition(rows, get_key, ignore_columns, directory, prefix, partitions):
+    files = [
+        open(os.path.join(directory, "{}-{}.jsonl".format(prefix, i)), "w", encoding="utf-8")
+        for i in range(partitions)
+    ]
+
+    try:
+        for row in rows:
+            row = _normalize(row, ignore_columns)
+            encoded_key = json_dumps(get_key(row))
+            partition = zlib.crc32(encoded_key.encode("utf-8")) % partitions
+            files[partition].write(json_dumps(row) + "\n")
+    finally:
+        for f in files:
+            f.close()
+
+    return [f.name for f in files]
+
+
+def _hashed_diff(old_rows, new_rows, get_key, ignore_columns, partitions):
+    with tempfile.TemporaryDirectory(prefix="labkey-diff-") as directory:
+        old_files = _partition(old_rows, get_key, ignore_columns, directory, "old", partitions)
+        new_files = _partition(new_rows, get_key, ignore_columns, directory, "new", partitions)
+
+        for old_file, new_file in zip(old_files, new_files):
+            # Only one partition of the old rows is held in memory at a time
+            old_by_key = {}
+
+            for row in read_snapshot(old_file):
+                old_by_key[json_dumps(get_key(row))] = row
+
+            for new_row in read_snapshot(new_file):
+                key = get_key(new_row)
+                old_row = old_by_key.pop(json_dumps(key), None)
+
+                if old_row is None:
+                    yield RowChange(ChangeType.ADDED, key, new_row=new_row)
+                else:
+                    change = _compare(key, old_row, new_row)
+
+                    if change is not None:
+                        yield change
+
+            for old_row in old_by_key.values():
+                yield RowChange(ChangeType.REMOVED, get_key(old_row), old_row=old_row)
+
+
+def diff_rows(
+    old_rows: Iterable[Mapping],
+    new_rows: Iterable[Mapping],
+    key: Union[str, List[str]],
+    presorted: bool = False,
+    ignore_columns: List[str] = None,
+    partitions: int = 64,
+) -> Iterator[RowChange]:
+    """
+    Compares two sets of rows by primary key and yields a RowChange for every added, removed, or changed row.
+
+    When presorted is True both inputs must be sorted ascending by key (e.g. query.iter_rows with sort set to the key
+    column) and are compared with a streaming merge that holds a single row of each input in memory. Keys are ordered
+    with Python's <, which matches the server's sort for numeric keys but not for text keys under a case-insensitive
+    collation, so leave presorted off for those. Otherwise rows are spilled to temporary files partitioned by a hash of
+    their key and compared one partition at a time, which holds about 1/partitions of the old rows in memory.
+    :param old_rows: the previous rows, e.g. from read_snapshot
+    :param new_rows: the current rows, e.g. from query.iter_rows
+    :param key: primary key column, or list of columns for a compound key
+    :param presorted: whether both inputs are sorted by key in Python's order
+    :param ignore_columns: columns left out of the comparison, e.g. "_labkeyurl_Name" or "Modified"
+    :param partitions: number of hash partitions used when the inputs are not presorted
+    :return: iterator of RowChange
+    :raises ValueError: if presorted is True and the inputs are not in Python's order, raised during iteration
+    """
+    get_key = _key_getter(key)
+    ignore_columns = set(ignore_columns or [])
+
+    if presorted:
+        return _merge_diff(old_rows, new_rows, get_key, ignore_columns)
+
+    return _hashed_diff(old_rows, new_rows, get_key, ignore_columns, partitions)
@@ -13,10 +13,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import copy
 import functools
-from typing import Dict, List, Union, Tuple
-
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Union, Tuple
+
+from . import deadline
+from .exceptions import QueryNotFoundError, RequestError, ServerContextError
 from .server_context import ServerContext
+from .utils import json_dumps
 from labkey.query import QueryFilter
 
 
@@ -28,148 +41,175 @@ def strip_none_values(data: dict, do_strip: bool = True):
     return data
 
 
+def _key_map(properties: Tuple[Tuple[str, str], ...]) -> Dict[str, str]:
+    """
+    Maps both the snake_case and camelCase key of each (attribute, JSON key) pair to its attribute.
+    """
+    key_map = {}
+
+    for attr, json_key in properties:
+        key_map[attr] = attr
+        key_map[json_key] = attr
+
+    return key_map
+
+
+def _parse_keys(key_map: Dict[str, str], raw: dict) -> dict:
+    """
+    Resolves the keys of raw to attribute names. When both the snake_case and camelCase key are given the snake_case
+    value is used, even if it is None.
+    """
+    values = {}
+
+    for key, value in raw.items():
+        attr = key_map.get(key)
+
+        if attr is not None and (key == attr or attr not in raw):
+            values[attr] = value
+
+    return values
+
+
+# (attribute, JSON key) of each PropertyDescriptor property, in to_json() order
+_PROPERTY_DESCRIPTOR_PROPERTIES = (
+    ("concept_uri", "conceptURI"),
+    ("container", "container"),
+    ("default_display_value", "defaultDisplayValue"),
+    ("default_scale", "defaultScale"),
+    ("default_value", "defaultValue"),
+    ("default_value_type", "defaultValueType"),
+    ("description", "description"),
+    ("dimension", "dimension"),
+    ("disable_editing", "disableEditing"),
+    ("exclude_from_shifting", "excludeFromShifting"),
+    ("faceting_behavior_type", "facetingBehaviorType"),
+    ("format", "format"),
+    ("hidden", "hidden"),
+    ("import_aliases", "importAliases"),
+    ("label", "label"),
+    ("lookup_container", "lookupContainer"),
+    ("lookup_description", "lookupDescription"),
+    ("lookup_query", "lookupQuery"),
+    ("lookup_schema", "lookupSchema"),
+    ("measure", "measure"),
+    ("mv_enabled", "mvEnabled"),
+    ("name", "name"),
+    ("ontology_uri", "ontologyURI"),
+    ("phi", "phi"),
+    ("prevent_reordering", "preventReordering"),
+    ("property_id", "propertyId"),
+    ("property_uri", "propertyURI"),
+    ("range_uri", "rangeURI"),
+    ("recommended_variable", "recommendedVariable"),
+    ("redacted_text", "redactedText"),
+    ("required", "required"),
+    ("scale", "scale"),
+    ("search_terms", "searchTerms"),
+    ("semantic_type", "semanticType"),
+    ("set_dimension", "setDimension"),
+    ("set_exclude_from_shifting", "setExcludeFromShifting"),
+    ("set_measure", "setMeasure"),
+    ("shown_in_details_view", "shownInDetailsView"),
+    ("shown_in_insert_view", "shownInInsertView"),
+    ("shown_in_update_view", "shownInUpdateView"),
+    ("type_editable", "typeEditable"),
+    ("url", "url"),
+)
+_PROPERTY_DESCRIPTOR_ATTRS = tuple(attr for attr, _ in _PROPERTY_DESCRIPTOR_PROPERTIES)
+_PROPERTY_DESCRIPTOR_JSON_KEYS = tuple(json_key for _, json_key in _PROPERTY_DESCRIPTOR_PROPERTIES)
+_PROPERTY_DESCRIPTOR_KEYS = _key_map(
+    _PROPERTY_DESCRIPTOR_PROPERTIES
+    + (("conditional_formats", "conditionalFormats"), ("property_validators", "propertyValidators"))
+)
+
+
+# Guards the first parse of fields and indices. Domains are shared between threads, e.g. by get_cached, and two threads
+# parsing the same field at once could each keep a different copy of its values.
+_parse_lock = threading.Lock()
+
+
+def _field_property(attr: str) -> property:
+    def get(self):
+        values = self._values if self._values is not None else self._parse()
+        return values.get(attr)
+
+    def set(self, value):
+        values = self._values if self._values is not None else self._parse()
+        values[attr] = value
+
+    return property(get, set)
+
+
 # modeled on org.labkey.api.gwt.client.model.GWTPropertyDescriptor
 class PropertyDescriptor:
-    def __init__(self, **kwargs):
-        self.concept_uri = kwargs.pop("concept_uri", kwargs.pop("conceptURI", None))
+    """
+    A domain field. The keyword arguments, snake_case or camelCase, are only parsed when an attribute is first read
+    or written, so the fields of a large domain cost little until they are used.
+    """
 
-        formats = kwargs.pop("conditional_formats", kwargs.pop("conditionalFormats", []))
-        format_instances = []
-        for f in formats:
-            format_instances.append(ConditionalFormat(**f))
-        self.conditional_formats = format_instances
+    # Properties are stored in _values by attribute name, see _field_property
+    __slots__ = ("_raw", "_values")
 
-        self.container = kwargs.pop("container", None)
-        self.default_display_value = kwargs.pop(
-            "default_display_value", kwargs.pop("defaultDisplayValue", None)
-        )
-        self.default_scale = kwargs.pop("default_scale", kwargs.pop("defaultScale", None))
-        self.default_value = kwargs.pop("default_value", kwargs.pop("defaultValue", None))
-        self.default_value_type = kwargs.pop(
-            "default_value_type", kwargs.pop("defaultValueType", None)
-        )
-        self.description = kwargs.pop("description", None)
-        self.dimension = kwargs.pop("dimension", None)
-        self.disable_editing = kwargs.pop("disable_editing", kwargs.pop("disableEditing", None))
-        self.exclude_from_shifting = kwargs.pop(
-            "exclude_from_shifting", kwargs.pop("excludeFromShifting", None)
-        )
-        self.faceting_behavior_type = kwargs.pop(
-            "faceting_behavior_type", kwargs.pop("facetingBehaviorType", None)
-        )
-        self.format = kwargs.pop("format", None)
-        self.hidden = kwargs.pop("hidden", None)
-        self.import_aliases = kwargs.pop("import_aliases", kwargs.pop("importAliases", None))
-        self.label = kwargs.pop("label", None)
-        self.lookup_container = kwargs.pop("lookup_container", kwargs.pop("lookupContainer", None))
-        self.lookup_description = kwargs.pop(
-            "lookup_description", kwargs.pop("lookupDescription", None)
-        )
-        self.lookup_query = kwargs.pop("lookup_query", kwargs.pop("lookupQuery", None))
-        self.lookup_schema = kwargs.pop("lookup_schema", kwargs.pop("lookupSchema", None))
-        self.measure = kwargs.pop("measure", None)
-        self.mv_enabled = kwargs.pop("mv_enabled", kwargs.pop("mvEnabled", None))
-        self.name = kwargs.pop("name", None)
-        self.ontology_uri = kwargs.pop("ontology_uri", kwargs.pop("ontologyURI", None))
-        self.phi = kwargs.pop("phi", None)
-        self.prevent_reordering = kwargs.pop(
-            "prevent_reordering", kwargs.pop("preventReordering", None)
-        )
-        self.property_id = kwargs.pop("property_id", kwargs.pop("propertyId", None))
-        self.property_uri = kwargs.pop("property_uri", kwargs.pop("propertyURI", None))
-
-        validators = kwargs.pop("property_validators", kwargs.pop("propertyValidators", []))
-        validator_instances = []
-        for v in validators:
-            validator_instances.append(PropertyValidator(**v))
-        self.property_validators = validator_instances
-
-        self.range_uri = kwargs.pop("range_uri", kwargs.pop("rangeURI", None))
-        self.recommended_variable = kwargs.pop(
-            "recommended_variable", kwargs.pop("recommendedVariable", None)
-        )
-        self.redacted_text = kwargs.pop("redacted_text", kwargs.pop("redactedText", None))
-        self.required = kwargs.pop("required", None)
-        self.scale = kwargs.pop("scale", None)
-        self.search_terms = kwargs.pop("search_terms", kwargs.pop("searchTerms", None))
-        self.semantic_type = kwargs.pop("semantic_type", kwargs.pop("semanticType", None))
-        self.set_dimension = kwargs.pop("set_dimension", kwargs.pop("setDimension", None))
-        self.set_exclude_from_shifting = kwargs.pop(
-            "set_exclude_from_shifting", kwargs.pop("setExcludeFromShifting", None)
-        )
-        self.set_measure = kwargs.pop("set_measure", kwargs.pop("setMeasure", None))
-        self.shown_in_details_view = kwargs.pop(
-            "shown_in_details_view", kwargs.pop("shownInDetailsView", None)
-        )
-        self.shown_in_insert_view = kwargs.pop(
-            "shown_in_insert_view", kwargs.pop("shownInInsertView", None)
-        )
-        self.shown_in_update_view = kwargs.pop(
-            "shown_in_update_view", kwargs.pop("shownInUpdateView", None)
-        )
-        self.type_editable = kwargs.pop("type_editable", kwargs.pop("typeEditable", None))
-        self.url = kwargs.pop("url", None)
+    def __init__(self, **kwargs):
+        self._raw = kwargs
+        self._values = None
+
+    @classmethod
+    def _from_raw(cls, raw: dict) -> "PropertyDescriptor":
+        # Like PropertyDescriptor(**raw) without copying raw, which is only read
+        field = cls.__new__(cls)
+        field._raw = raw
+        field._values = None
+        return field
+
+    def _parse(self) -> dict:
+        with _parse_lock:
+            # Another thread may have parsed it while this one waited
+            if self._values is None:
+                values = _parse_keys(_PROPERTY_DESCRIPTOR_KEYS, self._raw)
+                formats = values.get("conditional_formats", [])
+                values["conditional_formats"] = [ConditionalFormat(**f) for f in formats]
+                validators = values.get("property_validators", [])
+                values["property_validators"] = [PropertyValidator(**v) for v in validators]
+
+                # _values is set first, readers that don't take the lock only check it
+                self._values = values
+                self._raw = None
+
+            return self._values
+
+    def __getstate__(self):
+        return self._raw, self._values
+
+    def __setstate__(self, state):
+        self._raw, self._values = state
 
     def to_json(self, strip_none=True):
         # TODO: Likely only want to include those that are not None
-        data = {
-            "conceptURI": self.concept_uri,
-            "container": self.container,
-            "defaultDisplayValue": self.default_display_value,
-            "defaultScale": self.default_scale,
-            "defaultValue": self.default_value,
-            "defaultValueType": self.default_value_type,
-            "description": self.description,
-            "dimension": self.dimension,
-            "disableEditing": self.disable_editing,
-            "excludeFromShifting": self.exclude_from_shifting,
-            "facetingBehaviorType": self.faceting_behavior_type,
-            "format": self.format,
-            "hidden": self.hidden,
-            "importAliases": self.import_aliases,
-            "label": self.label,
-            "lookupContainer": self.lookup_container,
-            "lookupDescription": self.lookup_description,
-            "lookupQuery": self.lookup_query,
-            "lookupSchema": self.lookup_schema,
-            "measure": self.measure,
-            "mvEnabled": self.mv_enabled,
-            "name": self.name,
-            "ontologyURI": self.ontology_uri,
-            "phi": self.phi,
-            "preventReordering": self.prevent_reordering,
-            "propertyId": self.property_id,
-            "propertyURI": self.property_uri,
-            "rangeURI": self.range_uri,
-            "recommendedVariable": self.recommended_variable,
-            "redactedText": self.redacted_text,
-            "required": self.required,
-            "scale": self.scale,
-            "searchTerms": self.search_terms,
-            "semanticType": self.semantic_type,
-            "setDimension": self.set_dimension,
-            "setExcludeFromShifting": self.set_exclude_from_shifting,
-            "setMeasure": self.set_measure,
-            "shownInDetailsView": self.shown_in_details_view,
-            "shownInInsertView": self.shown_in_insert_view,
-            "shownInUpdateView": self.shown_in_update_view,
-            "typeEditable": self.type_editable,
-            "url": self.url,
-        }
+        values = self._values if self._values is not None else self._parse()
+        data = dict(
+            zip(_PROPERTY_DESCRIPTOR_JSON_KEYS, map(values.get, _PROPERTY_DESCRIPTOR_ATTRS))
+        )
 
         json_formats = []
-        for f in self.conditional_formats:
+        for f in values["conditional_formats"]:
             json_formats.append(f.to_json())
         data["conditionalFormats"] = json_formats
 
         json_validators = []
-        for p in self.property_validators:
+        for p in values["property_validators"]:
             json_validators.append(p.to_json())
         data["propertyValidators"] = json_validators
 
         return strip_none_values(data, strip_none)
 
 
+for _attr in _PROPERTY_DESCRIPTOR_ATTRS + ("conditional_formats", "property_validators"):
+    setattr(PropertyDescriptor, _attr, _field_property(_attr))
+
+del _attr
+
+
 class PropertyValidator:
     def __init__(self, **kwargs):
         self.description = kwargs.pop("description", None)
@@ -198,12 +238,17 @@ class PropertyValidator:
 
 class ConditionalFormat:
     def __init__(self, **kwargs):
-        self.background_color = kwargs.pop("background_color", kwargs.pop("backgroundColor", None))
+        # to_json() writes the lowercase keys, accept them too so a Domain can be rebuilt from its JSON
+        self.background_color = kwargs.pop(
+            "background_color", kwargs.pop("backgroundColor", kwargs.pop("backgroundcolor", None))
+        )
         self.bold = kwargs.pop("bold", None)
         self.filter = kwargs.pop("filter", None)
         self.italic = kwargs.pop("italic", None)
         self.strike_through = kwargs.pop("strike_through", kwargs.pop("strikethrough", None))
-        self.text_color = kwargs.pop("text_color", kwargs.pop("textColor", None))
+        self.text_color = kwargs.pop(
+            "text_color", kwargs.pop("textColor", kwargs.pop("textcolor", None))
+        )
 
     def to_json(self):
         data = {
@@ -218,35 +263,91 @@ class ConditionalFormat:
         return data
 
 
-# modeled on org.labkey.api.gwt.client.model.GWTDomain
-class Domain:
-    def __init__(self, **kwargs):
-        self.container = kwargs.pop("container", None)
-        self.description = kwargs.pop("description", None)
-        self.domain_id = kwargs.pop("domain_id", kwargs.pop("domainId", None))
-        self.domain_uri = kwargs.pop("domain_uri", kwargs.pop("domainURI", None))
-        self.name = kwargs.pop("name", None)
-        self.query_name = kwargs.pop("query_name", kwargs.pop("queryName", None))
-        self.schema_name = kwargs.pop("schema_name", kwargs.pop("schemaName", None))
-        self.template_description = kwargs.pop(
-            "template_description", kwargs.pop("templateDescription", None)
-        )
-
-        fields = kwargs.pop("fields", [])
-        fields_instances = []
-
-        for field in fields:
-            fields_instances.append(PropertyDescriptor(**field))
+# (attribute, JSON key) of each Domain property, in to_json() order
+_DOMAIN_PROPERTIES = (
+    ("container", "container"),
+    ("description", "description"),
+    ("domain_id", "domainId"),
+    ("domain_uri", "domainURI"),
+    ("name", "name"),
+    ("query_name", "queryName"),
+    ("schema_name", "schemaName"),
+    ("template_description", "templateDescription"),
+)
+_DOMAIN_KEYS = _key_map(_DOMAIN_PROPERTIES + (("fields", "fields"), ("indices", "indices")))
 
-        self.fields = fields_instances
 
-        indices = kwargs.pop("indices", [])
-        indices_instances = []
+# modeled on org.labkey.api.gwt.client.model.GWTDomain
+class Domain:
+    """
+    A domain design. The fields and indices are only converted to PropertyDescriptor and FieldIndex objects when first
+    read, and each field is parsed on its own first read.
+    """
 
-        for index in indices:
-            indices_instances.append(FieldIndex(**index))
+    __slots__ = tuple(attr for attr, _ in _DOMAIN_PROPERTIES) + (
+        "_fields",
+        "_raw_fields",
+        "_indices",
+        "_raw_indices",
+        "_snapshot",
+        "_snapshot_options",
+    )
 
-        self.indices = indices_instances
+    def __init__(self, **kwargs):
+        values = _parse_keys(_DOMAIN_KEYS, kwargs)
+
+        for attr, _ in _DOMAIN_PROPERTIES:
+            setattr(self, attr, values.get(attr))
+
+        self._fields = None
+        self._raw_fields = values.get("fields") or []
+        self._indices = None
+        self._raw_indices = values.get("indices") or []
+
+        # The design as last fetched from or saved to the server, used by save_changes
+        self._snapshot = None
+        self._snapshot_options = None
+
+    @property
+    def fields(self) -> List[PropertyDescriptor]:
+        if self._raw_fields is not None:
+            with _parse_lock:
+                raw_fields = self._raw_fields
+
+                if raw_fields is not None:
+                    self._fields = [
+                        f if isinstance(f, PropertyDescriptor) else PropertyDescriptor._from_raw(f)
+                        for f in raw_fields
+                    ]
+                    self._raw_fields = None
+
+        return self._fields
+
+    @fields.setter
+    def fields(self, fields: List[PropertyDescriptor]):
+        with _parse_lock:
+            self._fields = fields
+            self._raw_fields = None
+
+    @property
+    def indices(self) -> List["FieldIndex"]:
+        if self._raw_indices is not None:
+            with _parse_lock:
+                raw_indices = self._raw_indices
+
+                if raw_indices is not None:
+                    self._indices = [
+                        i if isinstance(i, FieldIndex) else FieldIndex(**i) for i in raw_indices
+                    ]
+                    self._raw_indices = None
+
+        return self._indices
+
+    @indices.setter
+    def indices(self, indices: List["FieldIndex"]):
+        with _parse_lock:
+            self._indices = indices
+            self._raw_indices = None
 
     def add_field(self, field: Union[dict, PropertyDescriptor]):
         if isinstance(field, PropertyDescriptor):
@@ -260,16 +361,7 @@ class Domain:
         return self
 
     def to_json(self, strip_none=True):
-        data = {
-            "container": self.container,
-            "description": self.description,
-            "domainId": self.domain_id,
-            "domainURI": self.domain_uri,
-            "name": self.name,
-            "queryName": self.query_name,
-            "schemaName": self.schema_name,
-            "templateDescription": self.template_description,
-        }
+        data = {json_key: getattr(self, attr) for attr, json_key in _DOMAIN_PROPERTIES}
 
         json_fields = []
         for field in self.fields:
@@ -355,27 +447,83 @@ def encode_conditional_format_filter(query_filter: QueryFilter) -> str:
     return f"format.column~{query_filter.filter_type}={query_filter.value}"
 
 
-def __format_conditional_filters(field: dict) -> dict:
+def encode_conditional_formats(fields: List[dict]) -> List[dict]:
     """
-    For every conditional format filter that is set as a QueryFilter, translates the given filter into LabKey
-    filter URL format.
+    For every conditional format filter of the given domain fields that is set as a QueryFilter, or a list of up to two
+    QueryFilters, translates the filter into LabKey filter URL format. The fields are not modified, the fields and
+    formats that need encoding are copied. All formats are checked before an error is raised, so a single error lists
+    every invalid format.
+    :param fields: the fields of a domain design, as dicts
+    :return: the fields, with encoded copies in place of the fields that have QueryFilter filters
     """
-    if "conditionalFormats" in field:
-        for cf in field["conditionalFormats"]:
-            if "filter" in cf and isinstance(
-                cf["filter"], QueryFilter
-            ):  # Supports one QueryFilter without list form
-                cf["filter"] = encode_conditional_format_filter(cf["filter"])
+    # Many fields often share the same QueryFilter, encode each one once
+    encoded_filters = {}
+    errors = []
+    result = []
 
-            elif "filter" in cf and isinstance(cf["filter"], list):  # Supports list of QueryFilters
-                filters = []
-                for query_filter in cf["filter"]:
-                    filters.append(encode_conditional_format_filter(query_filter))
-                if len(filters) > 2:
-                    raise Exception("Too many QueryFilters given for one conditional format.")
-                cf["filter"] = filters[0] + "&" + filters[1] if len(filters) == 2 else filters[0]
+    def encode(query_filter: QueryFilter) -> str:
+        encoded = encoded_filters.get(id(query_filter))
 
-    return field
+        if encoded is None:
+            encoded = encode_conditional_format_filter(query_filter)
+            encoded_filters[id(query_filter)] = encoded
+
+        return encoded
+
+    for field in fields:
+        formats = field.get("conditionalFormats")
+        encoded_formats = None
+
+        for i, cf in enumerate(formats or []):
+            query_filter = cf.get("filter")
+
+            if isinstance(query_filter, QueryFilter):  # Supports one QueryFilter without list form
+                encoded = encode(query_filter)
+            elif isinstance(query_filter, list):  # Supports list of QueryFilters
+                error = None
+
+                if not all(isinstance(qf, QueryFilter) for qf in query_filter):
+                    error = "a list of filters must only contain QueryFilter objects"
+                elif not 1 <= len(query_filter) <= 2:
+                    error = "one or two QueryFilters are supported, got {}".format(
+                        len(query_filter)
+                    )
+
+                if error is not None:
+                    errors.append(
+                        'field "{}", conditional format {}: {}'.format(field.get("name"), i, error)
+                    )
+                    continue
+
+                encoded = "&".join(encode(qf) for qf in query_filter)
+            else:
+                continue
+
+            if encoded_formats is None:
+                encoded_formats = list(formats)
+
+            encoded_formats[i] = {**cf, "filter": encoded}
+
+        if encoded_formats is None:
+            result.append(field)
+        else:
+            result.append({**field, "conditionalFormats": encoded_formats})
+
+    if errors:
+        raise ValueError("Invalid conditional formats:\n" + "\n".join(errors))
+
+    return result
+
+
+def _encode_definition(domain_definition: dict) -> dict:
+    design = domain_definition.get("domainDesign", None)
+
+    # domainDesign is not required when creating a domain from a template
+    if design is None or "fields" not in design:
+        return domain_definition
+
+    fields = encode_conditional_formats(design["fields"])
+    return {**domain_definition, "domainDesign": {**design, "fields": fields}}
 
 
 def create(
@@ -390,18 +538,16 @@ def create(
     """
     url = server_context.build_url("property", "createDomain.api", container_path=container_path)
     domain = None
-
-    # domainDesign is not required when creating a domain from a template
-    if domain_definition.get("domainDesign", None) is not None:
-        domain_fields = domain_definition["domainDesign"]["fields"]
-        domain_definition["domainDesign"]["fields"] = list(
-            map(__format_conditional_filters, domain_fields)
-        )
-
+    domain_definition = _encode_definition(domain_definition)
     raw_domain = server_context.make_request(url, json=domain_definition)
 
     if raw_domain is not None:
-        domain = Domain(**raw_domain)
+        with server_context.profile_phase("construct"):
+            domain = Domain(**raw_domain)
+            domain._snapshot = raw_domain
+
+        if domain.name is not None or domain.domain_uri is not None:
+            invalidate_cache(server_context, query_name=domain.name, domain_uri=domain.domain_uri)
 
     return domain
 
@@ -420,7 +566,11 @@ def drop(
     url = server_context.build_url("property", "deleteDomain.api", container_path=container_path)
     payload = {"schemaName": schema_name, "queryName": query_name}
 
-    return server_context.make_request(url, json=payload)
+    try:
+        return server_context.make_request(url, json=payload)
+    finally:
+        # The domain is removed from the cache of every container, container paths can be written several ways
+        invalidate_cache(server_context, schema_name, query_name)
 
 
 def get(
@@ -439,11 +589,34 @@ def get(
     raw_domain = server_context.make_request(url, payload, method="GET")
 
     if raw_domain is not None:
-        return Domain(**raw_domain)
+        with server_context.profile_phase("construct"):
+            domain = Domain(**raw_domain)
+            domain._snapshot = raw_domain
+            return domain
 
     return None
 
 
+def _get_domain_details_response(
+    server_context: ServerContext,
+    schema_name: str = None,
+    query_name: str = None,
+    domain_id: int = None,
+    domain_kind: str = None,
+    container_path: str = None,
+) -> dict:
+    url = server_context.build_url(
+        "property", "getDomainDetails.api", container_path=container_path
+    )
+    payload = {
+        "schemaName": schema_name,
+        "queryName": query_name,
+        "domainId": domain_id,
+        "domainKind": domain_kind,
+    }
+    return server_context.make_request(url, payload, method="GET")
+
+
 def get_domain_details(
     server_context: ServerContext,
     schema_name: str = None,
@@ -462,44 +635,116 @@ def get_domain_details(
     :param container_path: labkey container path if not already set in context
     :return: Domain, Dict
     """
-    url = server_context.build_url(
-        "property", "getDomainDetails.api", container_path=container_path
+    response = _get_domain_details_response(
+        server_context, schema_name, query_name, domain_id, domain_kind, container_path
     )
-    payload = {
-        "schemaName": schema_name,
-        "queryName": query_name,
-        "domainId": domain_id,
-        "domainKind": domain_kind,
-    }
-    response = server_context.make_request(url, payload, method="GET")
     raw_domain = response.get("domainDesign", None)
     domain = None
     options = response.get("options", None)
 
     if raw_domain is not None:
-        domain = Domain(**raw_domain)
+        with server_context.profile_phase("construct"):
+            domain = Domain(**raw_domain)
+            domain._snapshot = raw_domain
+            domain._snapshot_options = options
 
     return domain, options
 
 
+# Files infer_fields can cut at a line break. Excel files are zip or OLE archives that would be corrupted.
+_TEXT_EXTENSIONS = {"", ".tsv", ".tab", ".txt", ".csv"}
+_ARCHIVE_SIGNATURES = (b"PK\x03\x04", b"\xd0\xcf\x11\xe0")
+
+
+def _head(data_file: any, max_bytes: int = None, max_lines: int = None) -> Tuple[str, io.BytesIO]:
+    """
+    Copies the start of a text file, up to max_bytes and max_lines and ending at a line break, into memory.
+    :return: the file name and the copied bytes
+    :raises ValueError: if the file is not a text file
+    """
+    name = (
+        data_file if isinstance(data_file, (str, os.PathLike)) else getattr(data_file, "name", None)
+    )
+    name = os.path.basename(name) if isinstance(name, (str, os.PathLike)) else "inferfile"
+    extension = os.path.splitext(name)[1].lower()
+
+    if extension not in _TEXT_EXTENSIONS:
+        raise ValueError(
+            "max_bytes and max_lines only apply to TSV, CSV, and text files, not {} files".format(
+                extension
+            )
+        )
+
+    if isinstance(data_file, (str, os.PathLike)):
+        with open(data_file, "rb") as f:
+            return _head(f, max_bytes, max_lines)
+
+    window = io.BytesIO()
+    size = 0
+    lines = 0
+
+    while max_lines is None or lines < max_lines:
+        limit = -1 if max_bytes is None else max_bytes - size + 1
+        line = data_file.readline(limit)
+
+        if not line:
+            break
+
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+
+        if lines == 0 and line.startswith(_ARCHIVE_SIGNATURES):
+            raise ValueError("max_bytes and max_lines can't be used with Excel files")
+
+        if max_bytes is not None and size + len(line) > max_bytes:
+            # Only part of the line fits, leave it out so the server doesn't see a truncated value
+            if lines == 0:
+                raise ValueError("The first line of {} is longer than max_bytes".format(name))
+            break
+
+        window.write(line)
+        size += len(line)
+        lines += 1
+
+    window.seek(0)
+    return name, window
+
+
 def infer_fields(
-    server_context: ServerContext, data_file: any, container_path: str = None
+    server_context: ServerContext,
+    data_file: any,
+    container_path: str = None,
+    max_bytes: int = None,
+    max_lines: int = None,
 ) -> List[PropertyDescriptor]:
     """
     Infer fields for a domain from a file
     :param server_context: A LabKey server context. See utils.create_server_context.
-    :param data_file: the data file from which to determine the fields shape
+    :param data_file: the data file from which to determine the fields shape, a file object or, with max_bytes or
+    max_lines, a path
     :param container_path: labkey container path if not already set in context
+    :param max_bytes: upload at most this many bytes from the start of a text file, cut at the last full line. The
+    server only looks at the first rows, so this saves uploading all of a large file.
+    :param max_lines: upload at most this many lines, including the header, from the start of a text file
+    :raises ValueError: if max_bytes or max_lines is used with an Excel file
     :return:
     """
     url = server_context.build_url("property", "inferDomain.api", container_path=container_path)
-    raw_infer = server_context.make_request(url, file_payload={"inferfile": data_file})
+
+    if max_bytes is None and max_lines is None:
+        raw_infer = server_context.make_request(url, file_payload={"inferfile": data_file})
+    else:
+        name, window = _head(data_file, max_bytes, max_lines)
+
+        with window:
+            raw_infer = server_context.make_request(url, file_payload={"inferfile": (name, window)})
 
     fields = None
     if "fields" in raw_infer:
         fields = []
-        for f in raw_infer["fields"]:
-            fields.append(PropertyDescriptor(**f))
+        with server_context.profile_phase("construct"):
+            for f in raw_infer["fields"]:
+                fields.append(PropertyDescriptor(**f))
 
     return fields
 
@@ -532,7 +777,849 @@ def save(
     if options is not None:
         payload["options"] = options
 
-    return server_context.make_request(url, json=payload)
+    try:
+        return server_context.make_request(url, json=payload)
+    finally:
+        invalidate_cache(server_context, schema_name, query_name, domain_uri=domain.domain_uri)
+
+
+class FieldChange:
+    """
+    A field that is in both designs compared by diff_domains, with the JSON properties that differ.
+    """
+
+    def __init__(self, name: str, before: dict, after: dict):
+        self.name = name
+        self.before = before
+        self.after = after
+
+    @property
+    def changed_properties(self) -> List[str]:
+        keys = set(self.before.keys()) | set(self.after.keys())
+        return sorted(k for k in keys if self.before.get(k) != self.after.get(k))
+
+    def __repr__(self):
+        return f"FieldChange({self.name!r}, {self.changed_properties})"
+
+
+class DomainDiff:
+    """
+    The differences between two domain designs, see diff_domains. A DomainDiff is falsy when the designs are the same.
+    """
+
+    def __init__(self):
+        self.added: List[str] = []
+        self.removed: List[str] = []
+        self.changed: List[FieldChange] = []
+        self.properties: List[str] = []
+        self.indices_changed = False
+        self.options_changed = False
+        self.reordered = False
+
+    def __bool__(self):
+        return bool(
+            self.added
+            or self.removed
+            or self.changed
+            or self.properties
+            or self.indices_changed
+            or self.options_changed
+            or self.reordered
+        )
+
+    def __repr__(self):
+        return (
+            f"DomainDiff(added={self.added}, removed={self.removed}, changed={self.changed}, "
+            f"properties={self.properties}, indices_changed={self.indices_changed}, "
+            f"options_changed={self.options_changed}, reordered={self.reordered})"
+        )
+
+
+def _field_key(field: dict):
+    name = field.get("name")
+    return name.lower() if name is not None else None
+
+
+def _diff_designs(before: dict, after: dict) -> DomainDiff:
+    diff = DomainDiff()
+    before_fields = before.get("fields", [])
+    after_fields = after.get("fields", [])
+
+    # Fields are matched by propertyId, renamed fields keep theirs, and otherwise by name
+    by_id = {f["propertyId"]: f for f in before_fields if f.get("propertyId") is not None}
+    by_name = {_field_key(f): f for f in before_fields}
+    matched = set()
+    matched_order = []
+
+    for field in after_fields:
+        old = by_id.get(field.get("propertyId")) if field.get("propertyId") is not None else None
+
+        if old is None:
+            old = by_name.get(_field_key(field))
+
+        if old is None or id(old) in matched:
+            diff.added.append(field.get("name"))
+            continue
+
+        matched.add(id(old))
+        matched_order.append(id(old))
+
+        if old != field:
+            diff.changed.append(FieldChange(field.get("name"), old, field))
+
+    diff.removed = [f.get("name") for f in before_fields if id(f) not in matched]
+    diff.reordered = matched_order != [id(f) for f in before_fields if id(f) in matched]
+
+    for key in sorted((set(before.keys()) | set(after.keys())) - {"fields", "indices"}):
+        if before.get(key) != after.get(key):
+            diff.properties.append(key)
+
+    diff.indices_changed = before.get("indices", []) != after.get("indices", [])
+
+    return diff
+
+
+def diff_domains(before: Domain, after: Domain) -> DomainDiff:
+    """
+    Compares two domain designs, e.g. a design fetched with get_domain_details and the same design after it has been
+    changed. Fields are matched by property id, or by name (ignoring case) for fields without one.
+    :param before: the original domain design
+    :param after: the changed domain design
+    :return: DomainDiff listing the added, removed, and changed fields and the changed domain properties
+    """
+    return _diff_designs(before.to_json(), after.to_json())
+
+
+def save_changes(
+    server_context: ServerContext,
+    schema_name: str,
+    query_name: str,
+    domain: Domain,
+    container_path: str = None,
+    options: Dict = None,
+) -> Tuple[DomainDiff, any]:
+    """
+    Saves the provided domain design like save, but only if it differs from the design last fetched from or saved to
+    the server. Domains returned by get, get_domain_details, and create remember that design, for other domains the
+    current design is fetched first. saveDomain.api replaces the whole design, fields left out are deleted, so when
+    something has changed the full design is sent.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param schema_name: schema of domain
+    :param query_name: query name of domain
+    :param domain: Domain to save
+    :param container_path: labkey container path if not already set in context
+    :param options: associated domain options to be saved, compared to the options fetched by get_domain_details
+    :return: DomainDiff, and the saveDomain.api response or None if nothing changed
+    """
+    snapshot = domain._snapshot
+    snapshot_options = domain._snapshot_options
+
+    if snapshot is None:
+        current, snapshot_options = get_domain_details(
+            server_context, schema_name, query_name, container_path=container_path
+        )
+        snapshot = current._snapshot if current is not None else {}
+
+    design = domain.to_json()
+    diff = _diff_designs(Domain(**snapshot).to_json(), design)
+    diff.options_changed = options is not None and options != snapshot_options
+
+    if not diff:
+        return diff, None
+
+    response = save(server_context, schema_name, query_name, domain, container_path, options)
+
+    domain._snapshot = copy.deepcopy(design)
+
+    if options is not None:
+        domain._snapshot_options = copy.deepcopy(options)
+
+    return diff, response
+
+
+class _CachedDomain:
+    def __init__(self, domain: Domain, options: Dict):
+        self.domain = domain
+        self.options = options
+        self.fetched_at = time.monotonic()
+
+    def detach(self) -> Tuple[Domain, Dict]:
+        """
+        :return: a copy of the cached domain and options the caller can change without affecting the cache
+        """
+        # get_cached also caches responses without a domain design
+        if self.domain is None:
+            return None, copy.deepcopy(self.options)
+
+        # Built from the design as fetched, the raw field dicts are only read so they can be shared
+        domain = Domain(**self.domain._snapshot)
+        domain._snapshot = self.domain._snapshot
+        domain._snapshot_options = self.domain._snapshot_options
+        return domain, copy.deepcopy(self.options)
+
+
+# Domains cached by get_cached, per ServerContext. Keyed by (container_path, schema_name, query_name).
+_domain_cache = weakref.WeakKeyDictionary()
+_domain_cache_lock = threading.Lock()
+# Incremented by every invalidation, so a fetch that overlaps a save doesn't put the old design back in the cache
+_domain_cache_generation = 0
+
+
+def _cache_key(server_context: ServerContext, schema_name: str, query_name: str, container_path):
+    container_path = container_path or server_context._container_path
+    return container_path, schema_name.lower(), query_name.lower()
+
+
+def get_cached(
+    server_context: ServerContext,
+    schema_name: str,
+    query_name: str,
+    container_path: str = None,
+    ttl: float = 300,
+) -> Tuple[Domain, Dict]:
+    """
+    Gets a domain design and its options like get_domain_details, but reuses the result of an earlier call for up to
+    ttl seconds. Saving, creating, or dropping a domain through the same ServerContext removes it from the cache, other
+    changes are picked up once ttl has passed. The cached Domain is shared by all callers and should not be modified,
+    use get_domain_details to get a Domain to change and save.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param schema_name: schema of table
+    :param query_name: table name of domain to get
+    :param container_path: labkey container path if not already set in context
+    :param ttl: seconds a cached domain is used for, 0 to always fetch it again
+    :return: Domain, Dict
+    """
+    key = _cache_key(server_context, schema_name, query_name, container_path)
+
+    with _domain_cache_lock:
+        entry = _domain_cache.get(server_context, {}).get(key)
+        generation = _domain_cache_generation
+
+    if entry is None or time.monotonic() - entry.fetched_at > ttl:
+        domain, options = get_domain_details(
+            server_context, schema_name, query_name, container_path=container_path
+        )
+        entry = _CachedDomain(domain, options)
+
+        with _domain_cache_lock:
+            if generation == _domain_cache_generation:
+                _domain_cache.setdefault(server_context, {})[key] = entry
+
+    return entry.domain, entry.options
+
+
+def invalidate_cache(
+    server_context: ServerContext,
+    schema_name: str = None,
+    query_name: str = None,
+    container_path: str = None,
+    domain_uri: str = None,
+):
+    """
+    Removes domains from the cache used by get_cached. Without any arguments the whole cache of server_context is
+    cleared, otherwise domains matching the schema and query name, or the domain URI, are removed.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param schema_name: schema of the domains to remove, None for any schema
+    :param query_name: query name of the domains to remove, None for any query
+    :param container_path: container of the domains to remove, None for any container
+    :param domain_uri: domainURI of a domain to remove
+    """
+    schema_name = schema_name.lower() if schema_name is not None else None
+    query_name = query_name.lower() if query_name is not None else None
+
+    def matches(key, entry):
+        key_container, key_schema, key_query = key
+
+        if container_path is not None and key_container != container_path:
+            return False
+
+        if domain_uri is not None and entry.domain is not None:
+            if entry.domain.domain_uri == domain_uri:
+                return True
+
+        if schema_name is None and query_name is None:
+            return domain_uri is None
+
+        return (schema_name is None or key_schema == schema_name) and (
+            query_name is None or key_query == query_name
+        )
+
+    global _domain_cache_generation
+
+    with _domain_cache_lock:
+        _domain_cache_generation += 1
+        cache = _domain_cache.get(server_context, {})
+
+        for key, entry in list(cache.items()):
+            if matches(key, entry):
+                del cache[key]
+
+
+# Field properties compared by fingerprint. Others are assigned by the server or differ between containers.
+FINGERPRINT_PROPERTIES = (
+    "name",
+    "rangeURI",
+    "conceptURI",
+    "required",
+    "label",
+    "description",
+    "format",
+    "lookupSchema",
+    "lookupQuery",
+    "mvEnabled",
+)
+
+
+def _project(domain: Union[Domain, dict], properties) -> dict:
+    """
+    Reduces a domain design to the normalized field properties compared by fingerprint.
+    """
+    if not isinstance(domain, Domain):
+        domain = Domain(**domain)
+
+    fields = []
+
+    for field in domain.fields:
+        field = field.to_json()
+        projected = {}
+
+        for key in properties:
+            value = field.get(key)
+
+            if value is None or value is False:
+                continue
+
+            if key == "rangeURI" and isinstance(value, str):
+                value = value.rsplit("#", 1)[-1]
+
+            projected[key] = value
+
+        fields.append(projected)
+
+    return {"fields": fields}
+
+
+def fingerprint(domain: Union[Domain, dict], properties=FINGERPRINT_PROPERTIES) -> str:
+    """
+    Computes a hash of the fields of a domain design that is the same for identical designs in different containers.
+    Only the given field properties are compared, unset and False values are ignored, and range URIs are compared by
+    the part after "#" so "int" matches "http://www.w3.org/2001/XMLSchema#int".
+    :param domain: a Domain, or a domain design dict with snake_case or camelCase keys
+    :param properties: the JSON keys of the field properties to compare
+    :return: hex digest
+    """
+    return _digest(_project(domain, properties))
+
+
+def _digest(projected: dict) -> str:
+    return hashlib.sha256(json_dumps(projected, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ProvisionStatus:
+    """
+    Enum of bulk_create results
+    """
+
+    CREATED = "created"
+    SKIPPED = "skipped"
+    CONFLICT = "conflict"
+    FAILED = "failed"
+
+
+class ProvisionResult:
+    def __init__(
+        self, container_path: str, status: str, domain: Domain = None, error: Exception = None
+    ):
+        self.container_path = container_path
+        self.status = status
+        self.domain = domain
+        self.error = error
+
+    def __repr__(self):
+        return f"ProvisionResult({self.container_path!r}, {self.status!r})"
+
+
+def _map_concurrently(fn, items: list, max_workers: int) -> list:
+    """
+    Calls fn(item) for every item on a pool of max_workers threads, keeping the caller's deadline active in the
+    workers, which don't share the caller's context.
+    :return: the results, in items order
+    """
+    deadline_at = deadline.current()
+
+    def call(item):
+        with deadline.deadline_at(deadline_at):
+            return fn(item)
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(call, item) for item in items]
+        return [future.result() for future in futures]
+
+
+def _is_missing_domain(e: Exception) -> bool:
+    if isinstance(e, QueryNotFoundError):
+        return True
+
+    # getDomainDetails.api reports a missing domain with a 400, which make_request wraps in a ServerContextError
+    inner = getattr(e, "exception", None)
+    return (
+        isinstance(inner, RequestError)
+        and inner.response is not None
+        and inner.response.status_code == 400
+    )
+
+
+def _provision(
+    server_context: ServerContext,
+    domain_definition: dict,
+    container_path: str,
+    schema_name: str,
+    query_name: str,
+    expected: str,
+) -> ProvisionResult:
+    try:
+        if schema_name is not None:
+            try:
+                existing, _ = get_domain_details(
+                    server_context, schema_name, query_name, container_path=container_path
+                )
+            except (QueryNotFoundError, ServerContextError) as e:
+                if not _is_missing_domain(e):
+                    raise
+
+                existing = None
+
+            if existing is not None:
+                if fingerprint(existing) == expected:
+                    return ProvisionResult(container_path, ProvisionStatus.SKIPPED, existing)
+
+                return ProvisionResult(container_path, ProvisionStatus.CONFLICT, existing)
+
+        domain = create(server_context, domain_definition, container_path)
+        return ProvisionResult(container_path, ProvisionStatus.CREATED, domain)
+    except Exception as e:
+        return ProvisionResult(container_path, ProvisionStatus.FAILED, error=e)
+
+
+def bulk_create(
+    server_context: ServerContext,
+    domain_definition: dict,
+    container_paths: List[str],
+    schema_name: str = None,
+    query_name: str = None,
+    max_workers: int = 8,
+) -> List[ProvisionResult]:
+    """
+    Creates the same domain in many containers, running up to max_workers creates at a time. When schema_name is given
+    each container is checked first: containers that already hold the domain are skipped if its fingerprint matches the
+    definition and reported as a conflict otherwise. A failure in one container doesn't stop the others.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param domain_definition: A domain definition, as passed to create.
+    :param container_paths: the containers to create the domain in
+    :param schema_name: schema of the domain, e.g. "lists", None to create the domain without checking first
+    :param query_name: query name of the domain, defaults to the name of the domain design
+    :param max_workers: the most requests in flight at a time
+    :return: a ProvisionResult for each container, in container_paths order
+    """
+    # Encoded once up front, so invalid conditional formats fail here instead of in every container
+    domain_definition = _encode_definition(domain_definition)
+    design = domain_definition.get("domainDesign")
+    expected = None
+
+    if schema_name is not None:
+        if design is None:
+            raise ValueError("schema_name requires a domain definition with a domainDesign")
+
+        if query_name is None:
+            query_name = design.get("name")
+
+        expected = fingerprint(design)
+
+    def provision(container_path):
+        return _provision(
+            server_context, domain_definition, container_path, schema_name, query_name, expected
+        )
+
+    return _map_concurrently(provision, container_paths, max_workers)
+
+
+class DriftStatus:
+    """
+    Enum of DriftScanner results
+    """
+
+    MATCHED = "matched"
+    DRIFTED = "drifted"
+    MISSING = "missing"
+    FAILED = "failed"
+
+
+class DriftReport:
+    def __init__(
+        self,
+        container_path: str,
+        status: str,
+        fingerprint: str = None,
+        diff: DomainDiff = None,
+        changed: bool = True,
+        error: Exception = None,
+    ):
+        self.container_path = container_path
+        self.status = status
+        self.fingerprint = fingerprint
+        # Differences from the expected design, only for drifted containers
+        self.diff = diff
+        # False if the container's result is the same as in the previous scan
+        self.changed = changed
+        self.error = error
+
+    def __repr__(self):
+        return f"DriftReport({self.container_path!r}, {self.status!r}, changed={self.changed})"
+
+
+class DriftScanner:
+    """
+    Checks that a domain still has the expected design in many containers. Each scan fetches the domain from every
+    container concurrently and compares its fingerprint with the expected one. Only drifted containers get a field-level
+    DomainDiff, and a container's previous result is reused while its fingerprint stays the same, so repeated scans
+    only do the work for containers that changed.
+    """
+
+    def __init__(
+        self,
+        server_context: ServerContext,
+        schema_name: str,
+        query_name: str,
+        expected: Union[Domain, dict],
+        properties=FINGERPRINT_PROPERTIES,
+        max_workers: int = 8,
+    ):
+        """
+        :param server_context: A LabKey server context. See utils.create_server_context.
+        :param schema_name: schema of the domain
+        :param query_name: query name of the domain
+        :param expected: the expected design, a Domain or a domain design dict
+        :param properties: the field properties to compare, see fingerprint
+        :param max_workers: the most requests in flight at a time
+        """
+        self.server_context = server_context
+        self.schema_name = schema_name
+        self.query_name = query_name
+        self.properties = properties
+        self.max_workers = max_workers
+        self._expected = _project(expected, properties)
+        self.fingerprint = _digest(self._expected)
+        self._results: Dict[str, DriftReport] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def results(self) -> Dict[str, DriftReport]:
+        """
+        The latest result of each container scanned so far, by container path.
+        """
+        with self._lock:
+            return dict(self._results)
+
+    def scan(self, container_paths: List[str]) -> List[DriftReport]:
+        """
+        Scans the containers.
+        :param container_paths: the containers to check
+        :return: a DriftReport for each container, in container_paths order
+        """
+        return _map_concurrently(self._scan_container, container_paths, self.max_workers)
+
+    def _scan_container(self, container_path: str) -> DriftReport:
+        with self._lock:
+            previous = self._results.get(container_path)
+
+        try:
+            domain, _ = get_domain_details(
+                self.server_context,
+                self.schema_name,
+                self.query_name,
+                container_path=container_path,
+            )
+        except Exception as e:
+            if not _is_missing_domain(e):
+                # Not remembered, the next scan compares with the last successful one
+                return DriftReport(container_path, DriftStatus.FAILED, error=e)
+
+            domain = None
+
+        if domain is None:
+            changed = previous is None or previous.status != DriftStatus.MISSING
+            report = DriftReport(container_path, DriftStatus.MISSING, changed=changed)
+        else:
+            projected = _project(domain, self.properties)
+            digest = _digest(projected)
+
+            if previous is not None and previous.fingerprint == digest:
+                report = DriftReport(
+                    container_path, previous.status, digest, previous.diff, changed=False
+                )
+            elif digest == self.fingerprint:
+                report = DriftReport(container_path, DriftStatus.MATCHED, digest)
+            else:
+                diff = _diff_designs(self._expected, projected)
+                report = DriftReport(container_path, DriftStatus.DRIFTED, digest, diff)
+
+        with self._lock:
+            self._results[container_path] = report
+
+        return report
+
+
+# Assigned by the server and specific to the source container, left out of exported designs
+_EXPORT_EXCLUDED_DOMAIN_KEYS = {"domainId", "domainURI", "container"}
+_EXPORT_EXCLUDED_FIELD_KEYS = {"propertyId", "propertyURI", "container"}
+
+
+def _is_msgpack(path: str) -> bool:
+    return path.endswith((".msgpack", ".msgpack.gz"))
+
+
+def _open_export(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "b")
+
+    return open(path, mode + "b")
+
+
+def _export_record(schema_name: str, query_name: str, response: dict) -> dict:
+    design = {
+        k: v for k, v in response["domainDesign"].items() if k not in _EXPORT_EXCLUDED_DOMAIN_KEYS
+    }
+    design["fields"] = [
+        {k: v for k, v in field.items() if k not in _EXPORT_EXCLUDED_FIELD_KEYS}
+        for field in design.get("fields", [])
+    ]
+
+    return {
+        "schemaName": schema_name,
+        "queryName": query_name,
+        "kind": response.get("domainKindName"),
+        "domainDesign": design,
+        "options": response.get("options"),
+    }
+
+
+def export_domains(
+    server_context: ServerContext,
+    domains: List[Tuple[str, str]],
+    path: str,
+    container_path: str = None,
+    max_workers: int = 8,
+) -> int:
+    """
+    Writes the designs, kinds, and options of many domains to a file that import_domains can recreate them from. The
+    domains are fetched concurrently. Files are written as JSON lines, or with msgpack if the path ends in ".msgpack"
+    (requires the optional msgpack dependency), and are gzip compressed if the path ends in ".gz".
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param domains: (schema_name, query_name) of each domain to export
+    :param path: file to write, e.g. "domains.jsonl.gz"
+    :param container_path: labkey container path if not already set in context
+    :param max_workers: the most requests in flight at a time
+    :return: number of domains written
+    """
+    path = os.fspath(path)
+
+    def fetch(domain):
+        schema_name, query_name = domain
+        response = _get_domain_details_response(
+            server_context, schema_name, query_name, container_path=container_path
+        )
+        return _export_record(schema_name, query_name, response)
+
+    records = _map_concurrently(fetch, list(domains), max_workers)
+
+    with _open_export(path, "w") as f:
+        if _is_msgpack(path):
+            # We localize the import of msgpack here so it is an optional dependency.
+            import msgpack
+
+            for record in records:
+                f.write(msgpack.packb(record, use_bin_type=True))
+        else:
+            for record in records:
+                f.write(json_dumps(record).encode("utf-8") + b"\n")
+
+    return len(records)
+
+
+def read_export(path: str) -> Iterator[dict]:
+    """
+    Iterates over the domains of a file written by export_domains. Each is a dict with the schemaName, queryName, kind,
+    domainDesign, and options of the exported domain.
+    :param path: file to read
+    :return: iterator of domains
+    """
+    path = os.fspath(path)
+
+    with _open_export(path, "r") as f:
+        if _is_msgpack(path):
+            # We localize the import of msgpack here so it is an optional dependency.
+            import msgpack
+
+            yield from msgpack.Unpacker(f, raw=False)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class DomainImportResult:
+    def __init__(
+        self,
+        schema_name: str,
+        query_name: str,
+        status: str,
+        domain: Domain = None,
+        error: Exception = None,
+    ):
+        self.schema_name = schema_name
+        self.query_name = query_name
+        self.status = status
+        self.domain = domain
+        self.error = error
+
+    def __repr__(self):
+        return f"DomainImportResult({self.schema_name!r}, {self.query_name!r}, {self.status!r})"
+
+
+def import_domains(
+    server_context: ServerContext,
+    path: str,
+    container_path: str = None,
+    max_workers: int = 8,
+) -> List[DomainImportResult]:
+    """
+    Creates the domains of a file written by export_domains, running up to max_workers creates at a time. A failure to
+    create one domain doesn't stop the others.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param path: file to read
+    :param container_path: labkey container path to create the domains in if not already set in context
+    :param max_workers: the most requests in flight at a time
+    :return: a DomainImportResult for each domain, with status ProvisionStatus.CREATED or ProvisionStatus.FAILED, in
+    file order
+    """
+
+    def import_domain(record):
+        schema_name = record.get("schemaName")
+        query_name = record.get("queryName")
+        definition = {"kind": record["kind"], "domainDesign": record["domainDesign"]}
+
+        if record.get("options") is not None:
+            definition["options"] = record["options"]
+
+        try:
+            domain = create(server_context, definition, container_path)
+        except Exception as e:
+            return DomainImportResult(schema_name, query_name, ProvisionStatus.FAILED, error=e)
+
+        return DomainImportResult(schema_name, query_name, ProvisionStatus.CREATED, domain)
+
+    return _map_concurrently(import_domain, list(read_export(path)), max_workers)
+
+
+def get_domain_details_batch(
+    server_context: ServerContext,
+    domains: Iterable[Union[Tuple[str, str], int]],
+    container_path: str = None,
+    max_workers: int = 8,
+    ttl: float = None,
+) -> Iterator[Tuple[Union[Tuple[str, str], int], Domain, Dict]]:
+    """
+    Gets the designs and options of many domains like get_domain_details, running up to max_workers requests at a time
+    and yielding each result as soon as it arrives. Repeated domains are only fetched once. The results are added to the
+    cache used by get_cached. Unlike get_cached, every Domain returned is the caller's own and can be changed and saved.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param domains: (schema_name, query_name) tuples or domain ids of the domains to get
+    :param container_path: labkey container path if not already set in context
+    :param max_workers: the most requests in flight at a time
+    :param ttl: if set, domains cached by get_cached less than ttl seconds ago are returned without a request
+    :return: iterator of (domain key as given, Domain, options), in the order the requests finish. Domain and options are
+    None for domains that don't exist.
+    """
+    unique = {}
+
+    for key in domains:
+        if isinstance(key, int):
+            unique.setdefault(key, key)
+        else:
+            schema_name, query_name = key
+            unique.setdefault((schema_name.lower(), query_name.lower()), key)
+
+    with _domain_cache_lock:
+        generation = _domain_cache_generation
+        cache = dict(_domain_cache.get(server_context, {}))
+
+    pending = []
+
+    for key in unique.values():
+        entry = None
+
+        if ttl is not None and not isinstance(key, int):
+            entry = cache.get(_cache_key(server_context, key[0], key[1], container_path))
+
+        if entry is not None and time.monotonic() - entry.fetched_at <= ttl:
+            yield (key, *entry.detach())
+        else:
+            pending.append(key)
+
+    # Worker threads don't share the caller's context, pass the active deadline along
+    deadline_at = deadline.current()
+
+    def fetch(key):
+        with deadline.deadline_at(deadline_at):
+            try:
+                if isinstance(key, int):
+                    domain, options = get_domain_details(
+                        server_context, domain_id=key, container_path=container_path
+                    )
+                else:
+                    domain, options = get_domain_details(
+                        server_context, key[0], key[1], container_path=container_path
+                    )
+            except (QueryNotFoundError, ServerContextError) as e:
+                if not _is_missing_domain(e):
+                    raise
+
+                return None, None
+
+        names = key if not isinstance(key, int) else None
+
+        if names is None and domain is not None and domain.schema_name and domain.query_name:
+            names = domain.schema_name, domain.query_name
+
+        if domain is not None and names is not None:
+            cache_key = _cache_key(server_context, names[0], names[1], container_path)
+
+            # The cache keeps its own copy, so changes the caller makes to the domain it gets don't leak into it
+            entry = _CachedDomain(domain, options)
+            entry.domain, entry.options = entry.detach()
+
+            with _domain_cache_lock:
+                if generation == _domain_cache_generation:
+                    _domain_cache.setdefault(server_context, {})[cache_key] = entry
+
+        return domain, options
+
+    executor = ThreadPoolExecutor(max_workers)
+    futures = {}
+
+    try:
+        for key in pending:
+            futures[executor.submit(fetch, key)] = key
+
+        for future in as_completed(futures):
+            domain, options = future.result()
+            yield futures[future], domain, options
+    finally:
+        # The caller stopped iterating or a request failed, don't send the rest
+        for future in futures:
+            future.cancel()
+
+        executor.shutdown()
 
 
 class DomainWrapper:
@@ -555,6 +1642,49 @@ class DomainWrapper:
     def get(self, schema_name: str, query_name: str, container_path: str = None):
         return get(self.server_context, schema_name, query_name, container_path)
 
+    @functools.wraps(bulk_create)
+    def bulk_create(
+        self,
+        domain_definition: dict,
+        container_paths: List[str],
+        schema_name: str = None,
+        query_name: str = None,
+        max_workers: int = 8,
+    ):
+        return bulk_create(
+            self.server_context,
+            domain_definition,
+            container_paths,
+            schema_name,
+            query_name,
+            max_workers,
+        )
+
+    def drift_scanner(
+        self,
+        schema_name: str,
+        query_name: str,
+        expected: Union[Domain, dict],
+        properties=FINGERPRINT_PROPERTIES,
+        max_workers: int = 8,
+    ) -> DriftScanner:
+        """
+        Creates a DriftScanner that checks the design of a domain across containers. See domain.DriftScanner.
+        """
+        return DriftScanner(
+            self.server_context, schema_name, query_name, expected, properties, max_workers
+        )
+
+    @functools.wraps(export_domains)
+    def export_domains(
+        self,
+        domains: List[Tuple[str, str]],
+        path: str,
+        container_path: str = None,
+        max_workers: int = 8,
+    ):
+        return export_domains(self.server_context, domains, path, container_path, max_workers)
+
     @functools.wraps(get_domain_details)
     def get_domain_details(
         self,
@@ -568,9 +1698,49 @@ class DomainWrapper:
             self.server_context, schema_name, query_name, domain_id, domain_kind, container_path
         )
 
+    @functools.wraps(get_domain_details_batch)
+    def get_domain_details_batch(
+        self,
+        domains: Iterable[Union[Tuple[str, str], int]],
+        container_path: str = None,
+        max_workers: int = 8,
+        ttl: float = None,
+    ):
+        return get_domain_details_batch(
+            self.server_context, domains, container_path, max_workers, ttl
+        )
+
+    @functools.wraps(get_cached)
+    def get_cached(
+        self, schema_name: str, query_name: str, container_path: str = None, ttl: float = 300
+    ):
+        return get_cached(self.server_context, schema_name, query_name, container_path, ttl)
+
+    @functools.wraps(invalidate_cache)
+    def invalidate_cache(
+        self,
+        schema_name: str = None,
+        query_name: str = None,
+        container_path: str = None,
+        domain_uri: str = None,
+    ):
+        return invalidate_cache(
+            self.server_context, schema_name, query_name, container_path, domain_uri
+        )
+
+    @functools.wraps(import_domains)
+    def import_domains(self, path: str, container_path: str = None, max_workers: int = 8):
+        return import_domains(self.server_context, path, container_path, max_workers)
+
     @functools.wraps(infer_fields)
-    def infer_fields(self, data_file: any, container_path: str = None):
-        return infer_fields(self.server_context, data_file, container_path)
+    def infer_fields(
+        self,
+        data_file: any,
+        container_path: str = None,
+        max_bytes: int = None,
+        max_lines: int = None,
+    ):
+        return infer_fields(self.server_context, data_file, container_path, max_bytes, max_lines)
 
     @functools.wraps(save)
     def save(
@@ -582,3 +1752,16 @@ class DomainWrapper:
         options: Dict = None,
     ):
         return save(self.server_context, schema_name, query_name, domain, container_path, options)
+
+    @functools.wraps(save_changes)
+    def save_changes(
+        self,
+        schema_name: str,
+        query_name: str,
+        domain: Domain,
+        container_path: str = None,
+        options: Dict = None,
+    ):
+        return save_changes(
+            self.server_context, schema_name, query_name, domain, container_path, options
+        )
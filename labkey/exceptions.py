@@ -80,3 +80,20 @@ class ServerContextError(RequestError):
             type(e),
             str(e) if str(e) else "Please verify server_context is configured correctly.",
         )
+
+
+class CircuitOpenError(RequestError):
+    def __init__(self, server_context, failures, retry_in):
+        super().__init__(None)
+        self.failures = failures
+        self.retry_in = retry_in
+        self.message = (
+            "Requests to {} are failing fast after {} consecutive failures. The server will be probed again in "
+            "{:.0f}s.".format(server_context.base_url, failures, retry_in)
+        )
+
+
+class DeadlineExceededError(RequestError):
+    def __init__(self):
+        super().__init__(None)
+        self.message = "Deadline exceeded before the request completed"
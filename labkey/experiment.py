@@ -166,7 +166,8 @@ def load_batch(server_context: ServerContext, assay_id: int, batch_id: int) -> O
     json_body = server_context.make_request(load_batch_url, json=payload)
 
     if json_body is not None:
-        loaded_batch = Batch(**json_body["batch"])
+        with server_context.profile_phase("construct"):
+            loaded_batch = Batch(**json_body["batch"])
 
     return loaded_batch
 
@@ -213,7 +214,8 @@ def save_batches(
 
     if json_body is not None:
         resp_batches = json_body["batches"]
-        return [Batch(**resp_batch) for resp_batch in resp_batches]
+        with server_context.profile_phase("construct"):
+            return [Batch(**resp_batch) for resp_batch in resp_batches]
 
     return None
 
@@ -0,0 +1,285 @@
+"""
+Infer domain fields from a data file locally, without uploading it to the server like domain.infer_fields does:
+
+    from labkey.inference import infer_fields
+
+    fields = [field.to_json() for field in infer_fields("samples.tsv")]
+    api.domain.create({"kind": "IntList", "domainDesign": {"name": "Samples", "fields": fields}, ...})
+
+Like the server, each column is typed by the first of integer, number, date, and boolean that every non-empty value
+in the sampled rows can be read as, and is text otherwise. Only the first sample_size rows are read, so a large file
+is inferred in a fraction of the time it takes to upload it. A value further down that doesn't fit, e.g. "N/A" in a
+number column, is missed, pass sample_size=None to read the whole file.
+
+TSV and CSV files are supported, and Excel (.xlsx) files if openpyxl is installed (pip install labkey[excel]).
+"""
+import csv
+import io
+import itertools
+import os
+import re
+from datetime import date, datetime, time
+from typing import Iterator, List, Optional, Union
+
+from .domain import PropertyDescriptor
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+class RangeURI:
+    """
+    Enum of the range URIs infer_fields assigns
+    """
+
+    INT = XSD + "int"
+    DOUBLE = XSD + "double"
+    DATE_TIME = XSD + "dateTime"
+    BOOLEAN = XSD + "boolean"
+    STRING = XSD + "string"
+
+
+_INT_PATTERN = re.compile(r"[+-]?\d+")
+_DOUBLE_PATTERN = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+_INT_MIN = -(2**31)
+_INT_MAX = 2**31 - 1
+
+_BOOLEAN_VALUES = {"true", "false", "t", "f", "yes", "no", "y", "n", "on", "off"}
+
+# Checked in order, the format that parsed the previous value of a column is tried first
+_DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y/%m/%d",
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d %H:%M:%S",
+    "%m/%d/%Y",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%y",
+    "%d-%b-%Y",
+    "%d-%b-%y",
+    "%d %b %Y",
+    "%b %d, %Y",
+    "%d %B %Y",
+    "%B %d, %Y",
+)
+# Rules out most non-dates before trying every format
+_DATE_PATTERN = re.compile(r"\d{1,4}[-/ ]\w+[-/ ,]+\d{2,4}|\w+ \d{1,2}, \d{4}")
+
+
+def _is_int(value: str) -> bool:
+    return _INT_PATTERN.fullmatch(value) is not None and _INT_MIN <= int(value) <= _INT_MAX
+
+
+def _is_double(value: str) -> bool:
+    return _DOUBLE_PATTERN.fullmatch(value) is not None
+
+
+def _is_boolean(value: str) -> bool:
+    return value.lower() in _BOOLEAN_VALUES
+
+
+class _DateChecker:
+    def __init__(self):
+        self.date_format = None
+
+    def __call__(self, value: str) -> bool:
+        if not _DATE_PATTERN.match(value):
+            return False
+
+        formats = _DATE_FORMATS
+
+        if self.date_format is not None:
+            formats = (self.date_format,) + formats
+
+        for date_format in formats:
+            try:
+                datetime.strptime(value, date_format)
+            except ValueError:
+                continue
+
+            self.date_format = date_format
+            return True
+
+        return False
+
+
+class _Column:
+    """
+    Narrows down the type of one column as values are added.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # In order of preference
+        self.candidates = [
+            (RangeURI.INT, _is_int),
+            (RangeURI.DOUBLE, _is_double),
+            (RangeURI.DATE_TIME, _DateChecker()),
+            (RangeURI.BOOLEAN, _is_boolean),
+        ]
+        self.max_length = 0
+
+    def add(self, value):
+        if value is None:
+            return
+
+        if not isinstance(value, str):
+            self._add_typed(value)
+            return
+
+        value = value.strip()
+
+        if value == "":
+            return
+
+        self.max_length = max(self.max_length, len(value))
+
+        if self.candidates:
+            self.candidates = [c for c in self.candidates if c[1](value)]
+
+    def _add_typed(self, value):
+        # Spreadsheet cells already have a type
+        if isinstance(value, bool):
+            range_uri = RangeURI.BOOLEAN
+        elif isinstance(value, int):
+            range_uri = RangeURI.INT if _INT_MIN <= value <= _INT_MAX else RangeURI.DOUBLE
+        elif isinstance(value, float):
+            range_uri = RangeURI.INT if value.is_integer() else RangeURI.DOUBLE
+        elif isinstance(value, (date, datetime, time)):
+            range_uri = RangeURI.DATE_TIME
+        else:
+            self.add(str(value))
+            return
+
+        self.max_length = max(self.max_length, len(str(value)))
+        # An integer is also a valid number
+        accepted = {range_uri, RangeURI.DOUBLE} if range_uri == RangeURI.INT else {range_uri}
+        self.candidates = [c for c in self.candidates if c[0] in accepted]
+
+    def to_field(self) -> PropertyDescriptor:
+        if self.candidates and self.max_length > 0:
+            return PropertyDescriptor(name=self.name, range_uri=self.candidates[0][0])
+
+        return PropertyDescriptor(
+            name=self.name, range_uri=RangeURI.STRING, scale=self.max_length or None
+        )
+
+
+def _column_names(header: List) -> List[str]:
+    names = []
+
+    for i, name in enumerate(header):
+        name = str(name).strip() if name is not None else ""
+        names.append(name or "column{}".format(i))
+
+    return names
+
+
+_EXTENSIONS = {
+    "tsv": "tsv",
+    "tab": "tsv",
+    "txt": "tsv",
+    "csv": "csv",
+    "xlsx": "xlsx",
+    "xlsm": "xlsx",
+    "xls": "xls",
+}
+
+
+def _file_format(data_file, file_format: Optional[str]) -> Optional[str]:
+    if file_format is not None:
+        return file_format.lower().lstrip(".")
+
+    name = (
+        data_file if isinstance(data_file, (str, os.PathLike)) else getattr(data_file, "name", "")
+    )
+    extension = os.path.splitext(str(name))[1].lower().lstrip(".")
+    return _EXTENSIONS.get(extension)
+
+
+def _read_text(data_file, file_format: Optional[str]) -> Iterator[List]:
+    if isinstance(data_file, (str, os.PathLike)):
+        with open(data_file, newline="", encoding="utf-8-sig") as f:
+            yield from _read_text(f, file_format)
+        return
+
+    wrapper = None
+
+    if isinstance(data_file.read(0), bytes):
+        wrapper = data_file = io.TextIOWrapper(data_file, encoding="utf-8-sig", newline="")
+
+    try:
+        first_line = data_file.readline()
+
+        if file_format is None:
+            # Sniff the delimiter from the header
+            file_format = "tsv" if first_line.count("\t") >= first_line.count(",") else "csv"
+
+        delimiter = "\t" if file_format == "tsv" else ","
+        yield from csv.reader(itertools.chain([first_line], data_file), delimiter=delimiter)
+    finally:
+        if wrapper is not None:
+            # Leave the caller's file open
+            wrapper.detach()
+
+
+def _read_excel(data_file) -> Iterator[List]:
+    # We localize the import of openpyxl here so it is an optional dependency.
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(data_file, read_only=True, data_only=True)
+
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def infer_fields(
+    data_file: Union[str, os.PathLike, any],
+    sample_size: Optional[int] = 1000,
+    file_format: str = None,
+) -> List[PropertyDescriptor]:
+    """
+    Infer fields for a domain from a file, without sending it to the server. The first row holds the column names.
+    :param data_file: path or file object (text or binary) of a TSV, CSV, or Excel file
+    :param sample_size: number of data rows to read, None to read them all. Fewer rows are faster, more rows are less
+    likely to miss a value that doesn't fit the inferred type.
+    :param file_format: "tsv", "csv", or "xlsx", by default determined by the file extension, or for text files
+    without one by the delimiter in the first line
+    :return: a PropertyDescriptor with the name and range URI of each column, and the longest value as scale for text
+    columns
+    """
+    file_format = _file_format(data_file, file_format)
+
+    if file_format == "xlsx":
+        rows = _read_excel(data_file)
+    elif file_format in (None, "tsv", "csv"):
+        rows = _read_text(data_file, file_format)
+    else:
+        raise ValueError("Unsupported file format: {}".format(file_format))
+
+    try:
+        header = next(rows, None)
+
+        if header is None:
+            return []
+
+        columns = [_Column(name) for name in _column_names(header)]
+
+        for i, row in enumerate(rows):
+            if sample_size is not None and i >= sample_size:
+                break
+
+            for column, value in zip(columns, row):
+                column.add(value)
+    finally:
+        rows.close()
+
+    return [column.to_field() for column in columns]
@@ -0,0 +1,269 @@
+"""
+Request instrumentation for ServerContext.
+
+Listeners registered with ServerContext.add_request_listener are called before each request is sent, after each
+response is received, and when a request fails. Each call receives a RequestEvent describing the request:
+
+    from labkey.instrumentation import LatencyHistogram
+
+    histogram = LatencyHistogram()
+    api.server_context.add_request_listener(histogram)
+    ...
+    print(histogram.summary())
+"""
+import bisect
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class RequestEvent:
+    """
+    Describes a single request made by ServerContext.make_request. Timings are in seconds. Fields that are not known
+    yet, or can't be measured by the transport, are None.
+    """
+
+    def __init__(self, url: str, method: str, payload_size: int = None):
+        self.url = url
+        self.method = method
+        self.controller, self.action = _parse_endpoint(url)
+        self.payload_size = payload_size
+        self.response_size = None
+        self.status_code = None
+        self.retry_count = 0
+        self.started_at = time.time()
+        # Reset by _start once the request is sent, so a request that fails before then still has an elapsed time
+        self._started = time.perf_counter()
+        self.elapsed = None
+        self.connect_time = None
+        self.ttfb = None
+        self.download_time = None
+        self.exception = None
+
+    @property
+    def endpoint(self) -> str:
+        return "{}-{}".format(self.controller, self.action)
+
+    def _start(self):
+        self._started = time.perf_counter()
+
+    def _finish(self, response=None, exception=None):
+        self.elapsed = time.perf_counter() - self._started
+        self.exception = exception
+
+        if response is not None:
+            self.status_code = response.status_code
+            content = getattr(response, "content", None)
+
+            if isinstance(content, (bytes, str)):
+                self.response_size = len(content)
+
+            # requests reports the time until the response headers were parsed, the rest of the wall time was spent
+            # reading the body
+            elapsed = getattr(response, "elapsed", None)
+
+            if isinstance(elapsed, timedelta):
+                self.ttfb = min(elapsed.total_seconds(), self.elapsed)
+                self.download_time = self.elapsed - self.ttfb
+
+    def __repr__(self):
+        return "<RequestEvent [{} {} {}]>".format(self.method, self.endpoint, self.status_code)
+
+
+def _parse_endpoint(url: str):
+    path = urlsplit(url).path
+    last = path.rsplit("/", 1)[-1]
+
+    if "-" in last:
+        controller, action = last.split("-", 1)
+        return controller, action
+
+    return None, last
+
+
+class RequestListener:
+    """
+    Base class for request listeners. Override any of the methods, they do nothing by default. Listeners are called on
+    the thread making the request, exceptions raised by a listener propagate to the caller.
+    """
+
+    def before_request(self, event: RequestEvent):
+        pass
+
+    def after_response(self, event: RequestEvent):
+        pass
+
+    def on_error(self, event: RequestEvent):
+        pass
+
+
+class _EndpointStats:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, elapsed: float, error: bool):
+        self.counts[bisect.bisect_left(self.buckets, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+
+        for i, count in enumerate(self.counts):
+            seen += count
+
+            if seen >= rank and count:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+
+        return self.max
+
+    def to_json(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class LatencyHistogram(RequestListener):
+    """
+    In memory latency histogram per endpoint (controller-action). Quantiles are estimated from the bucket bounds.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, event: RequestEvent, error: bool):
+        with self._lock:
+            stats = self._stats.get(event.endpoint)
+
+            if stats is None:
+                stats = self._stats[event.endpoint] = _EndpointStats(self.buckets)
+
+            stats.observe(event.elapsed, error)
+
+    def after_response(self, event: RequestEvent):
+        self._observe(event, event.status_code is not None and event.status_code >= 400)
+
+    def on_error(self, event: RequestEvent):
+        self._observe(event, True)
+
+    def summary(self) -> dict:
+        """
+        :return: dict of endpoint to count, errors, mean, max, p50, p95, and p99 (seconds)
+        """
+        with self._lock:
+            return {endpoint: stats.to_json() for endpoint, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+
+class PrometheusListener(RequestListener):
+    """
+    Exports request metrics through prometheus_client, which must be installed separately (pip install
+    prometheus_client).
+    """
+
+    def __init__(self, registry=None, namespace: str = "labkey", buckets=DEFAULT_BUCKETS):
+        # We localize the import of prometheus_client here so it is an optional dependency.
+        from prometheus_client import REGISTRY, Counter, Histogram
+
+        registry = registry or REGISTRY
+        labels = ["endpoint", "method", "status"]
+        self.duration = Histogram(
+            "request_duration_seconds",
+            "LabKey request wall time",
+            labels,
+            namespace=namespace,
+            buckets=buckets,
+            registry=registry,
+        )
+        self.response_size = Counter(
+            "response_bytes",
+            "LabKey response body size",
+            labels,
+            namespace=namespace,
+            registry=registry,
+        )
+        self.errors = Counter(
+            "request_errors",
+            "LabKey requests that failed without a response",
+            ["endpoint", "method"],
+            namespace=namespace,
+            registry=registry,
+        )
+
+    def after_response(self, event: RequestEvent):
+        labels = (event.endpoint, event.method, str(event.status_code))
+        self.duration.labels(*labels).observe(event.elapsed)
+
+        if event.response_size is not None:
+            self.response_size.labels(*labels).inc(event.response_size)
+
+    def on_error(self, event: RequestEvent):
+        if event.status_code is None:
+            self.errors.labels(event.endpoint, event.method).inc()
+        else:
+            self.after_response(event)
+
+
+class OpenTelemetryListener(RequestListener):
+    """
+    Records request metrics through the OpenTelemetry metrics API, which must be installed separately (pip install
+    opentelemetry-api).
+    """
+
+    def __init__(self, meter=None):
+        # We localize the import of opentelemetry here so it is an optional dependency.
+        from opentelemetry import metrics
+
+        meter = meter or metrics.get_meter("labkey")
+        self.duration = meter.create_histogram(
+            "labkey.request.duration", unit="s", description="LabKey request wall time"
+        )
+        self.response_size = meter.create_histogram(
+            "labkey.response.size", unit="By", description="LabKey response body size"
+        )
+
+    def _attributes(self, event: RequestEvent):
+        attributes = {"endpoint": event.endpoint, "http.method": event.method}
+
+        if event.status_code is not None:
+            attributes["http.status_code"] = event.status_code
+
+        if event.exception is not None:
+            attributes["error.type"] = type(event.exception).__name__
+
+        return attributes
+
+    def after_response(self, event: RequestEvent):
+        attributes = self._attributes(event)
+        self.duration.record(event.elapsed, attributes)
+
+        if event.response_size is not None:
+            self.response_size.record(event.response_size, attributes)
+
+    def on_error(self, event: RequestEvent):
+        self.duration.record(event.elapsed, self._attributes(event))
@@ -0,0 +1,189 @@
+"""
+Profiling for ServerContext requests. Attributes the time of each call to building the JSON payload (encode), the HTTP
+transfer, decoding the JSON response (decode), and building result objects such as Domain or Batch (construct):
+
+    from labkey.profiling import profile
+
+    with profile(api.server_context) as profiler:
+        api.domain.get("lists", "Samples")
+
+    print(profiler.format_summary())
+
+Pass sampler="cprofile" or sampler="pyinstrument" to also profile all Python code run inside the block, then use
+dump() to write the results. pyinstrument must be installed separately (pip install pyinstrument).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from .instrumentation import _parse_endpoint
+
+PHASES = ("encode", "transfer", "decode", "construct")
+
+
+class CallProfile:
+    """
+    Time spent in each phase of a single request, in seconds.
+    """
+
+    def __init__(self, url: str, method: str, endpoint: str):
+        self.url = url
+        self.method = method
+        self.endpoint = endpoint
+        self.encode = 0.0
+        self.transfer = 0.0
+        self.decode = 0.0
+        self.construct = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.encode + self.transfer + self.decode + self.construct
+
+    def to_json(self):
+        return {
+            "url": self.url,
+            "method": self.method,
+            "endpoint": self.endpoint,
+            **{phase: getattr(self, phase) for phase in PHASES},
+            "total": self.total,
+        }
+
+    def __repr__(self):
+        return "<CallProfile [{} {:.3f}s]>".format(self.endpoint, self.total)
+
+
+class Profiler:
+    """
+    Records a CallProfile for every request made through a ServerContext while active. Use as a context manager, or
+    call start() and stop().
+    """
+
+    def __init__(self, server_context, sampler: str = None):
+        """
+        :param server_context: the ServerContext to profile
+        :param sampler: None, "cprofile", or "pyinstrument" to also profile all Python code while active
+        """
+        if sampler not in (None, "cprofile", "pyinstrument"):
+            raise ValueError('sampler must be None, "cprofile", or "pyinstrument"')
+
+        self.server_context = server_context
+        self.sampler = sampler
+        self.calls = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sampler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        if self.sampler == "cprofile":
+            import cProfile
+
+            self._sampler = cProfile.Profile()
+            self._sampler.enable()
+        elif self.sampler == "pyinstrument":
+            # We localize the import of pyinstrument here so it is an optional dependency.
+            from pyinstrument import Profiler as PyinstrumentProfiler
+
+            self._sampler = PyinstrumentProfiler()
+            self._sampler.start()
+
+        self.server_context._profiler = self
+        return self
+
+    def stop(self):
+        if self.server_context._profiler is self:
+            self.server_context._profiler = None
+
+        if self.sampler == "cprofile":
+            self._sampler.disable()
+        elif self.sampler == "pyinstrument":
+            self._sampler.stop()
+
+    def _begin(self, url: str, method: str) -> CallProfile:
+        call = CallProfile(url, method, "{}-{}".format(*_parse_endpoint(url)))
+
+        with self._lock:
+            self.calls.append(call)
+
+        self._local.call = call
+        return call
+
+    @contextmanager
+    def _phase(self, phase: str):
+        # Adds to the most recent call made on this thread, i.e. the request whose response is being processed
+        call = getattr(self._local, "call", None)
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            if call is not None:
+                setattr(call, phase, getattr(call, phase) + time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        """
+        :return: dict of endpoint to call count and total seconds per phase
+        """
+        summary = {}
+
+        with self._lock:
+            calls = list(self.calls)
+
+        for call in calls:
+            totals = summary.setdefault(
+                call.endpoint, {"calls": 0, **{phase: 0.0 for phase in PHASES}, "total": 0.0}
+            )
+            totals["calls"] += 1
+            totals["total"] += call.total
+
+            for phase in PHASES:
+                totals[phase] += getattr(call, phase)
+
+        return summary
+
+    def format_summary(self) -> str:
+        """
+        :return: the summary as a text table, slowest endpoint first
+        """
+        headers = ("endpoint", "calls") + PHASES + ("total",)
+        rows = [
+            (endpoint, str(totals["calls"]))
+            + tuple("{:.4f}".format(totals[column]) for column in PHASES + ("total",))
+            for endpoint, totals in sorted(
+                self.summary().items(), key=lambda item: item[1]["total"], reverse=True
+            )
+        ]
+        widths = [max(len(str(v)) for v in column) for column in zip(headers, *rows)]
+        lines = [
+            "  ".join(
+                v.ljust(w) if i == 0 else v.rjust(w) for i, (v, w) in enumerate(zip(row, widths))
+            )
+            for row in [headers] + rows
+        ]
+        lines.insert(1, "  ".join("-" * w for w in widths))
+
+        return "\n".join(lines)
+
+    def dump(self, path: str):
+        """
+        Writes the sampler's results. cProfile results are written in pstats format, pyinstrument results as HTML.
+        """
+        if self.sampler == "cprofile":
+            self._sampler.dump_stats(path)
+        elif self.sampler == "pyinstrument":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self._sampler.output_html())
+        else:
+            raise ValueError("dump() requires a sampler")
+
+
+def profile(server_context, sampler: str = None) -> Profiler:
+    """
+    Profiles the requests made through server_context. See Profiler.
+    """
+    return Profiler(server_context, sampler)
@@ -41,8 +41,14 @@ https://www.labkey.org/home/developer/forum/project-start.view
 ############################################################################
 """
 import functools
-from typing import List
-
+import threading
+import warnings
+import weakref
+from collections.abc import Mapping
+from concurrent.futures import Future
+from typing import Iterator, List, Optional, Union
+
+from . import deadline
 from .server_context import ServerContext
 from .utils import waf_encode
 
@@ -175,6 +181,275 @@ class AuditBehavior:
     SUMMARY = "SUMMARY"
 
 
+class CommandType:
+    """
+    Enum of saveRows command types
+    """
+
+    INSERT = "insert"
+    INSERT_WITH_KEYS = "insertWithKeys"
+    UPDATE = "update"
+    UPDATE_CHANGING_KEYS = "updateChangingKeys"
+    DELETE = "delete"
+    MOVE = "move"
+
+
+class Command:
+    """
+    A single command sent as part of a save_rows request
+    """
+
+    def __init__(
+        self,
+        command: str,
+        schema_name: str,
+        query_name: str,
+        rows: List[any],
+        container_path: str = None,
+        skip_reselect_rows: bool = None,
+        audit_behavior: AuditBehavior = None,
+        audit_user_comment: str = None,
+        extra_context: dict = None,
+    ):
+        self.command = command
+        self.schema_name = schema_name
+        self.query_name = query_name
+        self.rows = rows
+        self.container_path = container_path
+        self.skip_reselect_rows = skip_reselect_rows
+        self.audit_behavior = audit_behavior
+        self.audit_user_comment = audit_user_comment
+        self.extra_context = extra_context
+
+    def to_json(self):
+        data = {
+            "command": self.command,
+            "schemaName": self.schema_name,
+            "queryName": self.query_name,
+            "rows": self.rows,
+        }
+
+        if self.container_path is not None:
+            data["containerPath"] = self.container_path
+
+        if self.skip_reselect_rows is True:
+            data["skipReselectRows"] = self.skip_reselect_rows
+
+        if self.audit_behavior is not None:
+            data["auditBehavior"] = self.audit_behavior
+
+        if self.audit_user_comment is not None:
+            data["auditUserComment"] = self.audit_user_comment
+
+        if self.extra_context is not None:
+            data["extraContext"] = self.extra_context
+
+        return data
+
+    def __repr__(self):
+        return "<Command [{} {}.{} ({} rows)]>".format(
+            self.command, self.schema_name, self.query_name, len(self.rows)
+        )
+
+
+class InsertRowsCommand(Command):
+    def __init__(self, schema_name: str, query_name: str, rows: List[any], **kwargs):
+        super().__init__(CommandType.INSERT, schema_name, query_name, rows, **kwargs)
+
+
+class UpdateRowsCommand(Command):
+    def __init__(self, schema_name: str, query_name: str, rows: List[any], **kwargs):
+        super().__init__(CommandType.UPDATE, schema_name, query_name, rows, **kwargs)
+
+
+class DeleteRowsCommand(Command):
+    def __init__(self, schema_name: str, query_name: str, rows: List[any], **kwargs):
+        super().__init__(CommandType.DELETE, schema_name, query_name, rows, **kwargs)
+
+
+class MoveRowsCommand(Command):
+    def __init__(
+        self,
+        target_container_path: str,
+        schema_name: str,
+        query_name: str,
+        rows: List[any],
+        **kwargs,
+    ):
+        super().__init__(CommandType.MOVE, schema_name, query_name, rows, **kwargs)
+        self.target_container_path = target_container_path
+
+    def to_json(self):
+        data = super().to_json()
+        data["targetContainerPath"] = self.target_container_path
+        return data
+
+
+class CompactRow(Mapping):
+    """
+    Read-only, dict-like result row. Rows with the same columns share a single column index and store their values in
+    a tuple, which uses a fraction of the memory of a dict per row. Supports row["Name"], row.get("Name"), keys(),
+    items(), iteration, and comparison with dicts.
+    """
+
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index: dict, values: tuple):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __repr__(self):
+        return "<CompactRow {}>".format(self.to_dict())
+
+    def __getstate__(self):
+        return self._index, self._values
+
+    def __setstate__(self, state):
+        self._index, self._values = state
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._index, self._values))
+
+
+def compact_rows(rows: List[dict]) -> List[CompactRow]:
+    """
+    Converts a list of row dicts into CompactRows, in place. Column names are stored once per distinct set of columns
+    instead of once per row.
+    :param rows: the "rows" list of a select_rows or execute_sql response
+    :return: the same list, holding CompactRows
+    """
+    indexes = {}
+
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            continue
+
+        columns = tuple(row)
+        index = indexes.get(columns)
+
+        if index is None:
+            index = {column: position for position, column in enumerate(columns)}
+            indexes[columns] = index
+
+        rows[i] = CompactRow(index, tuple(row.values()))
+
+    return rows
+
+
+def _compact_response(response: any) -> any:
+    if isinstance(response, dict) and isinstance(response.get("rows"), list):
+        compact_rows(response["rows"])
+
+    return response
+
+
+class _TrackedRow(CompactRow):
+    __slots__ = ("_usage",)
+
+    def __init__(self, index: dict, values: tuple, usage: "ColumnUsage"):
+        super().__init__(index, values)
+        self._usage = usage
+
+    def __getitem__(self, key):
+        value = self._values[self._index[key]]
+        self._usage.read.add(key)
+        return value
+
+    def __getstate__(self):
+        return self._index, self._values, self._usage
+
+    def __setstate__(self, state):
+        self._index, self._values, self._usage = state
+
+
+class ColumnUsage:
+    """
+    Records which columns of a result are returned by the server and which are actually read. See
+    query.track_column_usage.
+    """
+
+    def __init__(self):
+        self.returned = set()
+        self.read = set()
+
+    @property
+    def unread(self) -> set:
+        return self.returned - self.read
+
+    def report(self) -> dict:
+        return {
+            "returned": len(self.returned),
+            "read": len(self.read & self.returned),
+            "unread": sorted(self.unread),
+        }
+
+    def warn_if_unused(self, max_unread_ratio: float = 0.5) -> bool:
+        """
+        Issues a ResourceWarning when more than max_unread_ratio of the returned columns were never read.
+        :return: True if a warning was issued
+        """
+        if not self.returned:
+            return False
+
+        unread = self.unread
+
+        if len(unread) / len(self.returned) <= max_unread_ratio:
+            return False
+
+        warnings.warn(
+            "{} of {} returned columns were never read, consider passing columns to select_rows: {}".format(
+                len(unread), len(self.returned), ", ".join(sorted(unread))
+            ),
+            ResourceWarning,
+            stacklevel=2,
+        )
+        return True
+
+
+def track_column_usage(response: dict) -> ColumnUsage:
+    """
+    Converts the rows of a select_rows or execute_sql response into CompactRows, in place, that record which columns
+    are read. Once the rows have been processed, ColumnUsage.report() and ColumnUsage.warn_if_unused() show whether the
+    request returned columns that could have been left out.
+    :param response: a select_rows or execute_sql response
+    :return: ColumnUsage
+    """
+    usage = ColumnUsage()
+    rows = response.get("rows", [])
+    indexes = {}
+
+    for i, row in enumerate(rows):
+        if isinstance(row, CompactRow):
+            index, values = row._index, row._values
+        elif isinstance(row, dict):
+            columns = tuple(row)
+            index = indexes.get(columns)
+            values = tuple(row.values())
+
+            if index is None:
+                index = {column: position for position, column in enumerate(columns)}
+                indexes[columns] = index
+        else:
+            continue
+
+        usage.returned.update(index)
+        rows[i] = _TrackedRow(index, values, usage)
+
+    return usage
+
+
 def delete_rows(
     server_context: ServerContext,
     schema_name: str,
@@ -258,7 +533,8 @@ def execute_sql(
     parameters: dict = None,
     required_version: float = None,
     timeout: int = _default_timeout,
-    waf_encode_sql: bool = True
+    waf_encode_sql: bool = True,
+    compact_rows: bool = False,
 ):
     """
     Execute sql query against a LabKey server.
@@ -277,6 +553,7 @@ def execute_sql(
     :param required_version: Api version of response
     :param timeout: timeout of request in seconds (defaults to 30s)
     :param waf_encode_sql: WAF encode sql in request (defaults to True)
+    :param compact_rows: return rows as memory efficient, read-only CompactRows instead of dicts (defaults to False)
     :return:
     """
     url = server_context.build_url("query", "executeSql.api", container_path=container_path)
@@ -305,7 +582,12 @@ def execute_sql(
     if required_version is not None:
         payload["apiVersion"] = required_version
 
-    return server_context.make_request(url, payload, timeout=timeout)
+    response = server_context.make_request(url, payload, timeout=timeout, read_only=True)
+
+    if compact_rows:
+        return _compact_response(response)
+
+    return response
 
 
 def insert_rows(
@@ -378,6 +660,8 @@ def select_rows(
     required_version: float = None,
     timeout: int = _default_timeout,
     ignore_filter: bool = None,
+    compact_rows: bool = False,
+    include_metadata: bool = None,
 ):
     """
     Query data from a LabKey server
@@ -387,7 +671,8 @@ def select_rows(
     :param view_name: pre-existing named view
     :param filter_array: set of filter objects to apply
     :param container_path: folder path if not already part of server_context
-    :param columns: set of columns to retrieve
+    :param columns: set of columns to retrieve, either a comma separated string or a list of column names. See
+        query.project_columns to validate column names and lookup paths before querying.
     :param max_rows: max number of rows to retrieve, defaults to -1 (unlimited)
     :param sort: comma separated list of column names to sort by, prefix a column with '-' to sort descending
     :param offset: number of rows to offset results by
@@ -402,6 +687,8 @@ def select_rows(
     :param required_version: decimal value that indicates the response version of the api
     :param timeout: Request timeout in seconds (defaults to 30s)
     :param ignore_filter: Boolean, if true, the command will ignore any filter that may be part of the chosen view.
+    :param compact_rows: return rows as memory efficient, read-only CompactRows instead of dicts (defaults to False)
+    :param include_metadata: Boolean, if false, the response will not include the metaData and columnModel sections
     :return:
     """
     url = server_context.build_url("query", "getQuery.api", container_path=container_path)
@@ -420,6 +707,8 @@ def select_rows(
             payload[prefix] = filters
 
     if columns is not None:
+        if not isinstance(columns, str):
+            columns = ",".join(columns)
         payload["query.columns"] = columns
 
     if max_rows is not None:
@@ -459,7 +748,217 @@ def select_rows(
     if ignore_filter is not None and ignore_filter is True:
         payload["query.ignoreFilter"] = 1
 
-    return server_context.make_request(url, payload, timeout=timeout)
+    if include_metadata is not None:
+        payload["includeMetadata"] = include_metadata
+
+    response = server_context.make_request(url, payload, timeout=timeout, read_only=True)
+
+    if compact_rows:
+        return _compact_response(response)
+
+    return response
+
+
+def iter_rows(
+    server_context: ServerContext,
+    schema_name: str,
+    query_name: str,
+    page_size: int = 1000,
+    view_name: str = None,
+    filter_array: List[QueryFilter] = None,
+    container_path: str = None,
+    columns=None,
+    sort: str = None,
+    container_filter: str = None,
+    parameters: dict = None,
+    timeout: int = _default_timeout,
+    compact_rows: bool = False,
+) -> Iterator[dict]:
+    """
+    Iterate over the rows of a query one page at a time, so that large results never have to be held in memory at
+    once. Pages are requested with select_rows using max_rows and offset. Pass a sort on a unique column (e.g. the
+    primary key) so rows are not skipped or repeated between pages if the table changes while iterating.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param schema_name: schema of table
+    :param query_name: table name to select from
+    :param page_size: number of rows requested per page
+    :param view_name: pre-existing named view
+    :param filter_array: set of filter objects to apply
+    :param container_path: folder path if not already part of server_context
+    :param columns: set of columns to retrieve
+    :param sort: comma separated list of column names to sort by, prefix a column with '-' to sort descending
+    :param container_filter: enumeration of the various container filters available. See select_rows.
+    :param parameters: Set of parameters to pass along to a parameterized query
+    :param timeout: Request timeout in seconds for each page (defaults to 300s)
+    :param compact_rows: yield read-only CompactRows instead of dicts (defaults to False)
+    :return: iterator of rows
+    """
+    select_page = functools.partial(
+        select_rows,
+        server_context,
+        schema_name,
+        query_name,
+        view_name=view_name,
+        filter_array=filter_array,
+        container_path=container_path,
+        columns=columns,
+        sort=sort,
+        container_filter=container_filter,
+        parameters=parameters,
+        timeout=timeout,
+        compact_rows=compact_rows,
+        include_metadata=False,
+    )
+
+    # Pages are fetched as the iterator is consumed, possibly after the deadline block that created it has exited
+    return _iter_pages(select_page, page_size, deadline.current())
+
+
+def _iter_pages(select_page, page_size: int, at: float):
+    offset = 0
+
+    while True:
+        with deadline.deadline_at(at):
+            response = select_page(max_rows=page_size, offset=offset)
+
+        rows = response.get("rows", [])
+        yield from rows
+
+        if len(rows) < page_size:
+            return
+
+        offset += len(rows)
+
+
+def get_query_details(
+    server_context: ServerContext,
+    schema_name: str,
+    query_name: str,
+    container_path: str = None,
+    timeout: int = _default_timeout,
+) -> dict:
+    """
+    Get the column metadata of a query
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param schema_name: schema of table
+    :param query_name: table name to get details for
+    :param container_path: labkey container path if not already set in context
+    :param timeout: timeout of request in seconds (defaults to 300s)
+    :return:
+    """
+    url = server_context.build_url("query", "getQueryDetails.api", container_path=container_path)
+    payload = {"schemaName": schema_name, "queryName": query_name}
+
+    return server_context.make_request(url, payload, method="GET", timeout=timeout)
+
+
+# Query details used by project_columns, per ServerContext. Keyed by (container_path, schema_name, query_name).
+_query_details_cache = weakref.WeakKeyDictionary()
+
+
+def _get_cached_query_details(
+    server_context: ServerContext,
+    schema_name: str,
+    query_name: str,
+    container_path: str,
+    refreshed: Optional[set],
+) -> dict:
+    """
+    :param refreshed: keys reloaded so far by the calling project_columns, None to use cached details
+    """
+    cache = _query_details_cache.setdefault(server_context, {})
+    key = (container_path, schema_name.lower(), query_name.lower())
+
+    if key not in cache or (refreshed is not None and key not in refreshed):
+        if refreshed is not None:
+            refreshed.add(key)
+
+        details = get_query_details(server_context, schema_name, query_name, container_path)
+        cache[key] = {column["name"].lower(): column for column in details.get("columns", [])}
+
+    return cache[key]
+
+
+def project_columns(
+    server_context: ServerContext,
+    schema_name: str,
+    query_name: str,
+    columns: Union[str, List[str]],
+    container_path: str = None,
+    refresh: bool = False,
+) -> str:
+    """
+    Validates a set of columns against the query's metadata and returns them in the form accepted by the columns
+    parameter of select_rows. Lookup columns may be followed through with "/", e.g. "CreatedBy/Email", and "Lookup/*"
+    expands to every visible column of the lookup target. Column names are matched case-insensitively and returned with
+    the server's casing. Query metadata is cached per ServerContext, pass refresh=True to reload it.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param schema_name: schema of table
+    :param query_name: table name the columns belong to
+    :param columns: comma separated string or list of column names and lookup paths
+    :param container_path: labkey container path if not already set in context
+    :param refresh: whether to reload cached query metadata
+    :return: comma separated list of validated columns
+    """
+    if isinstance(columns, str):
+        columns = [column.strip() for column in columns.split(",") if column.strip()]
+
+    projected = []
+    errors = []
+    # Each query is reloaded at most once, however many columns and lookups go through it
+    refreshed = set() if refresh else None
+
+    for column in columns:
+        try:
+            projected.extend(
+                _expand_column(
+                    server_context, schema_name, query_name, column, container_path, refreshed
+                )
+            )
+        except ValueError as e:
+            errors.append(str(e))
+
+    if errors:
+        raise ValueError(
+            "Invalid columns for {}.{}: {}".format(schema_name, query_name, "; ".join(errors))
+        )
+
+    return ",".join(dict.fromkeys(projected))
+
+
+def _expand_column(server_context, schema_name, query_name, column, container_path, refreshed):
+    parts = column.split("/")
+    resolved = []
+
+    for position, part in enumerate(parts):
+        details = _get_cached_query_details(
+            server_context, schema_name, query_name, container_path, refreshed
+        )
+
+        if part == "*" and position == len(parts) - 1 and position > 0:
+            prefix = "/".join(resolved)
+            return [
+                prefix + "/" + info["name"] for info in details.values() if not info.get("hidden")
+            ]
+
+        info = details.get(part.lower())
+
+        if info is None:
+            raise ValueError('"{}" has no column "{}"'.format(column, part))
+
+        resolved.append(info["name"])
+
+        if position < len(parts) - 1:
+            lookup = info.get("lookup")
+
+            if not lookup:
+                raise ValueError('"{}" is not a lookup column'.format("/".join(resolved)))
+
+            schema_name = lookup["schemaName"]
+            query_name = lookup["queryName"]
+            container_path = lookup.get("containerPath") or container_path
+
+    return ["/".join(resolved)]
 
 
 def update_rows(
@@ -553,6 +1052,260 @@ def move_rows(
     )
 
 
+def save_rows(
+    server_context: ServerContext,
+    commands: List[Command],
+    container_path: str = None,
+    transacted: bool = True,
+    validate_only: bool = False,
+    audit_behavior: AuditBehavior = None,
+    audit_user_comment: str = None,
+    extra_context: dict = None,
+    api_version: float = None,
+    timeout: int = _default_timeout,
+):
+    """
+    Send a set of insert, update, delete, and move commands in a single request. When transacted all of the commands
+    are committed together or not at all.
+    :param server_context: A LabKey server context. See utils.create_server_context.
+    :param commands: Set of Command objects to execute, in order. See InsertRowsCommand, UpdateRowsCommand,
+        DeleteRowsCommand, and MoveRowsCommand.
+    :param container_path: labkey container path if not already set in context
+    :param transacted: whether all of the commands should be done in a single transaction
+    :param validate_only: whether the commands should be validated and rolled back instead of committed
+    :param audit_behavior: audit behavior for commands that do not set their own. See class query.AuditBehavior
+    :param audit_user_comment: audit comment for commands that do not set their own
+    :param extra_context: extra context object passed to the server for all commands
+    :param api_version: Api version of response
+    :param timeout: timeout of request in seconds (defaults to 300s)
+    :return: the response, with one "result" entry per command
+    """
+    url = server_context.build_url("query", "saveRows.api", container_path=container_path)
+    json_commands = []
+
+    for command in commands:
+        if not isinstance(command, Command):
+            raise Exception('save_rows() "commands" expected to be a set of Command instances')
+
+        json_command = command.to_json()
+
+        if audit_behavior is not None:
+            json_command.setdefault("auditBehavior", audit_behavior)
+
+        if audit_user_comment is not None:
+            json_command.setdefault("auditUserComment", audit_user_comment)
+
+        json_commands.append(json_command)
+
+    payload = {"commands": json_commands}
+
+    if transacted is False:
+        payload["transacted"] = transacted
+
+    if validate_only is True:
+        payload["validateOnly"] = validate_only
+
+    if extra_context is not None:
+        payload["extraContext"] = extra_context
+
+    if api_version is not None:
+        payload["apiVersion"] = api_version
+
+    return server_context.make_request(
+        url,
+        json=payload,
+        timeout=timeout,
+    )
+
+
+class QueryBatcher:
+    """
+    Collects insert_rows, update_rows and delete_rows calls and sends them as combined requests, one request per
+    command and schema.query, once max_rows rows are pending or max_delay seconds have passed since the first pending
+    call. Each call returns a Future that resolves to that caller's share of the response. Use as a context manager,
+    pending rows are flushed on exit. With use_save_rows every flush is sent as a single saveRows.api request holding
+    one command per schema.query.
+
+        with api.query.batch(max_rows=500, max_delay=0.5) as batch:
+            future = batch.update_rows("lists", "Events", [{"Key": 1, "Status": "done"}])
+        rows = future.result()["rows"]
+
+    Errors are reported through the futures of the calls that were part of the failed request.
+    """
+
+    def __init__(
+        self,
+        server_context: ServerContext,
+        max_rows: int = 1000,
+        max_delay: float = None,
+        container_path: str = None,
+        transacted: bool = True,
+        audit_behavior: AuditBehavior = None,
+        audit_user_comment: str = None,
+        timeout: int = _default_timeout,
+        use_save_rows: bool = False,
+    ):
+        """
+        :param server_context: A LabKey server context. See utils.create_server_context.
+        :param max_rows: number of pending rows that triggers a flush
+        :param max_delay: seconds after the first pending call that trigger a flush, defaults to None (no time limit)
+        :param container_path: labkey container path if not already set in context
+        :param transacted: whether each combined request should be done in a single transaction
+        :param audit_behavior: used to override the audit behavior for the requests. See class query.AuditBehavior
+        :param audit_user_comment: used to provide a comment that will be attached to certain detailed audit log records
+        :param timeout: timeout of each combined request in seconds (defaults to 300s)
+        :param use_save_rows: send each flush as one saveRows.api request instead of one request per schema.query
+        """
+        self.server_context = server_context
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.container_path = container_path
+        self.transacted = transacted
+        self.audit_behavior = audit_behavior
+        self.audit_user_comment = audit_user_comment
+        self.timeout = timeout
+        self.use_save_rows = use_save_rows
+        # Flushes, including those from the max_delay timer thread, keep the deadline active when the batcher was made
+        self._deadline_at = deadline.current()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_rows = 0
+        self._timer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def insert_rows(
+        self, schema_name: str, query_name: str, rows: List[any], container_path: str = None
+    ) -> Future:
+        return self._add("insert", schema_name, query_name, rows, container_path)
+
+    def update_rows(
+        self, schema_name: str, query_name: str, rows: List[any], container_path: str = None
+    ) -> Future:
+        return self._add("update", schema_name, query_name, rows, container_path)
+
+    def delete_rows(
+        self, schema_name: str, query_name: str, rows: List[any], container_path: str = None
+    ) -> Future:
+        return self._add("delete", schema_name, query_name, rows, container_path)
+
+    def _add(self, command, schema_name, query_name, rows, container_path):
+        future = Future()
+        key = (command, schema_name, query_name, container_path or self.container_path)
+        flush_now = False
+
+        with self._lock:
+            self._pending.setdefault(key, []).append((rows, future))
+            self._pending_rows += len(rows)
+
+            if self._pending_rows >= self.max_rows:
+                flush_now = True
+            elif self.max_delay is not None and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if flush_now:
+            self.flush()
+
+        return future
+
+    def flush(self):
+        """
+        Sends all pending calls now.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._pending_rows = 0
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        with deadline.deadline_at(self._deadline_at):
+            if self.use_save_rows and pending:
+                self._send_save_rows(pending)
+            else:
+                for key, entries in pending.items():
+                    self._send(key, entries)
+
+    def _send(self, key, entries):
+        command, schema_name, query_name, container_path = key
+        api_method = {"insert": insert_rows, "update": update_rows, "delete": delete_rows}[command]
+        rows = [row for entry_rows, _ in entries for row in entry_rows]
+
+        try:
+            response = api_method(
+                self.server_context,
+                schema_name,
+                query_name,
+                rows,
+                container_path=container_path,
+                transacted=self.transacted,
+                audit_behavior=self.audit_behavior,
+                audit_user_comment=self.audit_user_comment,
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+            return
+
+        _resolve_futures(response, entries)
+
+    def _send_save_rows(self, pending):
+        commands = []
+        for (command, schema_name, query_name, container_path), entries in pending.items():
+            rows = [row for entry_rows, _ in entries for row in entry_rows]
+            commands.append(Command(command, schema_name, query_name, rows, container_path))
+
+        try:
+            response = save_rows(
+                self.server_context,
+                commands,
+                container_path=self.container_path,
+                transacted=self.transacted,
+                audit_behavior=self.audit_behavior,
+                audit_user_comment=self.audit_user_comment,
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            for entries in pending.values():
+                for _, future in entries:
+                    future.set_exception(e)
+            return
+
+        results = response.get("result", []) if isinstance(response, dict) else []
+
+        for i, entries in enumerate(pending.values()):
+            command_response = results[i] if i < len(results) else response
+            _resolve_futures(command_response, entries)
+
+
+def _resolve_futures(response: dict, entries: list):
+    # Each caller gets a copy of the response holding only its own rows. If the server did not return one row per
+    # submitted row we can't tell which rows belong to whom, so every caller gets the complete response.
+    response_rows = response.get("rows") if isinstance(response, dict) else None
+    submitted = sum(len(entry_rows) for entry_rows, _ in entries)
+
+    if response_rows is None or len(response_rows) != submitted:
+        for _, future in entries:
+            future.set_result(response)
+        return
+
+    start = 0
+    for entry_rows, future in entries:
+        end = start + len(entry_rows)
+        result = {**response, "rows": response_rows[start:end], "rowsAffected": end - start}
+        future.set_result(result)
+        start = end
+
+
 class QueryWrapper:
     """
     Wrapper for all of the API methods exposed in the query module. Used by the APIWrapper class.
@@ -605,7 +1358,8 @@ class QueryWrapper:
         parameters: dict = None,
         required_version: float = None,
         timeout: int = _default_timeout,
-        waf_encode_sql: bool = True
+        waf_encode_sql: bool = True,
+        compact_rows: bool = False,
     ):
         return execute_sql(
             self.server_context,
@@ -620,7 +1374,8 @@ class QueryWrapper:
             parameters,
             required_version,
             timeout,
-            waf_encode_sql
+            waf_encode_sql,
+            compact_rows,
         )
 
     @functools.wraps(insert_rows)
@@ -671,6 +1426,8 @@ class QueryWrapper:
         required_version: float = None,
         timeout: int = _default_timeout,
         ignore_filter: bool = None,
+        compact_rows: bool = False,
+        include_metadata: bool = None,
     ):
         return select_rows(
             self.server_context,
@@ -693,6 +1450,65 @@ class QueryWrapper:
             required_version,
             timeout,
             ignore_filter,
+            compact_rows,
+            include_metadata,
+        )
+
+    @functools.wraps(iter_rows)
+    def iter_rows(
+        self,
+        schema_name: str,
+        query_name: str,
+        page_size: int = 1000,
+        view_name: str = None,
+        filter_array: List[QueryFilter] = None,
+        container_path: str = None,
+        columns=None,
+        sort: str = None,
+        container_filter: str = None,
+        parameters: dict = None,
+        timeout: int = _default_timeout,
+        compact_rows: bool = False,
+    ):
+        return iter_rows(
+            self.server_context,
+            schema_name,
+            query_name,
+            page_size,
+            view_name,
+            filter_array,
+            container_path,
+            columns,
+            sort,
+            container_filter,
+            parameters,
+            timeout,
+            compact_rows,
+        )
+
+    @functools.wraps(get_query_details)
+    def get_query_details(
+        self,
+        schema_name: str,
+        query_name: str,
+        container_path: str = None,
+        timeout: int = _default_timeout,
+    ):
+        return get_query_details(
+            self.server_context, schema_name, query_name, container_path, timeout
+        )
+
+    @functools.wraps(project_columns)
+    def project_columns(
+        self,
+        schema_name: str,
+        query_name: str,
+        columns: Union[str, List[str]],
+        container_path: str = None,
+        refresh: bool = False,
+    ):
+        return project_columns(
+            self.server_context, schema_name, query_name, columns, container_path, refresh
         )
 
     @functools.wraps(update_rows)
@@ -744,3 +1560,55 @@ class QueryWrapper:
             audit_user_comment,
             timeout
         )
+
+    def batch(
+        self,
+        max_rows: int = 1000,
+        max_delay: float = None,
+        container_path: str = None,
+        transacted: bool = True,
+        audit_behavior: AuditBehavior = None,
+        audit_user_comment: str = None,
+        timeout: int = _default_timeout,
+        use_save_rows: bool = False,
+    ) -> QueryBatcher:
+        """
+        Creates a QueryBatcher that combines insert, update and delete calls into fewer requests. See query.QueryBatcher.
+        """
+        return QueryBatcher(
+            self.server_context,
+            max_rows,
+            max_delay,
+            container_path,
+            transacted,
+            audit_behavior,
+            audit_user_comment,
+            timeout,
+            use_save_rows,
+        )
+
+    @functools.wraps(save_rows)
+    def save_rows(
+        self,
+        commands: List[Command],
+        container_path: str = None,
+        transacted: bool = True,
+        validate_only: bool = False,
+        audit_behavior: AuditBehavior = None,
+        audit_user_comment: str = None,
+        extra_context: dict = None,
+        api_version: float = None,
+        timeout: int = _default_timeout,
+    ):
+        return save_rows(
+            self.server_context,
+            commands,
+            container_path,
+            transacted,
+            validate_only,
+            audit_behavior,
+            audit_user_comment,
+            extra_context,
+            api_version,
+            timeout,
+        )
@@ -1,8 +1,18 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from typing import Tuple, Union
+from urllib.parse import urlencode
+
+from labkey.deadline import expired, limit_timeout, remaining
 from labkey.utils import json_dumps
+from labkey.instrumentation import RequestEvent, RequestListener
+from labkey.transport import HttpxTransport, RequestsTransport
 from . import __version__
-import requests
-from requests.exceptions import RequestException
+from requests.exceptions import RequestException, Timeout
 from labkey.exceptions import (
+    DeadlineExceededError,
     RequestError,
     RequestAuthorizationError,
     QueryNotFoundError,
@@ -62,6 +72,11 @@ class ServerContext:
         verify_ssl=True,
         api_key=None,
         disable_csrf=False,
+        http2=False,
+        transport=None,
+        throttle=None,
+        circuit_breaker=None,
+        coalesce_reads=False,
     ):
         self._container_path = container_path
         self._context_path = context_path
@@ -70,15 +85,26 @@ class ServerContext:
         self._verify_ssl = verify_ssl
         self._api_key = api_key
         self._disable_csrf = disable_csrf
-        self._session = requests.Session()
-        self._session.headers.update({"User-Agent": f"LabKey Python API/{__version__}"})
+        self._scheme = "https://" if self._use_ssl else "http://"
+        verify = verify_ssl or not use_ssl
 
-        if self._use_ssl:
-            self._scheme = "https://"
-            if not self._verify_ssl:
-                self._session.verify = False
-        else:
-            self._scheme = "http://"
+        if transport is None:
+            if http2:
+                transport = HttpxTransport(verify=verify, http2=True)
+            else:
+                transport = RequestsTransport(verify=verify)
+
+        self._transport = transport
+        self._transport.headers.update({"User-Agent": f"LabKey Python API/{__version__}"})
+        self._listeners = []
+        self._profiler = None
+        self._circuit_breaker = circuit_breaker
+        self._coalesce_reads = coalesce_reads
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+
+        if throttle is not None:
+            self.add_request_listener(throttle)
 
     def __repr__(self):
         return f"<ServerContext [ {self._domain} | {self._context_path} | {self._container_path} ]>"
@@ -158,6 +184,65 @@ class ServerContext:
 
         return client
 
+    def add_request_listener(self, listener: RequestListener):
+        """
+        Registers a listener that is called before each request, after each response, and when a request fails. See
+        labkey.instrumentation.
+        """
+        self._listeners = [*self._listeners, listener]
+
+    def remove_request_listener(self, listener: RequestListener):
+        self._listeners = [l for l in self._listeners if l is not listener]
+
+    def _notify(self, callback: str, event: RequestEvent):
+        error = None
+
+        for listener in self._listeners:
+            # A failing listener doesn't stop the others, e.g. a Throttle still gets its slot back in on_error
+            try:
+                getattr(listener, callback)(event)
+            except BaseException as e:
+                if error is None:
+                    error = e
+
+        if error is not None:
+            raise error
+
+    def profile_phase(self, phase: str):
+        """
+        Attributes the time spent in the with block to a phase of the most recent request when profiling. See
+        labkey.profiling.
+        """
+        if self._profiler is None:
+            return nullcontext()
+
+        return self._profiler._phase(phase)
+
+    def _probe(self, timeout: float) -> bool:
+        """
+        Whether the server answers a whoami.api request without a 5xx status. Used by the circuit breaker.
+        """
+        try:
+            response = self._transport.request(
+                "GET", self.build_url("login", "whoami.api"), timeout=timeout
+            )
+        except RequestException:
+            return False
+
+        return response.status_code < 500
+
+    def _record_outcome(self, exception: RequestException = None):
+        if self._circuit_breaker is None:
+            return
+
+        # Only count failures that say the server is unavailable, a 4xx response means it is up
+        response = getattr(exception, "response", None)
+
+        if exception is not None and (response is None or response.status_code >= 500):
+            self._circuit_breaker.record_failure()
+        else:
+            self._circuit_breaker.record_success()
+
     def handle_request_exception(self, exception):
         if type(exception) in [RequestAuthorizationError, QueryNotFoundError, ServerNotFoundError]:
             raise exception
@@ -169,48 +254,196 @@ class ServerContext:
         url: str,
         payload: any = None,
         headers: dict = None,
-        timeout: int = 300,
+        timeout: Union[float, Tuple[float, float]] = 300,
         method: str = "POST",
         non_json_response: bool = False,
         file_payload: any = None,
         json: dict = None,
+        read_only: bool = False,
+    ) -> any:
+        args = (url, payload, headers, timeout, method, non_json_response, file_payload, json)
+
+        # GETs, and POSTs marked read_only, can share the response of an identical request that is already in flight
+        if self._coalesce_reads and file_payload is None and (method == "GET" or read_only):
+            key = json_dumps(
+                [method, url, payload, json, headers, non_json_response],
+                sort_keys=True,
+                default=str,
+            )
+            return self._coalesce(key, args)
+
+        return self._make_request(*args)
+
+    def _coalesce(self, key: str, args: tuple) -> any:
+        while True:
+            with self._in_flight_lock:
+                future = self._in_flight.get(key)
+                leader = future is None
+
+                if leader:
+                    future = self._in_flight[key] = Future()
+
+            if leader:
+                break
+
+            try:
+                return _share(future.result(timeout=remaining()))
+            except FutureTimeoutError:
+                raise DeadlineExceededError()
+            except DeadlineExceededError:
+                # The leader ran out of its own deadline, this caller may have longer so it sends the request again
+                continue
+
+        try:
+            result = self._make_request(*args)
+        except BaseException as e:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+            future.set_exception(e)
+            raise
+
+        with self._in_flight_lock:
+            del self._in_flight[key]
+
+        future.set_result(result)
+        return _share(result)
+
+    def _make_request(
+        self, url, payload, headers, timeout, method, non_json_response, file_payload, json
     ) -> any:
+        # Raises DeadlineExceededError right away once a deadline set with labkey.deadline has passed
+        limit_timeout(timeout)
+        breaker = self._circuit_breaker
+
+        if breaker is not None:
+            breaker.before_request(self)
+
         if self._api_key is not None:
-            if self._session.headers.get(API_KEY_TOKEN) is not self._api_key:
-                self._session.headers.update({API_KEY_TOKEN: self._api_key})
+            if self._transport.headers.get(API_KEY_TOKEN) is not self._api_key:
+                self._transport.headers.update({API_KEY_TOKEN: self._api_key})
 
-        if not self._disable_csrf and CSRF_TOKEN not in self._session.headers.keys():
+        if not self._disable_csrf and CSRF_TOKEN not in self._transport.headers:
             try:
                 csrf_url = self.build_url("login", "whoami.api")
-                response = handle_response(self._session.get(csrf_url))
-                self._session.headers.update({CSRF_TOKEN: response["CSRF"]})
+                response = handle_response(
+                    self._transport.request("GET", csrf_url, timeout=limit_timeout(None))
+                )
+                self._transport.headers.update({CSRF_TOKEN: response["CSRF"]})
             except RequestException as e:
+                if _deadline_exceeded(e):
+                    raise DeadlineExceededError() from e
+
+                self._record_outcome(e)
                 self.handle_request_exception(e)
 
+        listeners = self._listeners
+        profiler = self._profiler
+        call = profiler._begin(url, method) if profiler is not None else None
+        event = None
+        data = payload
+
+        if json is not None and method != "GET" and file_payload is None:
+            if headers is None:
+                headers = {}
+
+            headers = {**headers, "Content-Type": "application/json"}
+
+            with self.profile_phase("encode"):
+                # sort_keys is a hack to make unit tests work
+                data = json_dumps(json, sort_keys=True)
+
+        if listeners:
+            event = RequestEvent(url, method, _payload_size(data, file_payload))
+
+        response = None
         try:
+            if event is not None:
+                self._notify("before_request", event)
+                event._start()
+
+            # Clipped to the deadline only now, listeners such as Throttle may have held the request back
+            request_timeout = limit_timeout(timeout)
+            started = time.perf_counter()
+
             if method == "GET":
-                response = self._session.get(url, params=payload, headers=headers, timeout=timeout)
+                response = self._transport.request(
+                    "GET", url, params=payload, headers=headers, timeout=request_timeout
+                )
             else:
-                if file_payload is not None:
-                    response = self._session.post(
-                        url,
-                        data=payload,
-                        files=file_payload,
-                        headers=headers,
-                        timeout=timeout,
-                    )
-                elif json is not None:
-                    if headers is None:
-                        headers = {}
-
-                    headers_ = {**headers, "Content-Type": "application/json"}
-                    # sort_keys is a hack to make unit tests work
-                    data = json_dumps(json, sort_keys=True)
-                    response = self._session.post(url, data=data, headers=headers_, timeout=timeout)
-                else:
-                    response = self._session.post(
-                        url, data=payload, headers=headers, timeout=timeout
-                    )
-            return handle_response(response, non_json_response)
+                response = self._transport.request(
+                    "POST",
+                    url,
+                    data=data,
+                    files=file_payload,
+                    headers=headers,
+                    timeout=request_timeout,
+                )
+
+            if call is not None:
+                call.transfer += time.perf_counter() - started
+
+            with self.profile_phase("decode"):
+                result = handle_response(response, non_json_response)
         except RequestException as e:
+            error = e
+
+            # Running out of the caller's deadline says nothing about the server's health
+            if not _deadline_exceeded(e):
+                self._record_outcome(e)
+            elif not isinstance(e, DeadlineExceededError):
+                # Listeners see the timeout as the DeadlineExceededError the caller gets
+                error = DeadlineExceededError()
+
+            if event is not None:
+                event._finish(response, error)
+                self._notify("on_error", event)
+
+            if isinstance(e, DeadlineExceededError):
+                raise
+
+            if error is not e:
+                raise error from e
+
             self.handle_request_exception(e)
+        except BaseException as e:
+            # Listeners may hold on to something from before_request until on_error, e.g. a Throttle's in flight slot
+            if event is not None:
+                event._finish(response, e)
+                self._notify("on_error", event)
+
+            raise
+        else:
+            self._record_outcome()
+
+            if event is not None:
+                event._finish(response)
+                self._notify("after_response", event)
+
+            return result
+
+
+def _deadline_exceeded(e: RequestException) -> bool:
+    return isinstance(e, DeadlineExceededError) or (isinstance(e, Timeout) and expired())
+
+
+def _share(result: any) -> any:
+    # Callers sharing a coalesced response each get their own copy of its top level dict and lists, so helpers that
+    # replace rows in place (e.g. compact_rows) don't affect the others. The rows themselves are shared.
+    if isinstance(result, dict):
+        return {k: list(v) if isinstance(v, list) else v for k, v in result.items()}
+
+    return result
+
+
+def _payload_size(data: any, file_payload: any):
+    if file_payload is not None:
+        return None
+
+    if isinstance(data, (str, bytes)):
+        return len(data)
+
+    if isinstance(data, dict):
+        return len(urlencode(data, doseq=True))
+
+    return None
@@ -0,0 +1,263 @@
+"""
+Client side rate limiting for ServerContext. A Throttle limits how many requests per second are sent, and how many
+are in flight at once, per endpoint, controller, or for all requests. It backs off when responses slow down or the
+server reports it is overloaded, and recovers gradually once requests succeed again:
+
+    from labkey.throttle import Limit, Throttle
+
+    throttle = Throttle(
+        default=Limit(rate=50, max_in_flight=8),
+        limits={"query-executeSql.api": Limit(rate=5, max_in_flight=2)},
+        target_latency=2.0,
+    )
+    api = APIWrapper("example.com", "project", throttle=throttle)
+
+A Throttle is a request listener, so it can also be added to an existing ServerContext with add_request_listener. One
+Throttle can be shared by several ServerContexts that talk to the same server.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from .deadline import remaining
+from .exceptions import DeadlineExceededError
+from .instrumentation import RequestEvent, RequestListener
+
+# Status codes that mean the server is overloaded, or failing, rather than rejecting the request itself
+OVERLOAD_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+
+
+class Limit:
+    """
+    Limits for a group of requests. Leave a limit as None to not enforce it.
+    """
+
+    def __init__(self, rate: float = None, burst: int = None, max_in_flight: int = None):
+        """
+        :param rate: requests per second, on average
+        :param burst: requests that can be sent at once after a quiet period, defaults to max(1, rate)
+        :param max_in_flight: requests that can be waiting for a response at the same time
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be greater than 0")
+
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate or 1)
+        self.max_in_flight = max_in_flight
+
+    def __repr__(self):
+        return "<Limit [rate={} burst={} max_in_flight={}]>".format(
+            self.rate, self.burst, self.max_in_flight
+        )
+
+
+class _Bucket:
+    """
+    Token bucket and in flight count for one Limit. factor scales both the rate and max in flight and is lowered when
+    the server is overloaded.
+    """
+
+    def __init__(self, limit: Limit):
+        self.limit = limit
+        self.tokens = float(limit.burst)
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.factor = 1.0
+        self.backed_off_at = None
+        self.condition = threading.Condition()
+
+    @property
+    def rate(self):
+        return None if self.limit.rate is None else self.limit.rate * self.factor
+
+    @property
+    def max_in_flight(self):
+        if self.limit.max_in_flight is None:
+            return None
+
+        return max(1, int(self.limit.max_in_flight * self.factor))
+
+    def acquire(self):
+        """
+        :raises DeadlineExceededError: if the active deadline passes before the request may be sent
+        """
+        with self.condition:
+            max_in_flight = self.max_in_flight
+
+            while max_in_flight is not None and self.in_flight >= max_in_flight:
+                left = remaining()
+
+                if left is not None and left <= 0:
+                    raise DeadlineExceededError()
+
+                self.condition.wait(left)
+                max_in_flight = self.max_in_flight
+
+            self.in_flight += 1
+            wait = 0.0
+
+            if self.limit.rate is not None:
+                now = time.monotonic()
+                self.tokens = min(self.limit.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Reserve a token now and sleep outside the lock until it is earned, so waiting requests keep their
+                # order without holding the lock
+                self.tokens -= 1
+
+                if self.tokens < 0:
+                    wait = -self.tokens / self.rate
+                    left = remaining()
+
+                    if left is not None and wait > left:
+                        # Give the token and slot back, the request could not be sent in time anyway
+                        self.tokens += 1
+                        self.in_flight -= 1
+                        self.condition.notify()
+                        raise DeadlineExceededError()
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def adapt(
+        self, overloaded: bool, backoff: float, recovery: float, min_factor: float, cooldown: float
+    ):
+        with self.condition:
+            if overloaded:
+                now = time.monotonic()
+
+                # Concurrent requests often fail together, back off once per cooldown rather than once per request
+                if self.backed_off_at is None or now - self.backed_off_at >= cooldown:
+                    self.factor = max(min_factor, self.factor * backoff)
+                    self.backed_off_at = now
+            elif self.factor < 1.0:
+                self.factor = min(1.0, self.factor + recovery)
+                self.condition.notify_all()
+
+    def to_json(self):
+        return {
+            "rate": self.rate,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "factor": self.factor,
+        }
+
+
+class Throttle(RequestListener):
+    """
+    Rate limits requests with a token bucket, and caps requests in flight, per group of requests. Each request uses the
+    most specific matching entry in limits: its endpoint (e.g. "query-executeSql.api"), then its action (e.g.
+    "executeSql.api"), then its controller (e.g. "query"), falling back to default. Requests matching the same entry
+    share its limits.
+
+    The limits are lowered (multiplied by backoff) when a response takes longer than target_latency, has a 429 or 5xx
+    status, or no response is received, and raised again by recovery for every request that succeeds.
+    """
+
+    def __init__(
+        self,
+        default: Limit = None,
+        limits: Dict[str, Limit] = None,
+        target_latency: float = None,
+        backoff: float = 0.5,
+        recovery: float = 0.05,
+        min_factor: float = 0.1,
+        cooldown: float = 1.0,
+    ):
+        """
+        :param default: limit for requests that don't match an entry in limits, None to not limit them
+        :param limits: dict of endpoint, action, or controller to Limit
+        :param target_latency: seconds, slower responses lower the limits. None to only back off on errors
+        :param backoff: factor the limits are multiplied by when the server is overloaded
+        :param recovery: fraction of the configured limits restored after each successful request
+        :param min_factor: lowest fraction of the configured limits the throttle backs off to
+        :param cooldown: seconds after backing off before backing off again
+        """
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+
+        self.default = default
+        self.limits = dict(limits or {})
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.recovery = recovery
+        self.min_factor = min_factor
+        self.cooldown = cooldown
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, event: RequestEvent):
+        for key in (event.endpoint, event.action, event.controller):
+            if key in self.limits:
+                break
+        else:
+            if self.default is None:
+                return None
+
+            key = None
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(
+                    self.limits[key] if key is not None else self.default
+                )
+
+        return bucket
+
+    def before_request(self, event: RequestEvent):
+        bucket = self._bucket(event)
+
+        if bucket is not None:
+            bucket.acquire()
+            event._throttle_bucket = bucket
+
+    def _complete(self, event: RequestEvent, overloaded: Optional[bool]):
+        """
+        Releases the request's slot and adapts the limits, unless overloaded is None.
+        """
+        bucket = getattr(event, "_throttle_bucket", None)
+
+        if bucket is None:
+            return
+
+        event._throttle_bucket = None
+        bucket.release()
+
+        if overloaded is None:
+            return
+
+        if self.target_latency is not None and event.elapsed is not None:
+            overloaded = overloaded or event.elapsed > self.target_latency
+
+        bucket.adapt(overloaded, self.backoff, self.recovery, self.min_factor, self.cooldown)
+
+    def after_response(self, event: RequestEvent):
+        self._complete(event, event.status_code in OVERLOAD_STATUS_CODES)
+
+    def on_error(self, event: RequestEvent):
+        # A request that ran out of the caller's deadline says nothing about the server's load
+        if isinstance(event.exception, DeadlineExceededError):
+            self._complete(event, None)
+            return
+
+        self._complete(
+            event, event.status_code is None or event.status_code in OVERLOAD_STATUS_CODES
+        )
+
+    def stats(self) -> dict:
+        """
+        :return: dict of limits key (None for the default) to the current rate, max_in_flight, in_flight, and factor
+        """
+        with self._lock:
+            buckets = dict(self._buckets)
+
+        return {key: bucket.to_json() for key, bucket in buckets.items()}
@@ -0,0 +1,440 @@
+"""
+Transports send the HTTP requests built by ServerContext.make_request. ServerContext uses a RequestsTransport unless
+another transport is passed in:
+
+    from labkey.transport import HttpxTransport
+
+    api = APIWrapper("example.com", "project", transport=HttpxTransport(http2=True))
+
+- RequestsTransport sends requests through a requests.Session (the default).
+- HttpxTransport sends requests through an httpx.Client, optionally over HTTP/2 so concurrent requests made from
+  several threads share a single multiplexed connection.
+- AsyncHttpxTransport runs an httpx.AsyncClient on a background event loop. Requests can be awaited from asyncio code
+  with request_async(), or submitted without blocking with submit().
+- FakeTransport answers requests in process from recorded responses, for tests and benchmarks that should not need a
+  server. RecordingTransport records the responses of another transport to a file FakeTransport can load.
+
+httpx must be installed separately to use HttpxTransport or AsyncHttpxTransport (pip install labkey[http2]).
+
+A transport returns a response with status_code, content, and json() like a requests.Response, and raises
+requests.exceptions.RequestException subclasses when no response is received, so make_request maps both to the same
+labkey exceptions regardless of the transport.
+"""
+import asyncio
+import base64
+import json
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, List, Union
+
+import requests
+from requests import exceptions
+from requests.structures import CaseInsensitiveDict
+
+from .instrumentation import _parse_endpoint
+from .utils import json_dumps
+
+
+class Transport(ABC):
+    """
+    Base class for transports. Subclasses implement request() and provide a mutable mapping of default headers sent
+    with every request, which ServerContext uses for the User-Agent, API key, and CSRF token.
+    """
+
+    headers = None
+
+    @abstractmethod
+    def request(
+        self,
+        method: str,
+        url: str,
+        params: dict = None,
+        data: any = None,
+        files: any = None,
+        headers: dict = None,
+        timeout=None,
+    ):
+        """
+        Sends a request and returns its response.
+        :param method: "GET" or "POST"
+        :param url: request URL
+        :param params: query string parameters
+        :param data: request body, either a dict of form fields or an encoded str/bytes body
+        :param files: files to upload as multipart form data
+        :param headers: headers sent in addition to the default headers
+        :param timeout: seconds, or a (connect, read) tuple
+        :return: the response
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Sends requests through a requests.Session, which keeps cookies and pools connections between requests.
+    """
+
+    def __init__(self, session: requests.Session = None, verify: bool = True):
+        self.session = session if session is not None else requests.Session()
+
+        if not verify:
+            self.session.verify = False
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, timeout=None):
+        if method == "GET":
+            return self.session.get(url, params=params, headers=headers, timeout=timeout)
+
+        if files is not None:
+            return self.session.post(url, data=data, files=files, headers=headers, timeout=timeout)
+
+        return self.session.post(url, data=data, headers=headers, timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+def _httpx_timeout(httpx, timeout):
+    if timeout is None:
+        return None
+
+    if isinstance(timeout, (tuple, list)):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+
+    return httpx.Timeout(timeout)
+
+
+def _without_none(values):
+    # requests leaves out query parameters and form fields that are None, httpx would send them as empty strings
+    if isinstance(values, dict):
+        return {k: v for k, v in values.items() if v is not None}
+
+    return values
+
+
+def _httpx_kwargs(httpx, params, data, files, headers, timeout):
+    kwargs = {
+        "params": _without_none(params),
+        "files": files,
+        "headers": headers,
+        "timeout": _httpx_timeout(httpx, timeout),
+    }
+
+    # httpx takes a raw request body as content, and form fields as data
+    if isinstance(data, (str, bytes)):
+        kwargs["content"] = data
+    else:
+        kwargs["data"] = _without_none(data)
+
+    return kwargs
+
+
+@contextmanager
+def _requests_exceptions(httpx):
+    # Raise httpx errors as the requests exceptions ServerContextError knows how to describe
+    try:
+        yield
+    except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+        raise exceptions.InvalidURL(str(e)) from e
+    except httpx.ConnectTimeout as e:
+        raise exceptions.ConnectTimeout(str(e)) from e
+    except httpx.TimeoutException as e:
+        raise exceptions.ReadTimeout(str(e)) from e
+    except httpx.ConnectError as e:
+        if "SSL" in str(e) or "CERTIFICATE" in str(e):
+            raise exceptions.SSLError(str(e)) from e
+
+        raise exceptions.ConnectionError(str(e)) from e
+    except httpx.TransportError as e:
+        raise exceptions.ConnectionError(str(e)) from e
+    except httpx.HTTPError as e:
+        raise exceptions.RequestException(str(e)) from e
+
+
+class HttpxTransport(Transport):
+    """
+    Sends requests through an httpx.Client. httpx.Client is thread safe, with http2=True requests made concurrently
+    from several threads are multiplexed over a single connection.
+    """
+
+    def __init__(self, verify: bool = True, http2: bool = False, **client_kwargs):
+        """
+        :param verify: whether to verify the server's SSL certificate
+        :param http2: whether to negotiate HTTP/2, requires the h2 package (pip install httpx[http2])
+        :param client_kwargs: passed to httpx.Client, e.g. limits or transport
+        """
+        # We localize the import of httpx here so it is an optional dependency.
+        import httpx
+
+        # Follow redirects, e.g. from http to https, like requests does
+        client_kwargs.setdefault("follow_redirects", True)
+
+        self._httpx = httpx
+        self._client = httpx.Client(http2=http2, verify=verify, **client_kwargs)
+
+    @property
+    def headers(self):
+        return self._client.headers
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, timeout=None):
+        kwargs = _httpx_kwargs(self._httpx, params, data, files, headers, timeout)
+
+        with _requests_exceptions(self._httpx):
+            return self._client.request(method, url, **kwargs)
+
+    def close(self):
+        self._client.close()
+
+
+class AsyncHttpxTransport(Transport):
+    """
+    Sends requests through an httpx.AsyncClient running on its own event loop thread. request() blocks like the other
+    transports, so it can be used with the regular API functions, while submit() and request_async() let many requests
+    be in flight at once without a thread per request.
+    """
+
+    def __init__(self, verify: bool = True, http2: bool = False, **client_kwargs):
+        """
+        :param verify: whether to verify the server's SSL certificate
+        :param http2: whether to negotiate HTTP/2, requires the h2 package (pip install httpx[http2])
+        :param client_kwargs: passed to httpx.AsyncClient, e.g. limits or transport
+        """
+        # We localize the import of httpx here so it is an optional dependency.
+        import httpx
+
+        client_kwargs.setdefault("follow_redirects", True)
+
+        self._httpx = httpx
+        self._client = httpx.AsyncClient(http2=http2, verify=verify, **client_kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="labkey-async-transport", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def headers(self):
+        return self._client.headers
+
+    async def _request(self, method, url, **kwargs):
+        with _requests_exceptions(self._httpx):
+            return await self._client.request(method, url, **kwargs)
+
+    def submit(self, method, url, params=None, data=None, files=None, headers=None, timeout=None):
+        """
+        Sends a request without waiting for the response.
+        :return: a concurrent.futures.Future of the response
+        """
+        kwargs = _httpx_kwargs(self._httpx, params, data, files, headers, timeout)
+        return asyncio.run_coroutine_threadsafe(self._request(method, url, **kwargs), self._loop)
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, timeout=None):
+        return self.submit(method, url, params, data, files, headers, timeout).result()
+
+    async def request_async(
+        self, method, url, params=None, data=None, files=None, headers=None, timeout=None
+    ):
+        """
+        Awaitable version of request() for use from any event loop.
+        """
+        return await asyncio.wrap_future(
+            self.submit(method, url, params, data, files, headers, timeout)
+        )
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class FakeResponse:
+    """
+    Minimal stand in for a requests.Response returned by FakeTransport.
+    """
+
+    def __init__(self, status_code: int = 200, body: any = None, content: Union[str, bytes] = None):
+        """
+        :param status_code: HTTP status code
+        :param body: JSON serializable response body
+        :param content: raw response body, used instead of body for non-JSON responses
+        """
+        if content is None:
+            content = json_dumps(body) if body is not None else b""
+
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+
+        self.status_code = status_code
+        self.content = content
+        self.elapsed = timedelta(0)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def __repr__(self):
+        return "<FakeResponse [{}]>".format(self.status_code)
+
+
+class FakeRequest:
+    """
+    A request received by FakeTransport.
+    """
+
+    def __init__(self, method, url, params, data, files, headers, timeout):
+        self.method = method
+        self.url = url
+        self.endpoint = "{}-{}".format(*_parse_endpoint(url))
+        self.params = params
+        self.data = data
+        self.files = files
+        self.headers = headers
+        self.timeout = timeout
+
+    def json(self):
+        return json.loads(self.data)
+
+    def __repr__(self):
+        return "<FakeRequest [{} {}]>".format(self.method, self.endpoint)
+
+
+Responder = Union[FakeResponse, Callable[[FakeRequest], FakeResponse]]
+
+
+class FakeTransport(Transport):
+    """
+    Answers requests in process with recorded responses, matched by method and endpoint (controller-action, e.g.
+    "query-selectRows.api"). Every request is kept in requests. Requests without a recorded response receive a 404.
+    A whoami response with a CSRF token is recorded by default.
+    """
+
+    def __init__(self):
+        self.headers = CaseInsensitiveDict()
+        self.requests: List[FakeRequest] = []
+        self._responses = {}
+        self._lock = threading.Lock()
+        self.add_response("GET", "login-whoami.api", FakeResponse(body={"CSRF": "fake-csrf-token"}))
+
+    def add_response(self, method: str, endpoint: str, *responses: Responder):
+        """
+        Records responses for an endpoint. They are returned in order, the last one for every request after that.
+        :param method: "GET" or "POST"
+        :param endpoint: controller-action, e.g. "query-selectRows.api"
+        :param responses: FakeResponses, or callables that take the FakeRequest and return a FakeResponse
+        """
+        with self._lock:
+            self._responses[(method, endpoint)] = list(responses)
+
+    def add_json(self, method: str, endpoint: str, body: any, status_code: int = 200):
+        """
+        Records a single JSON response for an endpoint.
+        """
+        self.add_response(method, endpoint, FakeResponse(status_code, body))
+
+    @classmethod
+    def from_recording(cls, path: str) -> "FakeTransport":
+        """
+        Creates a FakeTransport that serves the responses in a file written by RecordingTransport.
+        """
+        transport = cls()
+        recorded = {}
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+
+                    if "content_base64" in entry:
+                        content = base64.b64decode(entry["content_base64"])
+                    else:
+                        content = entry["content"]
+
+                    response = FakeResponse(entry["status_code"], content=content)
+                    recorded.setdefault((entry["method"], entry["endpoint"]), []).append(response)
+
+        for (method, endpoint), responses in recorded.items():
+            transport.add_response(method, endpoint, *responses)
+
+        return transport
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, timeout=None):
+        request = FakeRequest(method, url, params, data, files, headers, timeout)
+
+        with self._lock:
+            self.requests.append(request)
+            responses = self._responses.get((method, request.endpoint))
+
+            if not responses:
+                return FakeResponse(
+                    404,
+                    {
+                        "exception": "No recorded response for {} {}".format(
+                            method, request.endpoint
+                        )
+                    },
+                )
+
+            response = responses.pop(0) if len(responses) > 1 else responses[0]
+
+        if callable(response):
+            response = response(request)
+
+        return response
+
+
+class RecordingTransport(Transport):
+    """
+    Sends requests through another transport and appends each response to a JSON lines file that
+    FakeTransport.from_recording can serve. Response bodies are stored as text, or base64 encoded if they are not
+    UTF-8, e.g. file downloads.
+    """
+
+    def __init__(self, transport: Transport, path: str):
+        self.transport = transport
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def headers(self):
+        return self.transport.headers
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, timeout=None):
+        response = self.transport.request(method, url, params, data, files, headers, timeout)
+        entry = {
+            "method": method,
+            "endpoint": "{}-{}".format(*_parse_endpoint(url)),
+            "status_code": response.status_code,
+        }
+
+        try:
+            entry["content"] = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["content_base64"] = base64.b64encode(response.content).decode("ascii")
+
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json_dumps(entry) + "\n")
+
+        return response
+
+    def close(self):
+        self.transport.close()
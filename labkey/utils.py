@@ -14,6 +14,7 @@
 # limitations under the License.
 #
 import json
+from collections.abc import Mapping
 from functools import wraps
 from datetime import date, datetime
 from base64 import b64encode
@@ -26,6 +27,10 @@ class DateTimeEncoder(json.JSONEncoder):
         if isinstance(o, (datetime, date)):
             return o.isoformat()
 
+        # e.g. query.CompactRow, so rows from select_rows(compact_rows=True) can be sent back to the server
+        if isinstance(o, Mapping):
+            return dict(o)
+
         return super().default(o)
 
 
@@ -27,7 +27,12 @@ from labkey.exceptions import (
     ServerContextError,
     ServerNotFoundError,
 )
-from labkey.query import Pagination, QueryFilter
+from labkey.query import (
+    InsertRowsCommand,
+    Pagination,
+    QueryFilter,
+    UpdateRowsCommand,
+)
 from requests.exceptions import Timeout
 
 import copy
@@ -225,6 +230,32 @@ all_rows = api.query.select_rows(schema, table)
 print("Delete Rows: after row count [ " + str(all_rows["rowCount"]) + " ]")
 
 
+###################
+# Test save_rows & batch
+###################
+# Run several commands in a single transacted request
+test_row = copy.copy(original_value)
+test_row["Key"] = None
+test_row["Country"] = "Atlantis"
+
+save_result = api.query.save_rows(
+    [
+        InsertRowsCommand(schema, table, [test_row]),
+        UpdateRowsCommand(schema, table, [{"Key": original_value["Key"], "Country": "Pangea"}]),
+    ]
+)
+inserted_row = save_result["result"][0]["rows"][0]
+print("save_rows: committed [ " + str(save_result["committed"]) + " ]")
+
+# Many small calls are combined into a single request per schema.query when the batch is flushed
+with api.query.batch(max_rows=100) as batch:
+    reset_future = batch.update_rows(schema, table, [original_value])
+    delete_future = batch.delete_rows(schema, table, [{"Key": inserted_row["Key"]}])
+
+print("batch: reset value [ " + reset_future.result()["rows"][0][column3] + " ]")
+print("batch: deleted rowId [ " + str(delete_future.result()["rows"][0]["Key"]) + " ]")
+
+
 ###################
 # Test truncate_table
 ###################
@@ -33,6 +33,10 @@ if not version:
 long_desc = "Python client API for LabKey Server. Supports query and experiment APIs."
 
 tests_require = ["pytest", "requests", "mock", "pytest-cov"]
+benchmark_require = ["pytest", "pytest-benchmark"]
+http2_require = ["httpx[http2]"]
+excel_require = ["openpyxl"]
+msgpack_require = ["msgpack"]
 
 setup(
     name="labkey",
@@ -50,7 +54,13 @@ setup(
     install_requires=["requests"],
     tests_require=tests_require,
     setup_requires=["pytest-runner"],
-    extras_require={"test": tests_require},
+    extras_require={
+        "test": tests_require,
+        "benchmark": benchmark_require,
+        "http2": http2_require,
+        "excel": excel_require,
+        "msgpack": msgpack_require,
+    },
     keywords="labkey api client",
     classifiers=[
         "Development Status :: 4 - Beta",
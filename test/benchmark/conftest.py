@@ -0,0 +1,24 @@
+import pytest
+
+from labkey.server_context import ServerContext
+
+from .server import StandInServer
+
+
+@pytest.fixture(scope="session")
+def stand_in_server():
+    server = StandInServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def server(stand_in_server):
+    # restore the default sizes after each benchmark
+    yield stand_in_server
+    stand_in_server.rows, stand_in_server.columns, stand_in_server.fields = 1000, 10, 100
+
+
+@pytest.fixture
+def server_context(stand_in_server):
+    return ServerContext(stand_in_server.address, "Benchmark", use_ssl=False)
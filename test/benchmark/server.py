@@ -0,0 +1,145 @@
+"""
+A lightweight, local stand-in for the LabKey Server endpoints used by the benchmarks. Responses are generated from the
+server's configuration, so benchmarks can vary row counts and column widths without a real server.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def generate_rows(count: int, columns: int, offset: int = 0):
+    names = ["Column{}".format(c) for c in range(columns)]
+    return [
+        {"Key": i, **{name: "value-{}-{}".format(i, c) for c, name in enumerate(names)}}
+        for i in range(offset, offset + count)
+    ]
+
+
+def generate_domain(fields: int):
+    return {
+        "domainId": 1,
+        "domainURI": "urn:lsid:labkey.com:IntList.Folder-1:Benchmark",
+        "name": "Benchmark",
+        "schemaName": "lists",
+        "queryName": "Benchmark",
+        "fields": [
+            {
+                "name": "Field{}".format(i),
+                "propertyId": i,
+                "propertyURI": "urn:lsid:labkey.com:IntList.Folder-1:Benchmark#Field{}".format(i),
+                "rangeURI": "http://www.w3.org/2001/XMLSchema#string",
+                "conceptURI": None,
+                "label": "Field {}".format(i),
+                "hidden": False,
+                "required": False,
+                "scale": 4000,
+                "shownInInsertView": True,
+                "shownInUpdateView": True,
+                "shownInDetailsView": True,
+                "conditionalFormats": [],
+                "propertyValidators": [],
+            }
+            for i in range(fields)
+        ],
+        "indices": [],
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(body or b"{}")
+
+        return {k: v[-1] for k, v in parse_qs(body.decode("utf-8")).items()}
+
+    def _endpoint(self):
+        url = urlsplit(self.path)
+        return url.path.rsplit("/", 1)[-1], {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+    def do_GET(self):
+        endpoint, params = self._endpoint()
+
+        if endpoint == "login-whoami.api":
+            self._send_json({"id": 1001, "email": "benchmark@labkey.test", "CSRF": "benchmark"})
+        elif endpoint == "property-getDomain.api":
+            self._send_json(self.server.domain_response())
+        elif endpoint == "property-getDomainDetails.api":
+            self._send_json({"domainDesign": self.server.domain_response(), "options": {}})
+        else:
+            self._send_json({"exception": "Unknown action " + endpoint}, 404)
+
+    def do_POST(self):
+        endpoint, _ = self._endpoint()
+        body = self._read_body()
+
+        if endpoint in ("query-getQuery.api", "query-executeSql.api"):
+            max_rows = int(body.get("query.maxRows", body.get("maxRows", -1)))
+            offset = int(body.get("query.offset", body.get("offset", 0)))
+            self._send_json(self.server.rows_response(offset, max_rows))
+        elif endpoint in ("query-insertRows.api", "query-updateRows.api", "query-deleteRows.api"):
+            rows = body.get("rows", [])
+            self._send_json({"rows": rows, "rowsAffected": len(rows), "command": endpoint})
+        elif endpoint == "assay-saveAssayBatch.api":
+            self._send_json({"assayId": body.get("assayId"), "batches": body.get("batches", [])})
+        else:
+            self._send_json({"exception": "Unknown action " + endpoint}, 404)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Serves generated responses for getQuery, executeSql, insertRows, saveAssayBatch, getDomain, and whoami. Change
+    rows, columns, or fields between benchmarks to change the size of the responses.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, rows: int = 1000, columns: int = 10, fields: int = 100):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.rows = rows
+        self.columns = columns
+        self.fields = fields
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        return "{}:{}".format(*self.server_address)
+
+    def rows_response(self, offset: int, max_rows: int):
+        count = self.rows - offset if max_rows < 0 else min(max_rows, self.rows - offset)
+        rows = generate_rows(max(count, 0), self.columns, offset)
+        return {
+            "rowCount": self.rows,
+            "rows": rows,
+            "schemaName": "lists",
+            "queryName": "Benchmark",
+        }
+
+    def domain_response(self):
+        return generate_domain(self.fields)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
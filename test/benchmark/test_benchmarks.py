@@ -0,0 +1,159 @@
+"""
+Throughput benchmarks. These do not run by default, run them with:
+
+    pip install -e .[benchmark]
+    pytest test/benchmark -m benchmark
+
+Use pytest-benchmark's --benchmark-save and --benchmark-compare options to track regressions between runs.
+"""
+import json
+import os
+
+import pytest
+
+from labkey import query
+from labkey.domain import Domain, get
+from labkey.experiment import Batch, save_batch
+from labkey.server_context import ServerContext
+from labkey.transport import FakeResponse, FakeTransport
+from labkey.utils import json_dumps, transform_helper
+
+from .server import generate_domain, generate_rows
+
+pytest.importorskip("pytest_benchmark")
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("rows,columns", [(1000, 10), (10000, 10), (1000, 100)])
+def test_select_rows(benchmark, server, server_context, rows, columns):
+    server.rows, server.columns = rows, columns
+    result = benchmark(query.select_rows, server_context, "lists", "Benchmark")
+
+    assert len(result["rows"]) == rows
+
+
+@pytest.mark.parametrize("rows,columns", [(1000, 10), (10000, 10)])
+def test_select_rows_in_process(benchmark, rows, columns):
+    # Same responses as test_select_rows, served by a FakeTransport to measure the client without the HTTP stack
+    body = json_dumps({"rowCount": rows, "rows": generate_rows(rows, columns)})
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", FakeResponse(content=body))
+    server_context = ServerContext("example.com", "Benchmark", transport=transport)
+    result = benchmark(query.select_rows, server_context, "lists", "Benchmark")
+
+    assert len(result["rows"]) == rows
+
+
+def test_select_rows_compact(benchmark, server, server_context):
+    server.rows, server.columns = 10000, 10
+    result = benchmark(query.select_rows, server_context, "lists", "Benchmark", compact_rows=True)
+
+    assert len(result["rows"]) == 10000
+
+
+@pytest.mark.parametrize("page_size", [500, 5000])
+def test_paged_select(benchmark, server, server_context, page_size):
+    server.rows, server.columns = 10000, 10
+
+    def select_all():
+        return sum(1 for _ in query.iter_rows(server_context, "lists", "Benchmark", page_size))
+
+    assert benchmark(select_all) == 10000
+
+
+def test_execute_sql(benchmark, server, server_context):
+    server.rows, server.columns = 1000, 10
+    sql = "SELECT * FROM Benchmark"
+    result = benchmark(query.execute_sql, server_context, "lists", sql)
+
+    assert len(result["rows"]) == 1000
+
+
+@pytest.mark.parametrize("rows", [100, 1000])
+def test_bulk_insert(benchmark, server_context, rows):
+    data = generate_rows(rows, 10)
+    result = benchmark(query.insert_rows, server_context, "lists", "Benchmark", data)
+
+    assert result["rowsAffected"] == rows
+
+
+def test_batched_single_row_updates(benchmark, server_context):
+    data = generate_rows(1000, 10)
+
+    def update():
+        with query.QueryBatcher(server_context, max_rows=250) as batch:
+            return [batch.update_rows("lists", "Benchmark", [row]) for row in data]
+
+    futures = benchmark(update)
+    assert futures[-1].result()["rows"] == [data[-1]]
+
+
+def test_save_assay_batch(benchmark, server_context):
+    runs = [{"name": "Run {}".format(i), "dataRows": generate_rows(100, 10)} for i in range(10)]
+    batch = Batch(runs=runs)
+    result = benchmark(save_batch, server_context, 1, batch)
+
+    assert len(result.runs) == 10
+
+
+@pytest.mark.parametrize("fields", [100, 2000])
+def test_get_domain(benchmark, server, server_context, fields):
+    server.fields = fields
+    domain = benchmark(get, server_context, "lists", "Benchmark")
+
+    assert len(domain.fields) == fields
+
+
+def test_json_encode(benchmark):
+    payload = {"schemaName": "lists", "queryName": "Benchmark", "rows": generate_rows(10000, 10)}
+    benchmark(json_dumps, payload, sort_keys=True)
+
+
+def test_json_decode(benchmark):
+    body = json.dumps({"rows": generate_rows(10000, 10)})
+    benchmark(json.loads, body)
+
+
+@pytest.mark.parametrize("fields", [100, 2000])
+def test_domain_parse(benchmark, fields):
+    raw = generate_domain(fields)
+    domain = benchmark(lambda: Domain(**raw))
+
+    assert len(domain.fields) == fields
+
+
+@pytest.mark.parametrize("fields", [100, 2000])
+def test_domain_parse_and_read(benchmark, fields):
+    raw = generate_domain(fields)
+
+    def parse_and_read():
+        domain = Domain(**raw)
+        return [field.name for field in domain.fields]
+
+    names = benchmark(parse_and_read)
+
+    assert len(names) == fields
+
+
+def test_domain_to_json(benchmark):
+    domain = Domain(**generate_domain(2000))
+    benchmark(domain.to_json)
+
+
+def test_transform_helper(benchmark, tmp_path):
+    file_in = tmp_path / "in.tsv"
+    file_out = tmp_path / "out.tsv"
+    run_properties = tmp_path / "runProperties.tsv"
+
+    with open(file_in, "w") as f:
+        f.write("\t".join("Column{}".format(c) for c in range(10)) + "\n")
+        for row in generate_rows(10000, 9):
+            f.write("\t".join(str(v) for v in row.values()) + "\n")
+
+    with open(run_properties, "w") as f:
+        f.write("runDataUploadedFile\t{}\n".format(file_in))
+        f.write("runDataFile\tdata\tunused\t{}\n".format(file_out))
+
+    benchmark(transform_helper, lambda grid: grid, str(run_properties))
+
+    assert os.path.getsize(file_out) > 0
@@ -0,0 +1,165 @@
+import pytest
+from requests.exceptions import ConnectionError
+
+from labkey.circuit_breaker import CircuitBreaker, CircuitState
+from labkey.exceptions import CircuitOpenError, QueryNotFoundError, ServerContextError
+from labkey.server_context import ServerContext
+from labkey.transport import FakeResponse, FakeTransport
+
+
+def offline(request):
+    raise ConnectionError("Connection refused")
+
+
+@pytest.fixture
+def transport():
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", offline)
+    transport.add_response("GET", "login-whoami.api", offline)
+    return transport
+
+
+def breaker_context(transport, breaker):
+    server_context = ServerContext(
+        "example.com", "test_container", transport=transport, circuit_breaker=breaker
+    )
+    return server_context, server_context.build_url("query", "getQuery.api")
+
+
+def test_opens_after_consecutive_failures(transport):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    server_context, url = breaker_context(transport, breaker)
+
+    for _ in range(3):
+        with pytest.raises(ServerContextError):
+            server_context.make_request(url)
+
+    assert breaker.state == CircuitState.OPEN
+    request_count = len(transport.requests)
+
+    with pytest.raises(CircuitOpenError) as e:
+        server_context.make_request(url)
+
+    assert len(transport.requests) == request_count
+    assert e.value.failures == 3
+    assert 0 < e.value.retry_in <= 60
+    assert "3 consecutive failures" in e.value.message
+
+
+def test_server_errors_count_as_failures(transport):
+    transport.add_json("GET", "login-whoami.api", {"CSRF": "token"})
+    transport.add_json("POST", "query-getQuery.api", {"exception": "Bad Gateway"}, 502)
+    breaker = CircuitBreaker(failure_threshold=2)
+    server_context, url = breaker_context(transport, breaker)
+
+    for _ in range(2):
+        with pytest.raises(ServerContextError):
+            server_context.make_request(url)
+
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_client_errors_reset_failures(transport):
+    transport.add_json("GET", "login-whoami.api", {"CSRF": "token"})
+    transport.add_response(
+        "POST",
+        "query-getQuery.api",
+        offline,
+        FakeResponse(404, {"exception": "Query not found"}),
+    )
+    breaker = CircuitBreaker(failure_threshold=2)
+    server_context, url = breaker_context(transport, breaker)
+
+    with pytest.raises(ServerContextError):
+        server_context.make_request(url)
+
+    assert breaker.failures == 1
+
+    with pytest.raises(QueryNotFoundError):
+        server_context.make_request(url)
+
+    assert breaker.failures == 0
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_probe_closes_breaker(transport):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    server_context, url = breaker_context(transport, breaker)
+
+    with pytest.raises(ServerContextError):
+        server_context.make_request(url)
+
+    assert breaker.state == CircuitState.OPEN
+
+    # The server is back
+    transport.add_json("GET", "login-whoami.api", {"CSRF": "token"})
+    transport.add_json("POST", "query-getQuery.api", {"rows": []})
+
+    assert server_context.make_request(url) == {"rows": []}
+    assert breaker.state == CircuitState.CLOSED
+    assert [r.endpoint for r in transport.requests[-3:]] == [
+        "login-whoami.api",
+        "login-whoami.api",
+        "query-getQuery.api",
+    ]
+    assert transport.requests[-3].timeout == breaker.probe_timeout
+
+
+def test_failed_probe_reopens_with_longer_timeout(transport):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, max_reset_timeout=10)
+    server_context, url = breaker_context(transport, breaker)
+
+    with pytest.raises(ServerContextError):
+        server_context.make_request(url)
+
+    breaker._open_for = 1
+    breaker._opened_at -= 1
+
+    with pytest.raises(CircuitOpenError):
+        server_context.make_request(url)
+
+    assert breaker.state == CircuitState.OPEN
+    assert breaker._open_for == 2
+    assert transport.requests[-1].endpoint == "login-whoami.api"
+
+
+def test_probe_error_reopens_breaker(transport):
+    def broken(request):
+        raise RuntimeError("Event loop is closed")
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, max_reset_timeout=10)
+    server_context, url = breaker_context(transport, breaker)
+
+    with pytest.raises(ServerContextError):
+        server_context.make_request(url)
+
+    breaker._open_for = 1
+    breaker._opened_at -= 1
+    transport.add_response("GET", "login-whoami.api", broken)
+
+    with pytest.raises(RuntimeError):
+        server_context.make_request(url)
+
+    assert breaker.state == CircuitState.OPEN
+    assert breaker._open_for == 2
+
+    # Once the server is healthy again the next probe closes the breaker
+    breaker._opened_at -= 2
+    transport.add_json("GET", "login-whoami.api", {"CSRF": "token"})
+    transport.add_json("POST", "query-getQuery.api", {"rows": []})
+
+    assert server_context.make_request(url) == {"rows": []}
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_reset(transport):
+    breaker = CircuitBreaker(failure_threshold=1)
+    server_context, url = breaker_context(transport, breaker)
+
+    with pytest.raises(ServerContextError):
+        server_context.make_request(url)
+
+    breaker.reset()
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.retry_in == 0
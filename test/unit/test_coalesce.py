@@ -0,0 +1,192 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from requests.exceptions import ReadTimeout
+
+from labkey import deadline
+from labkey.exceptions import DeadlineExceededError, ServerContextError
+from labkey.query import execute_sql, get_query_details, insert_rows, select_rows
+from labkey.server_context import ServerContext
+from labkey.transport import FakeResponse, FakeTransport
+
+
+def slow_response(body, status_code=200, delay=0.05):
+    def respond(request):
+        time.sleep(delay)
+        return FakeResponse(status_code, body)
+
+    return respond
+
+
+def coalescing_context(transport, coalesce_reads=True):
+    return ServerContext(
+        "example.com",
+        "test_container",
+        disable_csrf=True,
+        transport=transport,
+        coalesce_reads=coalesce_reads,
+    )
+
+
+def concurrently(fn, count=8):
+    with ThreadPoolExecutor(count) as executor:
+        futures = [executor.submit(fn) for _ in range(count)]
+        return [f.result() for f in futures]
+
+
+def test_concurrent_selects_share_one_request():
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", slow_response({"rows": [{"Key": 1}]}))
+    server_context = coalescing_context(transport)
+
+    results = concurrently(lambda: select_rows(server_context, "lists", "Samples"))
+
+    assert len(transport.requests) == 1
+    assert all(result == {"rows": [{"Key": 1}]} for result in results)
+    # Each caller gets its own response dict and rows list
+    assert len({id(result) for result in results}) == 8
+    assert len({id(result["rows"]) for result in results}) == 8
+
+
+def test_different_reads_are_not_shared():
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", slow_response({"rows": []}))
+    server_context = coalescing_context(transport)
+
+    with ThreadPoolExecutor(2) as executor:
+        executor.submit(select_rows, server_context, "lists", "Samples")
+        executor.submit(select_rows, server_context, "lists", "Events")
+
+    assert len(transport.requests) == 2
+
+
+def test_gets_and_sql_are_shared():
+    transport = FakeTransport()
+    transport.add_response("GET", "query-getQueryDetails.api", slow_response({"columns": []}))
+    transport.add_response("POST", "query-executeSql.api", slow_response({"rows": []}))
+    server_context = coalescing_context(transport)
+
+    concurrently(lambda: get_query_details(server_context, "lists", "Samples"))
+    concurrently(lambda: execute_sql(server_context, "lists", "SELECT 1", waf_encode_sql=False))
+
+    assert [r.endpoint for r in transport.requests] == [
+        "query-getQueryDetails.api",
+        "query-executeSql.api",
+    ]
+
+
+def test_writes_are_not_shared():
+    transport = FakeTransport()
+    transport.add_response("POST", "query-insertRows.api", slow_response({"rows": []}))
+    server_context = coalescing_context(transport)
+
+    concurrently(lambda: insert_rows(server_context, "lists", "Samples", [{"Key": 1}]), count=4)
+
+    assert len(transport.requests) == 4
+
+
+def test_disabled_by_default():
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", slow_response({"rows": []}))
+    server_context = coalescing_context(transport, coalesce_reads=False)
+
+    concurrently(lambda: select_rows(server_context, "lists", "Samples"), count=4)
+
+    assert len(transport.requests) == 4
+
+
+def test_sequential_reads_are_not_cached():
+    transport = FakeTransport()
+    transport.add_json("POST", "query-getQuery.api", {"rows": []})
+    server_context = coalescing_context(transport)
+
+    select_rows(server_context, "lists", "Samples")
+    select_rows(server_context, "lists", "Samples")
+
+    assert len(transport.requests) == 2
+    assert server_context._in_flight == {}
+
+
+def test_errors_are_shared():
+    transport = FakeTransport()
+    transport.add_response(
+        "POST", "query-getQuery.api", slow_response({"exception": "Server Error"}, 500)
+    )
+    server_context = coalescing_context(transport)
+    errors = []
+
+    def select():
+        try:
+            select_rows(server_context, "lists", "Samples")
+        except ServerContextError as e:
+            errors.append(e)
+
+    concurrently(select, count=4)
+
+    assert len(transport.requests) == 1
+    assert len(errors) == 4
+    assert server_context._in_flight == {}
+
+
+def test_compact_rows_does_not_affect_other_callers():
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", slow_response({"rows": [{"Key": 1}]}))
+    server_context = coalescing_context(transport)
+    barrier = threading.Barrier(2)
+
+    def select(compact):
+        barrier.wait()
+        return select_rows(server_context, "lists", "Samples", compact_rows=compact)
+
+    with ThreadPoolExecutor(2) as executor:
+        compact = executor.submit(select, True)
+        plain = executor.submit(select, False)
+
+    assert type(plain.result()["rows"][0]) is dict
+    assert type(compact.result()["rows"][0]) is not dict
+
+
+def test_waiting_caller_respects_deadline():
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", slow_response({"rows": []}, delay=0.2))
+    server_context = coalescing_context(transport)
+
+    with ThreadPoolExecutor(1) as executor:
+        leader = executor.submit(select_rows, server_context, "lists", "Samples")
+        time.sleep(0.02)
+
+        with pytest.raises(DeadlineExceededError):
+            with deadline.deadline(0.05):
+                select_rows(server_context, "lists", "Samples")
+
+        assert leader.result() == {"rows": []}
+
+
+def test_follower_outlives_leader_deadline():
+    def respond(request):
+        # Honours the request timeout like a real transport
+        if request.timeout < 0.1:
+            time.sleep(request.timeout)
+            raise ReadTimeout("Read timed out")
+
+        time.sleep(0.1)
+        return FakeResponse(body={"rows": []})
+
+    transport = FakeTransport()
+    transport.add_response("POST", "query-getQuery.api", respond)
+    server_context = coalescing_context(transport)
+
+    def leader():
+        with deadline.deadline(0.05):
+            select_rows(server_context, "lists", "Samples")
+
+    with ThreadPoolExecutor(1) as executor:
+        short = executor.submit(leader)
+        time.sleep(0.02)
+        result = select_rows(server_context, "lists", "Samples")
+
+    assert isinstance(short.exception(), DeadlineExceededError)
+    assert result == {"rows": []}
+    assert len(transport.requests) == 2
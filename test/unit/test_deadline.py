@@ -0,0 +1,238 @@
+import threading
+import time
+
+import pytest
+from requests.exceptions import ReadTimeout
+
+from labkey import deadline
+from labkey.circuit_breaker import CircuitBreaker, CircuitState
+from labkey.exceptions import DeadlineExceededError, ServerContextError
+from labkey.query import QueryBatcher, iter_rows
+from labkey.server_context import ServerContext
+from labkey.throttle import Limit, Throttle
+from labkey.transport import FakeResponse, FakeTransport
+
+
+@pytest.fixture
+def transport():
+    transport = FakeTransport()
+    transport.add_json("POST", "query-getQuery.api", {"rows": [{"Key": 1}, {"Key": 2}]})
+    transport.add_json("POST", "query-insertRows.api", {"rows": [{"Key": 1}]})
+    return transport
+
+
+@pytest.fixture
+def server_context(transport):
+    return ServerContext("example.com", "test_container", disable_csrf=True, transport=transport)
+
+
+def test_limit_timeout():
+    assert deadline.limit_timeout(300) == 300
+    assert deadline.current() is None
+
+    with deadline.deadline(10):
+        assert 9 < deadline.limit_timeout(300) <= 10
+        assert deadline.limit_timeout(5) == 5
+        connect, read = deadline.limit_timeout((3.05, 300))
+        assert connect == 3.05
+        assert 9 < read <= 10
+        assert 9 < deadline.limit_timeout(None) <= 10
+
+    assert deadline.current() is None
+
+
+def test_nested_deadlines_only_shorten():
+    with deadline.deadline(10):
+        outer = deadline.current()
+
+        with deadline.deadline(60):
+            assert deadline.current() == outer
+
+        with deadline.deadline(1):
+            assert deadline.current() < outer
+
+        assert deadline.current() == outer
+
+
+def test_make_request_timeouts(server_context, transport):
+    url = server_context.build_url("query", "getQuery.api")
+    server_context.make_request(url, timeout=(3.05, 60))
+
+    assert transport.requests[-1].timeout == (3.05, 60)
+
+    with deadline.deadline(2):
+        server_context.make_request(url, timeout=(3.05, 60))
+
+    connect, read = transport.requests[-1].timeout
+    assert 1 < connect <= 2
+    assert 1 < read <= 2
+
+
+def test_expired_deadline_fails_fast(server_context, transport):
+    url = server_context.build_url("query", "getQuery.api")
+
+    with deadline.deadline(0):
+        with pytest.raises(DeadlineExceededError):
+            server_context.make_request(url)
+
+    assert transport.requests == []
+
+
+def test_timeout_after_deadline(server_context, transport):
+    def slow(request):
+        time.sleep(0.02)
+        raise ReadTimeout("Read timed out")
+
+    transport.add_response("POST", "query-getQuery.api", slow)
+    url = server_context.build_url("query", "getQuery.api")
+
+    with pytest.raises(DeadlineExceededError):
+        with deadline.deadline(0.01):
+            server_context.make_request(url)
+
+    # Without a deadline a timeout is reported like before
+    with pytest.raises(ServerContextError):
+        server_context.make_request(url)
+
+
+def test_iter_rows_keeps_deadline(server_context, transport):
+    with deadline.deadline(10):
+        rows = iter_rows(server_context, "lists", "Samples", page_size=2)
+
+    assert next(rows) == {"Key": 1}
+    assert 9 < transport.requests[-1].timeout <= 10
+
+    transport.requests.clear()
+
+    with deadline.deadline(0):
+        rows = iter_rows(server_context, "lists", "Samples", page_size=2)
+
+    with pytest.raises(DeadlineExceededError):
+        list(rows)
+
+    assert transport.requests == []
+
+
+def test_batcher_keeps_deadline(server_context, transport):
+    with deadline.deadline(10):
+        batcher = QueryBatcher(server_context, max_delay=0.01)
+
+    future = batcher.insert_rows("lists", "Samples", [{"Key": 1}])
+
+    assert future.result(timeout=5)["rows"] == [{"Key": 1}]
+    assert 9 < transport.requests[-1].timeout <= 10
+
+    with deadline.deadline(0):
+        batcher = QueryBatcher(server_context)
+
+    with batcher:
+        future = batcher.insert_rows("lists", "Samples", [{"Key": 1}])
+
+    assert isinstance(future.exception(), DeadlineExceededError)
+
+
+def test_deadline_is_per_thread():
+    seen = []
+
+    with deadline.deadline(10):
+        thread = threading.Thread(target=lambda: seen.append(deadline.current()))
+        thread.start()
+        thread.join()
+
+    assert seen == [None]
+
+
+def test_deadline_does_not_trip_circuit_breaker(transport):
+    def slow(request):
+        time.sleep(0.02)
+        raise ReadTimeout("Read timed out")
+
+    transport.add_response("POST", "query-getQuery.api", slow)
+    breaker = CircuitBreaker(failure_threshold=3)
+    server_context = ServerContext(
+        "example.com",
+        "test_container",
+        disable_csrf=True,
+        transport=transport,
+        circuit_breaker=breaker,
+    )
+    url = server_context.build_url("query", "getQuery.api")
+
+    for _ in range(3):
+        with pytest.raises(DeadlineExceededError):
+            with deadline.deadline(0.01):
+                server_context.make_request(url)
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.failures == 0
+
+
+def test_deadline_does_not_slow_down_throttle(transport):
+    def slow(request):
+        # Like a real transport, gives up once the shortened read timeout passes
+        time.sleep(min(request.timeout, 0.2))
+        raise ReadTimeout("Read timed out")
+
+    transport.add_response("POST", "query-getQuery.api", slow)
+    throttle = Throttle(default=Limit(rate=100, max_in_flight=8), cooldown=0)
+    server_context = ServerContext(
+        "example.com", "test_container", disable_csrf=True, transport=transport, throttle=throttle
+    )
+    url = server_context.build_url("query", "getQuery.api")
+
+    for _ in range(3):
+        with pytest.raises(DeadlineExceededError):
+            with deadline.deadline(0.05):
+                server_context.make_request(url)
+
+    stats = throttle.stats()[None]
+    assert stats["factor"] == 1.0
+    assert stats["in_flight"] == 0
+
+
+def test_throttle_wait_counts_against_deadline(transport):
+    throttle = Throttle(default=Limit(rate=20, burst=1))
+    server_context = ServerContext(
+        "example.com", "test_container", disable_csrf=True, transport=transport, throttle=throttle
+    )
+    url = server_context.build_url("query", "getQuery.api")
+    server_context.make_request(url)
+
+    # The next token is 50ms away, so the request is sent with what is left of the deadline after waiting for it
+    with deadline.deadline(1):
+        server_context.make_request(url)
+
+    assert transport.requests[-1].timeout < 0.97
+
+    # Waiting for a token that comes after the deadline fails right away
+    started = time.monotonic()
+
+    with pytest.raises(DeadlineExceededError):
+        with deadline.deadline(0.01):
+            server_context.make_request(url)
+
+    assert time.monotonic() - started < 0.04
+    assert throttle.stats()[None]["in_flight"] == 0
+
+
+def test_throttle_in_flight_wait_respects_deadline(transport):
+    def slow(request):
+        time.sleep(0.2)
+        return FakeResponse(body={"rows": []})
+
+    transport.add_response("POST", "query-getQuery.api", slow)
+    throttle = Throttle(default=Limit(max_in_flight=1))
+    server_context = ServerContext(
+        "example.com", "test_container", disable_csrf=True, transport=transport, throttle=throttle
+    )
+    url = server_context.build_url("query", "getQuery.api")
+    thread = threading.Thread(target=server_context.make_request, args=(url,))
+    thread.start()
+    time.sleep(0.02)
+
+    with pytest.raises(DeadlineExceededError):
+        with deadline.deadline(0.05):
+            server_context.make_request(url)
+
+    thread.join()
+    assert throttle.stats()[None]["in_flight"] == 0
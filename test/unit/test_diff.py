@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+from labkey.diff import ChangeType, RowChange, diff_rows, read_snapshot, write_snapshot
+from labkey.query import compact_rows
+
+OLD = [
+    {"Key": 1, "Name": "a", "Modified": "2024-01-01"},
+    {"Key": 2, "Name": "b", "Modified": "2024-01-01"},
+    {"Key": 3, "Name": "c", "Modified": "2024-01-01"},
+]
+NEW = [
+    {"Key": 2, "Name": "b", "Modified": "2024-01-02"},
+    {"Key": 3, "Name": "C", "Modified": "2024-01-02"},
+    {"Key": 4, "Name": "d", "Modified": "2024-01-02"},
+]
+EXPECTED = [
+    RowChange(ChangeType.REMOVED, 1, old_row={"Key": 1, "Name": "a"}),
+    RowChange(ChangeType.CHANGED, 3, {"Key": 3, "Name": "c"}, {"Key": 3, "Name": "C"}),
+    RowChange(ChangeType.ADDED, 4, new_row={"Key": 4, "Name": "d"}),
+]
+
+
+@pytest.mark.parametrize("presorted", [True, False])
+def test_diff_rows(presorted):
+    changes = diff_rows(OLD, NEW, key="Key", presorted=presorted, ignore_columns=["Modified"])
+    changes = sorted(changes, key=lambda c: c.key)
+
+    assert changes == EXPECTED
+    assert changes[1].changed_columns == ["Name"]
+
+
+def test_diff_rows_compound_key():
+    old = [{"A": 1, "B": "x", "V": 1}, {"A": 1, "B": "y", "V": 1}]
+    new = [{"A": 1, "B": "x", "V": 1}, {"A": 1, "B": "y", "V": 2}]
+    changes = list(diff_rows(old, new, key=["A", "B"], partitions=2))
+
+    assert [(c.change_type, c.key) for c in changes] == [(ChangeType.CHANGED, (1, "y"))]
+
+
+def test_diff_rows_presorted_requires_sorted_input():
+    with pytest.raises(ValueError):
+        list(diff_rows(list(reversed(OLD)), NEW, key="Key", presorted=True))
+
+
+def test_diff_rows_case_insensitive_collation():
+    # Sorted the way a case-insensitive database collation sorts text
+    rows = [{"Name": "a"}, {"Name": "b"}, {"Name": "C"}]
+
+    with pytest.raises(ValueError, match="presorted=False"):
+        list(diff_rows(rows, rows, key="Name", presorted=True))
+
+    assert list(diff_rows(rows, rows, key="Name")) == []
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    rows = compact_rows([{"Key": 1, "Date": datetime.date(2024, 1, 1)}, {"Key": 2, "Date": None}])
+
+    assert write_snapshot(rows, path) == 2
+    assert list(read_snapshot(path)) == [{"Key": 1, "Date": "2024-01-01"}, {"Key": 2, "Date": None}]
+    # live rows compare equal to the same rows read back from a snapshot
+    assert list(diff_rows(read_snapshot(path), rows, key="Key", presorted=True)) == []
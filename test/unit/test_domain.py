@@ -13,25 +13,47 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import io
 import json
 import os
+import sys
 import tempfile
+import threading
+import time
 import unittest
 
 import unittest.mock as mock
 
 from labkey.domain import (
+    bulk_create,
     create,
     conditional_format,
     Domain,
+    diff_domains,
+    DriftScanner,
+    DriftStatus,
     drop,
     encode_conditional_format_filter,
+    encode_conditional_formats,
+    export_domains,
+    fingerprint,
     get,
+    get_cached,
+    get_domain_details,
+    get_domain_details_batch,
+    import_domains,
     infer_fields,
+    invalidate_cache,
+    PropertyDescriptor,
+    ProvisionStatus,
+    read_export,
     save,
+    save_changes,
 )
 from labkey.exceptions import RequestAuthorizationError
 from labkey.query import QueryFilter
+from labkey.server_context import ServerContext
+from labkey.transport import FakeResponse, FakeTransport
 
 from .utilities import (
     MockLabKey,
@@ -463,6 +485,798 @@ class TestConditionalFormatSave(unittest.TestCase):
         )
 
 
+class TestDomainCache(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.transport.add_json(
+            "GET",
+            "property-getDomainDetails.api",
+            {
+                "domainDesign": {
+                    "name": "Samples",
+                    "domainURI": "urn:lsid:labkey.com:IntList.Folder-1:Samples",
+                    "fields": [{"name": "Key", "rangeURI": "int"}],
+                },
+                "options": {"keyName": "Key"},
+            },
+        )
+        self.transport.add_json("POST", "property-saveDomain.api", {"success": True})
+        self.transport.add_json("POST", "property-deleteDomain.api", {"success": True})
+        self.transport.add_json(
+            "POST",
+            "property-createDomain.api",
+            {"name": "Samples", "domainURI": "urn:lsid:labkey.com:IntList.Folder-1:Samples"},
+        )
+        self.server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=self.transport
+        )
+
+    def fetches(self):
+        return sum(r.endpoint == "property-getDomainDetails.api" for r in self.transport.requests)
+
+    def test_cached(self):
+        domain, options = get_cached(self.server_context, "lists", "Samples")
+        cached_domain, cached_options = get_cached(self.server_context, "Lists", "samples")
+
+        self.assertIs(domain, cached_domain)
+        self.assertEqual(options, {"keyName": "Key"})
+        self.assertEqual(domain.fields[0].name, "Key")
+        self.assertEqual(self.fetches(), 1)
+
+        get_cached(self.server_context, "lists", "Samples", container_path="other")
+        self.assertEqual(self.fetches(), 2)
+
+    def test_ttl(self):
+        get_cached(self.server_context, "lists", "Samples")
+        get_cached(self.server_context, "lists", "Samples", ttl=0)
+
+        self.assertEqual(self.fetches(), 2)
+
+    def test_cache_per_server_context(self):
+        other = ServerContext("example.com", "project", disable_csrf=True, transport=self.transport)
+        get_cached(self.server_context, "lists", "Samples")
+        get_cached(other, "lists", "Samples")
+
+        self.assertEqual(self.fetches(), 2)
+
+    def test_invalidate(self):
+        get_cached(self.server_context, "lists", "Samples")
+        invalidate_cache(self.server_context, "lists", "Other")
+        get_cached(self.server_context, "lists", "Samples")
+        self.assertEqual(self.fetches(), 1)
+
+        uri = "urn:lsid:labkey.com:IntList.Folder-1:Samples"
+        invalidate_cache(self.server_context, domain_uri=uri)
+        get_cached(self.server_context, "lists", "Samples")
+        self.assertEqual(self.fetches(), 2)
+
+        invalidate_cache(self.server_context)
+        get_cached(self.server_context, "lists", "Samples")
+        self.assertEqual(self.fetches(), 3)
+
+    def test_save_create_and_drop_invalidate(self):
+        domain, _ = get_cached(self.server_context, "lists", "Samples")
+
+        for change in (
+            lambda: save(self.server_context, "lists", "Samples", domain),
+            lambda: drop(self.server_context, "lists", "Samples"),
+            lambda: create(self.server_context, {"kind": "IntList", "domainDesign": None}),
+        ):
+            fetches = self.fetches()
+            change()
+            get_cached(self.server_context, "lists", "Samples")
+            self.assertEqual(self.fetches(), fetches + 1)
+
+
+class TestSaveChanges(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.transport.add_json(
+            "GET",
+            "property-getDomainDetails.api",
+            {
+                "domainDesign": {
+                    "name": "Samples",
+                    "domainId": 1,
+                    "fields": [
+                        {"name": "Key", "propertyId": 10, "rangeURI": "int"},
+                        {
+                            "name": "Name",
+                            "propertyId": 11,
+                            "rangeURI": "string",
+                            "conditionalFormats": [
+                                {"filter": "format.column~eq=x", "backgroundColor": "FF0000"}
+                            ],
+                        },
+                        {"name": "Notes", "propertyId": 12, "rangeURI": "string"},
+                    ],
+                },
+                "options": {"keyName": "Key"},
+            },
+        )
+        self.transport.add_json("POST", "property-saveDomain.api", {"success": True})
+        self.server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=self.transport
+        )
+
+    def saves(self):
+        return [r for r in self.transport.requests if r.endpoint == "property-saveDomain.api"]
+
+    def test_unchanged_is_not_sent(self):
+        domain, options = get_domain_details(self.server_context, "lists", "Samples")
+        diff, response = save_changes(
+            self.server_context, "lists", "Samples", domain, options=options
+        )
+
+        self.assertFalse(diff)
+        self.assertIsNone(response)
+        self.assertEqual(self.saves(), [])
+
+    def test_changes_are_reported_and_sent(self):
+        domain, _ = get_domain_details(self.server_context, "lists", "Samples")
+        domain.fields[1].label = "Sample Name"
+        domain.fields[2].name = "Comments"
+        del domain.fields[0]
+        domain.add_field({"name": "Volume", "rangeURI": "double"})
+
+        diff, response = save_changes(self.server_context, "lists", "Samples", domain)
+
+        self.assertEqual(diff.added, ["Volume"])
+        self.assertEqual(diff.removed, ["Key"])
+        self.assertEqual([c.name for c in diff.changed], ["Name", "Comments"])
+        self.assertEqual(response, {"success": True})
+
+        sent = self.saves()[0].json()["domainDesign"]
+        self.assertEqual([f["name"] for f in sent["fields"]], ["Name", "Comments", "Volume"])
+
+        # The saved design is the new snapshot
+        diff, response = save_changes(self.server_context, "lists", "Samples", domain)
+        self.assertFalse(diff)
+        self.assertEqual(len(self.saves()), 1)
+
+    def test_diff_domains(self):
+        before, _ = get_domain_details(self.server_context, "lists", "Samples")
+        after, _ = get_domain_details(self.server_context, "lists", "Samples")
+        after.description = "Updated"
+        after.fields[1].label = "Sample Name"
+        after.fields.reverse()
+
+        diff = diff_domains(before, after)
+
+        self.assertEqual(diff.properties, ["description"])
+        self.assertEqual(len(diff.changed), 1)
+        self.assertEqual(diff.changed[0].changed_properties, ["label"])
+        self.assertTrue(diff.reordered)
+        self.assertEqual(diff.added, [])
+        self.assertEqual(diff.removed, [])
+
+    def test_options_and_domains_without_snapshot(self):
+        domain = Domain(
+            name="Samples",
+            domain_id=1,
+            fields=[
+                {"name": "Key", "propertyId": 10, "rangeURI": "int"},
+                {
+                    "name": "Name",
+                    "propertyId": 11,
+                    "rangeURI": "string",
+                    "conditional_formats": [
+                        {"filter": "format.column~eq=x", "background_color": "FF0000"}
+                    ],
+                },
+                {"name": "Notes", "propertyId": 12, "rangeURI": "string"},
+            ],
+        )
+
+        diff, response = save_changes(self.server_context, "lists", "Samples", domain)
+        self.assertFalse(diff)
+        self.assertEqual(self.transport.requests[-1].endpoint, "property-getDomainDetails.api")
+
+        diff, response = save_changes(
+            self.server_context, "lists", "Samples", domain, options={"keyName": "Name"}
+        )
+        self.assertTrue(diff.options_changed)
+        self.assertEqual(len(self.saves()), 1)
+
+
+class TestModels(unittest.TestCase):
+    raw_field = {
+        "name": "Key",
+        "rangeURI": "int",
+        "concept_uri": None,
+        "conceptURI": "urn:concept",
+        "lookupQuery": "Samples",
+        "conditionalFormats": [{"filter": "format.column~eq=1", "textColor": "FF0000"}],
+        "propertyValidators": [{"name": "range", "errorMessage": "Out of range"}],
+        "unknown": True,
+    }
+
+    def test_to_json(self):
+        field = PropertyDescriptor(**self.raw_field)
+
+        self.assertEqual(
+            field.to_json(),
+            {
+                "name": "Key",
+                "rangeURI": "int",
+                "lookupQuery": "Samples",
+                "conditionalFormats": [
+                    {
+                        "backgroundcolor": None,
+                        "bold": None,
+                        "filter": "format.column~eq=1",
+                        "italic": None,
+                        "strikethrough": None,
+                        "textcolor": "FF0000",
+                    }
+                ],
+                "propertyValidators": [{"name": "range", "errorMessage": "Out of range"}],
+            },
+        )
+        self.assertEqual(len(field.to_json(strip_none=False)), 44)
+
+    def test_snake_case_wins(self):
+        field = PropertyDescriptor(**self.raw_field)
+        domain = Domain(domain_id=1, domainId=2, queryName="Samples")
+
+        self.assertIsNone(field.concept_uri)
+        self.assertEqual(domain.domain_id, 1)
+        self.assertEqual(domain.query_name, "Samples")
+
+    def test_lazy_fields(self):
+        raw = {"name": "Samples", "fields": [self.raw_field, {"name": "Name"}]}
+        domain = Domain(**raw)
+
+        self.assertIsNone(domain._fields)
+
+        field = domain.fields[1]
+        self.assertIs(field._raw, raw["fields"][1])
+
+        # Values assigned before the first read are kept
+        field.label = "Sample Name"
+        self.assertEqual(field.name, "Name")
+        self.assertEqual(field.label, "Sample Name")
+        self.assertIsNone(field._raw)
+        self.assertEqual(raw["fields"][1], {"name": "Name"})
+
+        domain.add_field({"name": "Volume"})
+        self.assertEqual([f.name for f in domain.fields], ["Key", "Name", "Volume"])
+
+        with self.assertRaises(AttributeError):
+            field.not_a_property = True
+
+    def test_lazy_fields_shared_between_threads(self):
+        errors = []
+        switch_interval = sys.getswitchinterval()
+        # Switch threads as often as possible to make a race likely
+        sys.setswitchinterval(1e-6)
+
+        try:
+            for _ in range(200):
+                domain = Domain(fields=[{"name": "f{}".format(i)} for i in range(50)])
+                barrier = threading.Barrier(8)
+
+                def read():
+                    barrier.wait()
+
+                    try:
+                        for i in range(50):
+                            self.assertEqual(domain.fields[i].name, "f{}".format(i))
+                    except Exception as e:
+                        errors.append(e)
+
+                threads = [threading.Thread(target=read) for _ in range(8)]
+
+                for thread in threads:
+                    thread.start()
+
+                for thread in threads:
+                    thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        self.assertEqual(errors, [])
+
+
+class TestBulkCreate(unittest.TestCase):
+    definition = {
+        "kind": "IntList",
+        "domainDesign": {
+            "name": "Samples",
+            "fields": [
+                {"name": "Key", "rangeURI": "int"},
+                {
+                    "name": "Name",
+                    "rangeURI": "string",
+                    "conditionalFormats": [
+                        {"filter": QueryFilter("Name", "x", QueryFilter.Types.EQUAL), "bold": True}
+                    ],
+                },
+            ],
+        },
+        "options": {"keyName": "Key"},
+    }
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.transport.add_response("GET", "property-getDomainDetails.api", self.get_domain)
+        self.transport.add_response("POST", "property-createDomain.api", self.create_domain)
+        self.server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=self.transport
+        )
+
+    @staticmethod
+    def get_domain(request):
+        container = request.url.split("/")[-2]
+        fields = [
+            {"name": "Key", "propertyId": 1, "rangeURI": "http://www.w3.org/2001/XMLSchema#int"},
+            {
+                "name": "Name",
+                "propertyId": 2,
+                "rangeURI": "http://www.w3.org/2001/XMLSchema#string",
+            },
+        ]
+
+        if container == "existing":
+            return FakeResponse(200, {"domainDesign": {"name": "Samples", "fields": fields}})
+
+        if container == "different":
+            fields[1]["required"] = True
+            return FakeResponse(200, {"domainDesign": {"name": "Samples", "fields": fields}})
+
+        return FakeResponse(400, {"exception": "Could not find domain"})
+
+    @staticmethod
+    def create_domain(request):
+        if request.url.split("/")[-2] == "broken":
+            return FakeResponse(500, {"exception": "Server Error"})
+
+        return FakeResponse(200, request.json()["domainDesign"])
+
+    def test_bulk_create(self):
+        containers = ["new1", "existing", "different", "broken", "new2"]
+        results = bulk_create(
+            self.server_context, self.definition, containers, "lists", max_workers=3
+        )
+
+        self.assertEqual([r.container_path for r in results], containers)
+        self.assertEqual(
+            [r.status for r in results],
+            [
+                ProvisionStatus.CREATED,
+                ProvisionStatus.SKIPPED,
+                ProvisionStatus.CONFLICT,
+                ProvisionStatus.FAILED,
+                ProvisionStatus.CREATED,
+            ],
+        )
+        self.assertEqual(
+            results[0].domain.fields[1].conditional_formats[0].filter, "format.column~eq=x"
+        )
+        self.assertIsNotNone(results[3].error)
+
+        # The definition passed in is left as is
+        formats = self.definition["domainDesign"]["fields"][1]["conditionalFormats"]
+        self.assertIsInstance(formats[0]["filter"], QueryFilter)
+
+    def test_without_check(self):
+        results = bulk_create(self.server_context, self.definition, ["existing"])
+
+        self.assertEqual(results[0].status, ProvisionStatus.CREATED)
+        self.assertEqual(
+            [r.endpoint for r in self.transport.requests], ["property-createDomain.api"]
+        )
+
+    def test_fingerprint(self):
+        design = self.definition["domainDesign"]
+        fetched = {
+            "name": "Samples",
+            "domainId": 7,
+            "fields": [
+                {
+                    "name": "Key",
+                    "rangeURI": "http://www.w3.org/2001/XMLSchema#int",
+                    "hidden": False,
+                },
+                {"name": "Name", "rangeURI": "string", "required": False, "propertyId": 3},
+            ],
+        }
+
+        self.assertEqual(fingerprint(design), fingerprint(Domain(**fetched)))
+
+        fetched["fields"][1]["label"] = "Sample Name"
+        self.assertNotEqual(fingerprint(design), fingerprint(fetched))
+
+
+class TestDriftScanner(unittest.TestCase):
+    expected = {
+        "name": "Samples",
+        "fields": [{"name": "Key", "rangeURI": "int"}, {"name": "Name", "rangeURI": "string"}],
+    }
+
+    def setUp(self):
+        xsd = "http://www.w3.org/2001/XMLSchema#"
+        self.designs = {
+            c: {
+                "name": "Samples",
+                "fields": [
+                    {"name": "Key", "propertyId": 1, "rangeURI": xsd + "int"},
+                    {"name": "Name", "propertyId": 2, "rangeURI": xsd + "string"},
+                ],
+            }
+            for c in ("a", "b", "c")
+        }
+        self.transport = FakeTransport()
+        self.transport.add_response("GET", "property-getDomainDetails.api", self.get_domain)
+        self.server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=self.transport
+        )
+
+    def get_domain(self, request):
+        design = self.designs.get(request.url.split("/")[-2])
+
+        if design is None:
+            return FakeResponse(400, {"exception": "Could not find domain"})
+
+        return FakeResponse(200, {"domainDesign": design})
+
+    def test_scan(self):
+        scanner = DriftScanner(self.server_context, "lists", "Samples", self.expected)
+        self.designs["b"]["fields"][1]["required"] = True
+        self.designs["b"]["fields"].append({"name": "Volume", "rangeURI": "double"})
+        del self.designs["c"]
+
+        reports = scanner.scan(["a", "b", "c"])
+
+        self.assertEqual(
+            [r.status for r in reports],
+            [DriftStatus.MATCHED, DriftStatus.DRIFTED, DriftStatus.MISSING],
+        )
+        self.assertTrue(all(r.changed for r in reports))
+        self.assertIsNone(reports[0].diff)
+        self.assertEqual(reports[1].diff.added, ["Volume"])
+        self.assertEqual(reports[1].diff.changed[0].changed_properties, ["required"])
+
+        # Unchanged containers keep their previous result
+        self.designs["a"]["fields"][0]["label"] = "Key"
+        reports = scanner.scan(["a", "b", "c"])
+
+        self.assertEqual([r.changed for r in reports], [True, False, False])
+        self.assertEqual(reports[0].status, DriftStatus.DRIFTED)
+        self.assertEqual(reports[0].diff.changed[0].changed_properties, ["label"])
+        self.assertIs(reports[1].diff, scanner.results["b"].diff)
+
+    def test_failures_are_not_cached(self):
+        scanner = DriftScanner(self.server_context, "lists", "Samples", Domain(**self.expected))
+        scanner.scan(["a"])
+        self.transport.add_json("GET", "property-getDomainDetails.api", {"exception": "Down"}, 500)
+
+        report = scanner.scan(["a"])[0]
+
+        self.assertEqual(report.status, DriftStatus.FAILED)
+        self.assertIsNotNone(report.error)
+        self.assertEqual(scanner.results["a"].status, DriftStatus.MATCHED)
+
+
+class TestEncodeConditionalFormats(unittest.TestCase):
+    def fields(self):
+        low = QueryFilter("Value", 10, QueryFilter.Types.LESS_THAN)
+        high = QueryFilter("Value", 90, QueryFilter.Types.GREATER_THAN)
+        return [
+            {"name": "Key", "rangeURI": "int"},
+            {"name": "Low", "conditionalFormats": [{"filter": low, "bold": True}]},
+            {"name": "Range", "conditionalFormats": [{"filter": [low, high]}]},
+            {"name": "Encoded", "conditionalFormats": [{"filter": "format.column~eq=1"}]},
+        ]
+
+    def test_encode(self):
+        fields = self.fields()
+        encoded = encode_conditional_formats(fields)
+
+        self.assertEqual(
+            encoded[1]["conditionalFormats"], [{"filter": "format.column~lt=10", "bold": True}]
+        )
+        self.assertEqual(
+            encoded[2]["conditionalFormats"][0]["filter"],
+            "format.column~lt=10&format.column~gt=90",
+        )
+
+        # Fields without QueryFilters are passed through, the others are copies
+        self.assertIs(encoded[0], fields[0])
+        self.assertIs(encoded[3], fields[3])
+        self.assertIsInstance(fields[1]["conditionalFormats"][0]["filter"], QueryFilter)
+
+    def test_create_does_not_modify_definition(self):
+        transport = FakeTransport()
+        transport.add_json("POST", "property-createDomain.api", {"name": "Samples"})
+        server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=transport
+        )
+        definition = {
+            "kind": "IntList",
+            "domainDesign": {"name": "Samples", "fields": self.fields()},
+        }
+
+        create(server_context, definition)
+
+        sent = transport.requests[0].json()["domainDesign"]["fields"]
+        self.assertEqual(sent[1]["conditionalFormats"][0]["filter"], "format.column~lt=10")
+        self.assertIsInstance(
+            definition["domainDesign"]["fields"][1]["conditionalFormats"][0]["filter"], QueryFilter
+        )
+
+    def test_errors_are_aggregated(self):
+        query_filter = QueryFilter("Value", 1)
+        fields = [
+            {"name": "A", "conditionalFormats": [{"filter": [query_filter] * 3}]},
+            {"name": "B", "conditionalFormats": [{"filter": [query_filter, "format.column~eq=1"]}]},
+        ]
+
+        with self.assertRaises(ValueError) as e:
+            encode_conditional_formats(fields)
+
+        message = str(e.exception)
+        self.assertIn('field "A", conditional format 0: one or two QueryFilters', message)
+        self.assertIn('field "B", conditional format 0: a list of filters', message)
+
+
+class TestExportImport(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.transport.add_response("GET", "property-getDomainDetails.api", self.get_domain)
+        self.transport.add_response("POST", "property-createDomain.api", self.create_domain)
+        self.server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=self.transport
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @staticmethod
+    def get_domain(request):
+        query_name = request.params["queryName"]
+
+        if query_name == "Missing":
+            return FakeResponse(404, {"exception": "Domain not found"})
+
+        return FakeResponse(
+            200,
+            {
+                "domainKindName": "IntList",
+                "domainDesign": {
+                    "name": query_name,
+                    "domainId": 12,
+                    "domainURI": "urn:lsid:labkey.com:IntList.Folder-1:" + query_name,
+                    "fields": [{"name": "Key", "propertyId": 3, "rangeURI": "int"}],
+                },
+                "options": {"keyName": "Key"},
+            },
+        )
+
+    @staticmethod
+    def create_domain(request):
+        design = request.json()["domainDesign"]
+
+        if design["name"] == "Broken":
+            return FakeResponse(500, {"exception": "Server Error"})
+
+        return FakeResponse(200, design)
+
+    def export(self, file_name, domains):
+        path = os.path.join(self.tmp.name, file_name)
+        count = export_domains(self.server_context, domains, path, container_path="source")
+        return path, count
+
+    def test_round_trip(self):
+        path, count = self.export("domains.jsonl.gz", [("lists", "Samples"), ("lists", "Broken")])
+        self.assertEqual(count, 2)
+
+        records = list(read_export(path))
+        self.assertEqual(
+            records[0],
+            {
+                "schemaName": "lists",
+                "queryName": "Samples",
+                "kind": "IntList",
+                "domainDesign": {"name": "Samples", "fields": [{"name": "Key", "rangeURI": "int"}]},
+                "options": {"keyName": "Key"},
+            },
+        )
+
+        results = import_domains(self.server_context, path, container_path="target")
+
+        self.assertEqual(
+            [(r.query_name, r.status) for r in results],
+            [("Samples", ProvisionStatus.CREATED), ("Broken", ProvisionStatus.FAILED)],
+        )
+        self.assertEqual(results[0].domain.name, "Samples")
+
+        created = [r for r in self.transport.requests if r.endpoint == "property-createDomain.api"]
+        self.assertTrue(all("/target/" in r.url for r in created))
+        self.assertEqual(created[0].json()["kind"], "IntList")
+        self.assertEqual(created[0].json()["options"], {"keyName": "Key"})
+
+    def test_export_fails_on_error(self):
+        with self.assertRaises(Exception):
+            self.export("domains.jsonl", [("lists", "Samples"), ("lists", "Missing")])
+
+    def test_msgpack(self):
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            self.skipTest("msgpack is not installed")
+
+        path, _ = self.export("domains.msgpack.gz", [("lists", "Samples")])
+
+        self.assertEqual([r["queryName"] for r in read_export(path)], ["Samples"])
+
+
+class TestDomainDetailsBatch(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.transport.add_response("GET", "property-getDomainDetails.api", self.get_domain)
+        self.server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=self.transport
+        )
+
+    @staticmethod
+    def get_domain(request):
+        query_name = request.params["queryName"]
+
+        if request.params["domainId"] == 7:
+            query_name = "Events"
+        elif query_name == "Missing":
+            return FakeResponse(400, {"exception": "Could not find domain"})
+        elif query_name == "Slow":
+            time.sleep(0.05)
+
+        return FakeResponse(
+            200,
+            {
+                "domainDesign": {
+                    "name": query_name,
+                    "schemaName": "lists",
+                    "queryName": query_name,
+                },
+                "options": {"keyName": "Key"},
+            },
+        )
+
+    def test_batch(self):
+        keys = [
+            ("lists", "Slow"),
+            ("lists", "Samples"),
+            ("Lists", "samples"),
+            7,
+            7,
+            ("lists", "Missing"),
+        ]
+        results = list(get_domain_details_batch(self.server_context, keys, max_workers=4))
+
+        self.assertEqual(len(self.transport.requests), 4)
+        self.assertEqual(
+            {key: domain.name if domain else None for key, domain, _ in results},
+            {
+                ("lists", "Slow"): "Slow",
+                ("lists", "Samples"): "Samples",
+                7: "Events",
+                ("lists", "Missing"): None,
+            },
+        )
+        # Results are yielded as they finish
+        self.assertEqual(results[-1][0], ("lists", "Slow"))
+
+        # The cache is filled, including domains requested by id
+        get_cached(self.server_context, "lists", "Samples")
+        get_cached(self.server_context, "lists", "Events")
+        self.assertEqual(len(self.transport.requests), 4)
+
+        list(get_domain_details_batch(self.server_context, [("lists", "Samples")], ttl=60))
+        self.assertEqual(len(self.transport.requests), 4)
+
+    def test_results_are_not_shared_with_cache(self):
+        [(_, domain, options)] = get_domain_details_batch(
+            self.server_context, [("lists", "Samples")]
+        )
+        domain.name = "Changed"
+        domain.add_field({"name": "Added"})
+        options["keyName"] = "Changed"
+
+        cached, cached_options = get_cached(self.server_context, "lists", "Samples")
+        self.assertIsNot(cached, domain)
+        self.assertEqual(cached.name, "Samples")
+        self.assertEqual(cached.fields, [])
+        self.assertEqual(cached_options, {"keyName": "Key"})
+
+        [(_, again, _)] = get_domain_details_batch(
+            self.server_context, [("lists", "Samples")], ttl=60
+        )
+        self.assertEqual(len(self.transport.requests), 1)
+        self.assertIsNot(again, cached)
+        again.add_field({"name": "Added"})
+        self.assertEqual(cached.fields, [])
+
+    def test_cached_response_without_design(self):
+        self.transport.add_json("GET", "property-getDomainDetails.api", {"options": {}})
+        get_cached(self.server_context, "lists", "Samples")
+
+        results = list(
+            get_domain_details_batch(self.server_context, [("lists", "Samples")], ttl=60)
+        )
+
+        self.assertEqual(results, [(("lists", "Samples"), None, {})])
+        self.assertEqual(len(self.transport.requests), 1)
+
+    def test_errors_are_raised(self):
+        self.transport.add_json("GET", "property-getDomainDetails.api", {"exception": "Down"}, 500)
+
+        with self.assertRaises(Exception):
+            list(get_domain_details_batch(self.server_context, [("lists", "Samples")]))
+
+
+class TestInferFieldsHead(unittest.TestCase):
+    def setUp(self):
+        self.uploads = []
+        self.transport = FakeTransport()
+        self.transport.add_response("POST", "property-inferDomain.api", self.infer)
+        self.server_context = ServerContext(
+            "example.com", "project", disable_csrf=True, transport=self.transport
+        )
+
+        self.fd, self.path = tempfile.mkstemp(suffix=".tsv")
+        with os.fdopen(self.fd, "w") as tmp:
+            tmp.write("Name\tAge\nNick\t32\nBrian\t27\nSusan\t45\n")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def infer(self, request):
+        name, window = request.files["inferfile"]
+        self.uploads.append((name, window.read()))
+        return FakeResponse(200, {"fields": [{"name": "Name"}, {"name": "Age"}]})
+
+    def test_max_lines(self):
+        fields = infer_fields(self.server_context, self.path, max_lines=2)
+
+        self.assertEqual([f.name for f in fields], ["Name", "Age"])
+        self.assertEqual(self.uploads, [(os.path.basename(self.path), b"Name\tAge\nNick\t32\n")])
+
+    def test_max_bytes_ends_at_line(self):
+        with open(self.path, "rb") as f:
+            infer_fields(self.server_context, f, max_bytes=20)
+
+        # The third data line would have been cut off
+        self.assertEqual(self.uploads[0][1], b"Name\tAge\nNick\t32\n")
+
+    def test_text_file(self):
+        with open(self.path) as f:
+            infer_fields(self.server_context, f, max_bytes=1000, max_lines=3)
+
+        self.assertEqual(self.uploads[0][1], b"Name\tAge\nNick\t32\nBrian\t27\n")
+
+    def test_whole_file_fits(self):
+        infer_fields(self.server_context, self.path, max_bytes=1000)
+
+        self.assertEqual(self.uploads[0][1], b"Name\tAge\nNick\t32\nBrian\t27\nSusan\t45\n")
+
+    def test_excel_files_are_rejected(self):
+        with self.assertRaises(ValueError):
+            infer_fields(self.server_context, "samples.xlsx", max_lines=10)
+
+        # Detected by content when the file has no name
+        with self.assertRaises(ValueError):
+            infer_fields(self.server_context, io.BytesIO(b"PK\x03\x04\x14\x00\n"), max_lines=10)
+
+        self.assertEqual(self.transport.requests, [])
+
+    def test_header_longer_than_max_bytes(self):
+        with self.assertRaises(ValueError):
+            infer_fields(self.server_context, self.path, max_bytes=5)
+
+        self.assertEqual(self.transport.requests, [])
+
+
 def suite():
     load_tests = unittest.TestLoader().loadTestsFromTestCase
     return unittest.TestSuite(
@@ -474,6 +1288,15 @@ def suite():
             load_tests(TestSave),
             load_tests(TestConditionalFormatCreate),
             load_tests(TestConditionalFormatSave),
+            load_tests(TestDomainCache),
+            load_tests(TestSaveChanges),
+            load_tests(TestModels),
+            load_tests(TestBulkCreate),
+            load_tests(TestDriftScanner),
+            load_tests(TestEncodeConditionalFormats),
+            load_tests(TestExportImport),
+            load_tests(TestDomainDetailsBatch),
+            load_tests(TestInferFieldsHead),
         ]
     )
 
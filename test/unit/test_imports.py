@@ -0,0 +1,90 @@
+import subprocess
+import sys
+
+# Modules that must not be loaded just by importing APIWrapper. They are imported when an APIWrapper is created or an
+# API is first used.
+DEFERRED_MODULES = {
+    "requests",
+    "labkey.server_context",
+    "labkey.container",
+    "labkey.domain",
+    "labkey.experiment",
+    "labkey.query",
+    "labkey.security",
+    "labkey.storage",
+}
+
+
+def imported_modules(statement: str) -> set:
+    """
+    Runs statement in a fresh interpreter and returns the names of the modules loaded afterwards.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", statement + "\nimport sys\nprint('\\n'.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.splitlines())
+
+
+def import_times(statement: str) -> dict:
+    """
+    Runs statement in a fresh interpreter with python -X importtime and returns the cumulative import time in
+    microseconds of each module it loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            times[parts[2].strip()] = int(parts[1])
+
+    return times
+
+
+def test_import_api_wrapper_is_lazy():
+    modules = imported_modules("from labkey.api_wrapper import APIWrapper")
+
+    assert "labkey.api_wrapper" in modules
+    assert DEFERRED_MODULES.isdisjoint(modules), DEFERRED_MODULES & set(modules)
+
+
+def test_import_api_wrapper_is_fast():
+    times = import_times("from labkey.api_wrapper import APIWrapper")
+    requests_time = import_times("import requests")["requests"]
+
+    assert DEFERRED_MODULES.isdisjoint(times), DEFERRED_MODULES & set(times)
+    # Importing requests alone takes tens of milliseconds, APIWrapper should stay well below that
+    assert times["labkey.api_wrapper"] < requests_time / 4, (
+        times["labkey.api_wrapper"],
+        requests_time,
+    )
+
+
+def test_api_modules_load_on_first_use():
+    modules = imported_modules(
+        "from labkey.api_wrapper import APIWrapper\n"
+        "api = APIWrapper('example.com', 'project')\n"
+        "api.query\n"
+    )
+
+    assert "labkey.server_context" in modules
+    assert "labkey.query" in modules
+    assert "labkey.domain" not in modules
+    assert "labkey.experiment" not in modules
+
+
+def test_submodules_load_on_attribute_access():
+    import labkey
+
+    assert labkey.query.select_rows is not None
+    assert "query" in dir(labkey)
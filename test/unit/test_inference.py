@@ -0,0 +1,94 @@
+import io
+
+import pytest
+
+from labkey.inference import RangeURI, infer_fields
+
+TSV = (
+    "Id\tWeight\tDrawn\tFasted\tNotes\tEmpty\tCode\n"
+    "1\t10.5\t2024-01-05\ttrue\tfirst\t\t007\n"
+    "2\t11\t2024-01-06 13:45\tno\tsecond sample\t\t008\n"
+    "3\t\t2024-02-29\tYES\t\t\tA1\n"
+)
+
+
+def types(fields):
+    return {f.name: f.range_uri for f in fields}
+
+
+def test_infer_tsv(tmp_path):
+    path = tmp_path / "samples.tsv"
+    path.write_text(TSV)
+
+    fields = infer_fields(path)
+
+    assert types(fields) == {
+        "Id": RangeURI.INT,
+        "Weight": RangeURI.DOUBLE,
+        "Drawn": RangeURI.DATE_TIME,
+        "Fasted": RangeURI.BOOLEAN,
+        "Notes": RangeURI.STRING,
+        "Empty": RangeURI.STRING,
+        "Code": RangeURI.STRING,
+    }
+    assert fields[4].scale == len("second sample")
+    assert fields[5].scale is None
+    assert fields[0].to_json() == {
+        "name": "Id",
+        "rangeURI": RangeURI.INT,
+        "conditionalFormats": [],
+        "propertyValidators": [],
+    }
+
+
+def test_infer_csv_file_objects():
+    data = 'Id,Amount,Label\n1,2.5e3,"a, b"\n2147483648,3,c\n'
+    binary = io.BytesIO(data.encode("utf-8"))
+
+    assert types(infer_fields(binary)) == {
+        "Id": RangeURI.DOUBLE,
+        "Amount": RangeURI.DOUBLE,
+        "Label": RangeURI.STRING,
+    }
+    # The caller's file is left open
+    assert not binary.closed
+
+    assert types(infer_fields(io.StringIO(data), file_format="csv"))["Label"] == RangeURI.STRING
+
+
+def test_sample_size():
+    data = "Value\n" + "1\n" * 5 + "N/A\n"
+
+    assert infer_fields(io.StringIO(data), sample_size=5)[0].range_uri == RangeURI.INT
+    assert infer_fields(io.StringIO(data), sample_size=None)[0].range_uri == RangeURI.STRING
+
+
+def test_unnamed_columns_and_empty_file():
+    assert [f.name for f in infer_fields(io.StringIO("A\t\tC\n1\t2\t3\n"))] == ["A", "column1", "C"]
+    assert infer_fields(io.StringIO("")) == []
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        infer_fields(tmp_path / "samples.xls")
+
+
+def test_infer_excel(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    from datetime import datetime
+
+    path = tmp_path / "samples.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Id", "Weight", "Drawn", "Fasted", "Notes"])
+    sheet.append([1, 10.5, datetime(2024, 1, 5), True, "first"])
+    sheet.append([2, 11, datetime(2024, 1, 6), False, "second"])
+    workbook.save(path)
+
+    assert types(infer_fields(path)) == {
+        "Id": RangeURI.INT,
+        "Weight": RangeURI.DOUBLE,
+        "Drawn": RangeURI.DATE_TIME,
+        "Fasted": RangeURI.BOOLEAN,
+        "Notes": RangeURI.STRING,
+    }
@@ -0,0 +1,111 @@
+from datetime import timedelta
+import unittest.mock as mock
+
+import pytest
+
+from labkey.exceptions import RequestError, ServerContextError
+from labkey.instrumentation import LatencyHistogram, RequestEvent, RequestListener
+from labkey.server_context import ServerContext
+from requests.exceptions import ConnectionError
+
+
+class RecordingListener(RequestListener):
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, event):
+        self.calls.append(("before_request", event))
+
+    def after_response(self, event):
+        self.calls.append(("after_response", event))
+
+    def on_error(self, event):
+        self.calls.append(("on_error", event))
+
+
+def mock_response(status_code=200, body=b'{"rows": []}'):
+    response = mock.Mock()
+    response.status_code = status_code
+    response.content = body
+    response.elapsed = timedelta(seconds=0)
+    response.json.return_value = {"rows": []}
+    return response
+
+
+@pytest.fixture
+def server_context():
+    return ServerContext("example.com", "test_container", "test_context_path", disable_csrf=True)
+
+
+def test_request_event_endpoint():
+    event = RequestEvent("https://example.com/labkey/home/query-getQuery.api?x=1", "POST")
+
+    assert event.controller == "query"
+    assert event.action == "getQuery.api"
+    assert event.endpoint == "query-getQuery.api"
+
+
+def test_listener_after_response(server_context):
+    listener = RecordingListener()
+    server_context.add_request_listener(listener)
+    url = server_context.build_url("query", "insertRows.api")
+
+    with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+        mock_post.return_value = mock_response()
+        server_context.make_request(url, json={"rows": [1, 2]})
+
+    assert [name for name, _ in listener.calls] == ["before_request", "after_response"]
+    event = listener.calls[1][1]
+    assert event.endpoint == "query-insertRows.api"
+    assert event.payload_size == len('{"rows": [1, 2]}')
+    assert event.response_size == len(b'{"rows": []}')
+    assert event.status_code == 200
+    assert event.retry_count == 0
+    assert event.elapsed >= 0
+    assert event.ttfb == 0
+    assert event.download_time == event.elapsed
+
+
+def test_listener_on_error(server_context):
+    listener = RecordingListener()
+    server_context.add_request_listener(listener)
+    url = server_context.build_url("query", "getQuery.api")
+
+    with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+        mock_post.return_value = mock_response(500)
+        with pytest.raises(RequestError):
+            server_context.make_request(url, {"schemaName": "lists"})
+
+        mock_post.side_effect = ConnectionError()
+        with pytest.raises(ServerContextError):
+            server_context.make_request(url, {"schemaName": "lists"})
+
+    errors = [event for name, event in listener.calls if name == "on_error"]
+    assert [e.status_code for e in errors] == [500, None]
+    assert isinstance(errors[1].exception, ConnectionError)
+    assert errors[0].payload_size == len("schemaName=lists")
+
+    server_context.remove_request_listener(listener)
+    assert server_context._listeners == []
+
+
+def test_latency_histogram(server_context):
+    histogram = LatencyHistogram(buckets=(1, 10))
+    server_context.add_request_listener(histogram)
+    url = server_context.build_url("query", "getQuery.api")
+
+    with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+        mock_post.return_value = mock_response()
+        for _ in range(3):
+            server_context.make_request(url, {})
+        mock_post.return_value = mock_response(500)
+        with pytest.raises(RequestError):
+            server_context.make_request(url, {})
+
+    stats = histogram.summary()["query-getQuery.api"]
+    assert stats["count"] == 4
+    assert stats["errors"] == 1
+    assert stats["p95"] == 1
+
+    histogram.reset()
+    assert histogram.summary() == {}
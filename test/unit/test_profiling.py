@@ -0,0 +1,89 @@
+import pstats
+import unittest.mock as mock
+
+import pytest
+
+from labkey.domain import Domain, get
+from labkey.profiling import profile
+from labkey.server_context import ServerContext
+
+
+@pytest.fixture
+def server_context():
+    return ServerContext("example.com", "test_container", "test_context_path", disable_csrf=True)
+
+
+def mock_response(body):
+    response = mock.Mock()
+    response.status_code = 200
+    response.json.return_value = body
+    return response
+
+
+def test_profile_phases(server_context):
+    raw_domain = {"name": "Samples", "fields": [{"name": "Field{}".format(i)} for i in range(50)]}
+
+    with mock.patch("labkey.transport.requests.Session.get") as mock_get:
+        mock_get.return_value = mock_response(raw_domain)
+
+        with profile(server_context) as profiler:
+            domain = get(server_context, "lists", "Samples")
+
+    assert isinstance(domain, Domain)
+    assert server_context._profiler is None
+    assert len(profiler.calls) == 1
+
+    call = profiler.calls[0]
+    assert call.endpoint == "property-getDomain.api"
+    assert call.encode == 0
+    assert call.transfer > 0
+    assert call.decode > 0
+    assert call.construct > 0
+    assert call.total == pytest.approx(call.transfer + call.decode + call.construct)
+
+    summary = profiler.summary()["property-getDomain.api"]
+    assert summary["calls"] == 1
+    assert summary["construct"] == call.construct
+
+    table = profiler.format_summary().splitlines()
+    assert table[0].split() == [
+        "endpoint",
+        "calls",
+        "encode",
+        "transfer",
+        "decode",
+        "construct",
+        "total",
+    ]
+    assert table[2].startswith("property-getDomain.api")
+
+
+def test_profile_encode(server_context):
+    url = server_context.build_url("query", "insertRows.api")
+
+    with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+        mock_post.return_value = mock_response({})
+
+        with profile(server_context) as profiler:
+            server_context.make_request(url, json={"rows": [{"a": i} for i in range(100)]})
+
+    assert profiler.calls[0].encode > 0
+
+
+def test_profile_cprofile_dump(server_context, tmp_path):
+    url = server_context.build_url("query", "getQuery.api")
+
+    with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+        mock_post.return_value = mock_response({})
+
+        with profile(server_context, sampler="cprofile") as profiler:
+            server_context.make_request(url, {})
+
+    path = str(tmp_path / "labkey.prof")
+    profiler.dump(path)
+    assert pstats.Stats(path).total_calls > 0
+
+
+def test_profile_invalid_sampler(server_context):
+    with pytest.raises(ValueError):
+        profile(server_context, sampler="unknown")
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import json
 import unittest
 
 import unittest.mock as mock
@@ -23,7 +24,17 @@ from labkey.query import (
     insert_rows,
     select_rows,
     execute_sql,
+    CompactRow,
+    compact_rows,
+    iter_rows,
+    project_columns,
+    track_column_usage,
+    QueryBatcher,
     QueryFilter,
+    save_rows,
+    InsertRowsCommand,
+    DeleteRowsCommand,
+    MoveRowsCommand,
 )
 from labkey.exceptions import (
     RequestError,
@@ -57,6 +68,10 @@ class MockUpdateRows(MockLabKey):
     api = "updateRows.api"
 
 
+class MockSaveRows(MockLabKey):
+    api = "saveRows.api"
+
+
 schema = "testSchema"
 query = "testQuery"
 
@@ -455,6 +470,323 @@ class TestSelectRows(unittest.TestCase):
         )
 
 
+class TestCompactRows(unittest.TestCase):
+    def test_dict_like_access(self):
+        rows = compact_rows([{"Name": "a", "Age": 1}, {"Name": "b", "Age": None}])
+
+        self.assertIsInstance(rows[0], CompactRow)
+        self.assertEqual(rows[0]["Name"], "a")
+        self.assertEqual(rows[1].get("Age", 5), None)
+        self.assertEqual(rows[1].get("Missing", 5), 5)
+        self.assertEqual(list(rows[0].keys()), ["Name", "Age"])
+        self.assertEqual(rows[0], {"Name": "a", "Age": 1})
+        self.assertEqual(dict(rows[1]), {"Name": "b", "Age": None})
+        self.assertIn("Age", rows[0])
+        with self.assertRaises(KeyError):
+            rows[0]["Missing"]
+
+    def test_rows_share_column_index(self):
+        rows = compact_rows([{"Name": "a"}, {"Name": "b"}, {"Other": "c"}])
+
+        self.assertIs(rows[0]._index, rows[1]._index)
+        self.assertIsNot(rows[0]._index, rows[2]._index)
+        self.assertFalse(hasattr(rows[0], "__dict__"))
+
+    def test_select_rows_compact(self):
+        service = MockSelectRows()
+        response = service.get_successful_response()
+        response.json.return_value = {"rowCount": 1, "rows": [{"Participant ID": 133428}]}
+
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.return_value = response
+            result = select_rows(mock_server_context(service), schema, query, compact_rows=True)
+
+        self.assertIsInstance(result["rows"][0], CompactRow)
+        self.assertEqual(result["rows"][0]["Participant ID"], 133428)
+
+    def test_compact_rows_round_trip(self):
+        service = MockSelectRows()
+        response = service.get_successful_response()
+        response.json.return_value = {"rowCount": 1, "rows": [{"Key": 1, "Name": "A"}]}
+        server_context = mock_server_context(service)
+
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.return_value = response
+            rows = select_rows(server_context, schema, query, compact_rows=True)["rows"]
+            delete_rows(server_context, schema, query, rows)
+
+            self.assertEqual(
+                json.loads(mock_post.call_args.kwargs["data"])["rows"], [{"Key": 1, "Name": "A"}]
+            )
+
+
+class TestIterRows(unittest.TestCase):
+    def test_pages(self):
+        service = MockSelectRows()
+        pages = [[{"Key": 1}, {"Key": 2}], [{"Key": 3}]]
+
+        def page(url, data=None, headers=None, timeout=None):
+            response = service.get_successful_response()
+            response.json.return_value = {"rows": pages[data["query.offset"] // 2]}
+            return response
+
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.side_effect = page
+            rows = list(
+                iter_rows(mock_server_context(service), schema, query, page_size=2, sort="Key")
+            )
+
+            self.assertEqual(rows, [{"Key": 1}, {"Key": 2}, {"Key": 3}])
+            self.assertEqual(mock_post.call_count, 2)
+            data = mock_post.call_args.kwargs["data"]
+            self.assertEqual(data["query.maxRows"], 2)
+            self.assertEqual(data["query.offset"], 2)
+            self.assertEqual(data["query.sort"], "Key")
+            self.assertFalse(data["includeMetadata"])
+
+
+class TestProjectColumns(unittest.TestCase):
+    details = {
+        ("lists", "Samples"): {
+            "columns": [
+                {"name": "Name"},
+                {"name": "CreatedBy", "lookup": {"schemaName": "core", "queryName": "Users"}},
+            ]
+        },
+        ("core", "Users"): {
+            "columns": [
+                {"name": "Email"},
+                {"name": "DisplayName"},
+                {"name": "Avatar", "hidden": True},
+            ]
+        },
+    }
+
+    def setUp(self):
+        self.server_context = mock_server_context(MockSelectRows())
+
+    def _details(self, url, params=None, headers=None, timeout=None):
+        response = mock.Mock()
+        response.status_code = 200
+        response.json.return_value = self.details[(params["schemaName"], params["queryName"])]
+        return response
+
+    def test_validates_and_expands(self):
+        with mock.patch("labkey.transport.requests.Session.get") as mock_get:
+            mock_get.side_effect = self._details
+            columns = project_columns(
+                self.server_context, "lists", "Samples", ["name", "createdby/email", "CreatedBy/*"]
+            )
+
+            self.assertEqual(columns, "Name,CreatedBy/Email,CreatedBy/DisplayName")
+
+            # metadata is cached per server context
+            project_columns(self.server_context, "lists", "Samples", "Name")
+            self.assertEqual(mock_get.call_count, 2)
+
+    def test_refresh_loads_each_query_once(self):
+        with mock.patch("labkey.transport.requests.Session.get") as mock_get:
+            mock_get.side_effect = self._details
+            project_columns(self.server_context, "lists", "Samples", "Name")
+            project_columns(
+                self.server_context,
+                "lists",
+                "Samples",
+                ["Name", "CreatedBy", "CreatedBy/Email", "CreatedBy/DisplayName"],
+                refresh=True,
+            )
+
+            self.assertEqual(mock_get.call_count, 3)
+
+    def test_invalid_columns(self):
+        with mock.patch("labkey.transport.requests.Session.get") as mock_get:
+            mock_get.side_effect = self._details
+
+            with self.assertRaises(ValueError) as context:
+                project_columns(self.server_context, "lists", "Samples", "Nme,Name/Email")
+
+            self.assertIn('no column "Nme"', str(context.exception))
+            self.assertIn('"Name" is not a lookup column', str(context.exception))
+
+    def test_select_rows_column_list(self):
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.return_value = MockSelectRows().get_successful_response()
+            select_rows(self.server_context, schema, query, columns=["Name", "CreatedBy/Email"])
+
+            self.assertEqual(
+                mock_post.call_args.kwargs["data"]["query.columns"], "Name,CreatedBy/Email"
+            )
+
+
+class TestColumnUsage(unittest.TestCase):
+    def test_report_and_warning(self):
+        response = {"rows": [{"a": 1, "b": 2, "c": 3}, {"a": 4, "b": 5, "c": 6}]}
+        usage = track_column_usage(response)
+
+        total = sum(row["a"] for row in response["rows"])
+
+        self.assertEqual(total, 5)
+        self.assertEqual(usage.report(), {"returned": 3, "read": 1, "unread": ["b", "c"]})
+        with self.assertWarns(ResourceWarning):
+            self.assertTrue(usage.warn_if_unused())
+        self.assertFalse(usage.warn_if_unused(max_unread_ratio=0.9))
+
+
+class TestSaveRows(unittest.TestCase):
+    def setUp(self):
+        self.service = MockSaveRows()
+
+        commands = [
+            InsertRowsCommand(schema, "parent", [{"id": 1}]),
+            MoveRowsCommand(
+                "other/folder", schema, "child", [{"id": 2}], audit_user_comment="moved"
+            ),
+            DeleteRowsCommand(schema, "child", [{"id": 3}]),
+        ]
+        payload = {
+            "commands": [
+                {
+                    "auditBehavior": "DETAILED",
+                    "command": "insert",
+                    "queryName": "parent",
+                    "rows": [{"id": 1}],
+                    "schemaName": schema,
+                },
+                {
+                    "auditBehavior": "DETAILED",
+                    "auditUserComment": "moved",
+                    "command": "move",
+                    "queryName": "child",
+                    "rows": [{"id": 2}],
+                    "schemaName": schema,
+                    "targetContainerPath": "other/folder",
+                },
+                {
+                    "auditBehavior": "DETAILED",
+                    "command": "delete",
+                    "queryName": "child",
+                    "rows": [{"id": 3}],
+                    "schemaName": schema,
+                },
+            ],
+            "validateOnly": True,
+        }
+
+        self.expected_kwargs = {
+            "expected_args": [self.service.get_server_url()],
+            "data": json.dumps(payload, sort_keys=True),
+            "headers": {"Content-Type": "application/json"},
+            "timeout": 300,
+        }
+
+        self.args = [mock_server_context(self.service), commands, None, True, True, "DETAILED"]
+
+    def test_success(self):
+        test = self
+        success_test(
+            test,
+            self.service.get_successful_response(),
+            save_rows,
+            True,
+            *self.args,
+            **self.expected_kwargs
+        )
+
+    def test_unauthorized(self):
+        test = self
+        throws_error_test(
+            test,
+            RequestAuthorizationError,
+            self.service.get_unauthorized_response(),
+            save_rows,
+            *self.args,
+            **self.expected_kwargs
+        )
+
+    def test_rejects_non_commands(self):
+        with self.assertRaises(Exception):
+            save_rows(mock_server_context(self.service), [{"command": "insert"}])
+
+
+class TestQueryBatcher(unittest.TestCase):
+    def setUp(self):
+        self.service = MockUpdateRows()
+        self.server_context = mock_server_context(self.service)
+
+    @staticmethod
+    def _echo_rows(url, data=None, headers=None, timeout=None):
+        # Mimic the server by returning the submitted rows
+        rows = json.loads(data)["rows"]
+        response = mock.Mock()
+        response.status_code = 200
+        response.json.return_value = {"rows": rows, "rowsAffected": len(rows)}
+        return response
+
+    def test_combines_calls_per_query(self):
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.side_effect = self._echo_rows
+
+            with QueryBatcher(self.server_context) as batch:
+                first = batch.update_rows(schema, query, [{"id": 1}, {"id": 2}])
+                second = batch.update_rows(schema, query, [{"id": 3}])
+                other = batch.insert_rows(schema, "otherQuery", [{"id": 4}])
+                self.assertFalse(first.done())
+
+            self.assertEqual(mock_post.call_count, 2)
+            self.assertEqual(first.result()["rows"], [{"id": 1}, {"id": 2}])
+            self.assertEqual(first.result()["rowsAffected"], 2)
+            self.assertEqual(second.result()["rows"], [{"id": 3}])
+            self.assertEqual(other.result()["rows"], [{"id": 4}])
+
+            urls = sorted(call.args[0] for call in mock_post.call_args_list)
+            self.assertTrue(urls[0].endswith("query-insertRows.api"))
+            self.assertTrue(urls[1].endswith("query-updateRows.api"))
+
+    def test_flushes_at_max_rows(self):
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.side_effect = self._echo_rows
+            batch = QueryBatcher(self.server_context, max_rows=2)
+            first = batch.delete_rows(schema, query, [{"id": 1}])
+            self.assertEqual(mock_post.call_count, 0)
+            second = batch.delete_rows(schema, query, [{"id": 2}])
+
+            self.assertEqual(mock_post.call_count, 1)
+            self.assertEqual(first.result()["rows"], [{"id": 1}])
+            self.assertEqual(second.result()["rows"], [{"id": 2}])
+
+    def test_use_save_rows(self):
+        def save_rows_response(url, data=None, headers=None, timeout=None):
+            commands = json.loads(data)["commands"]
+            response = mock.Mock()
+            response.status_code = 200
+            response.json.return_value = {
+                "committed": True,
+                "result": [{"command": c["command"], "rows": c["rows"]} for c in commands],
+            }
+            return response
+
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.side_effect = save_rows_response
+
+            with QueryBatcher(self.server_context, use_save_rows=True) as batch:
+                parent = batch.insert_rows(schema, "parent", [{"id": 1}])
+                child = batch.insert_rows(schema, "child", [{"id": 2}, {"id": 3}])
+
+            mock_post.assert_called_once()
+            self.assertTrue(mock_post.call_args.args[0].endswith("query-saveRows.api"))
+            self.assertEqual(parent.result()["rows"], [{"id": 1}])
+            self.assertEqual(child.result()["rows"], [{"id": 2}, {"id": 3}])
+
+    def test_error_is_set_on_futures(self):
+        with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+            mock_post.return_value = self.service.get_unauthorized_response()
+
+            with QueryBatcher(self.server_context) as batch:
+                future = batch.update_rows(schema, query, [{"id": 1}])
+
+            self.assertIsInstance(future.exception(), RequestAuthorizationError)
+
+
 def suite():
     load_tests = unittest.TestLoader().loadTestsFromTestCase
     return unittest.TestSuite(
@@ -464,6 +796,12 @@ def suite():
             load_tests(TestInsertRows),
             load_tests(TestExecuteSQL),
             load_tests(TestSelectRows),
+            load_tests(TestCompactRows),
+            load_tests(TestIterRows),
+            load_tests(TestProjectColumns),
+            load_tests(TestColumnUsage),
+            load_tests(TestSaveRows),
+            load_tests(TestQueryBatcher),
         ]
     )
 
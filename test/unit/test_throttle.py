@@ -0,0 +1,190 @@
+import threading
+import time
+
+import pytest
+
+from labkey.exceptions import ServerContextError
+from labkey.instrumentation import RequestEvent
+from labkey.server_context import ServerContext
+from labkey.throttle import Limit, Throttle
+from labkey.transport import FakeResponse, FakeTransport
+
+
+def throttled_context(throttle, *responses, endpoint="query-getQuery.api"):
+    transport = FakeTransport()
+    transport.add_response("POST", endpoint, *(responses or [FakeResponse(body={"rows": []})]))
+    server_context = ServerContext(
+        "example.com", "test_container", disable_csrf=True, transport=transport, throttle=throttle
+    )
+    return server_context, server_context.build_url(*endpoint.split("-", 1))
+
+
+def test_limit_validation():
+    with pytest.raises(ValueError):
+        Limit(rate=0)
+
+    with pytest.raises(ValueError):
+        Limit(max_in_flight=0)
+
+    assert Limit(rate=20).burst == 20
+    assert Limit(rate=0.5).burst == 1
+
+
+def test_most_specific_limit_wins():
+    throttle = Throttle(
+        default=Limit(rate=100),
+        limits={"query": Limit(rate=10), "query-executeSql.api": Limit(rate=1)},
+    )
+
+    for url in (
+        "https://example.com/home/query-executeSql.api",
+        "https://example.com/home/query-getQuery.api",
+        "https://example.com/home/assay-saveAssayBatch.api",
+    ):
+        event = RequestEvent(url, "POST")
+        throttle.before_request(event)
+        event.elapsed = 0.01
+        throttle.after_response(event)
+
+    assert {key: stats["rate"] for key, stats in throttle.stats().items()} == {
+        "query-executeSql.api": 1,
+        "query": 10,
+        None: 100,
+    }
+
+
+def test_unlimited_without_default():
+    throttle = Throttle(limits={"query-executeSql.api": Limit(rate=1)})
+    server_context, url = throttled_context(throttle)
+
+    for _ in range(5):
+        server_context.make_request(url, json={})
+
+    assert throttle.stats() == {}
+
+
+def test_rate_limit():
+    throttle = Throttle(default=Limit(rate=50, burst=1))
+    server_context, url = throttled_context(throttle)
+    started = time.monotonic()
+
+    for _ in range(6):
+        server_context.make_request(url, json={})
+
+    # The first request uses the burst, the other five wait 1/50th of a second each
+    assert time.monotonic() - started >= 0.09
+
+
+def test_max_in_flight():
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def respond(request):
+        with lock:
+            in_flight.append(request)
+            peak.append(len(in_flight))
+
+        time.sleep(0.01)
+
+        with lock:
+            in_flight.remove(request)
+
+        return FakeResponse(body={"rows": []})
+
+    throttle = Throttle(default=Limit(max_in_flight=2))
+    server_context, url = throttled_context(throttle, respond)
+    threads = [threading.Thread(target=server_context.make_request, args=(url,)) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(peak) == 8
+    assert max(peak) == 2
+    assert throttle.stats()[None]["in_flight"] == 0
+
+
+def test_backoff_and_recovery():
+    throttle = Throttle(default=Limit(rate=100, max_in_flight=8), cooldown=0)
+    server_context, url = throttled_context(
+        throttle,
+        FakeResponse(503, {"exception": "Service Unavailable"}),
+        FakeResponse(503, {"exception": "Service Unavailable"}),
+        FakeResponse(body={"rows": []}),
+    )
+
+    for _ in range(2):
+        with pytest.raises(ServerContextError):
+            server_context.make_request(url)
+
+    stats = throttle.stats()[None]
+    assert stats["factor"] == 0.25
+    assert stats["rate"] == 25
+    assert stats["max_in_flight"] == 2
+
+    for _ in range(5):
+        server_context.make_request(url)
+
+    assert throttle.stats()[None]["factor"] == pytest.approx(0.5)
+
+
+def test_backoff_once_per_cooldown():
+    throttle = Throttle(default=Limit(max_in_flight=4), cooldown=60)
+    server_context, url = throttled_context(
+        throttle, FakeResponse(502, {"exception": "Bad Gateway"})
+    )
+
+    for _ in range(3):
+        with pytest.raises(ServerContextError):
+            server_context.make_request(url)
+
+    assert throttle.stats()[None]["factor"] == 0.5
+
+
+def test_slow_responses_back_off():
+    throttle = Throttle(default=Limit(max_in_flight=4), target_latency=0.001, cooldown=0)
+
+    def slow(request):
+        time.sleep(0.005)
+        return FakeResponse(body={"rows": []})
+
+    server_context, url = throttled_context(throttle, slow)
+    server_context.make_request(url)
+
+    assert throttle.stats()[None]["factor"] == 0.5
+
+
+def test_slot_released_on_unexpected_errors():
+    def broken(request):
+        raise RuntimeError("event loop is closed")
+
+    class FailingListener:
+        def before_request(self, event):
+            raise RuntimeError("listener failed")
+
+        def after_response(self, event):
+            pass
+
+        def on_error(self, event):
+            pass
+
+    throttle = Throttle(default=Limit(max_in_flight=1))
+    server_context, url = throttled_context(throttle, broken)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="event loop"):
+            server_context.make_request(url)
+
+    assert throttle.stats()[None]["in_flight"] == 0
+
+    server_context, url = throttled_context(throttle)
+    server_context.add_request_listener(FailingListener())
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="listener"):
+            server_context.make_request(url)
+
+    assert throttle.stats()[None]["in_flight"] == 0
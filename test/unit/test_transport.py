@@ -0,0 +1,330 @@
+import asyncio
+import json
+import unittest.mock as mock
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from labkey.exceptions import QueryNotFoundError, RequestError, ServerContextError
+from labkey.query import select_rows
+from labkey.server_context import ServerContext
+from labkey.transport import (
+    FakeResponse,
+    FakeTransport,
+    RecordingTransport,
+    RequestsTransport,
+    Transport,
+)
+
+try:
+    import httpx
+    import h2
+except ImportError:
+    httpx = None
+
+requires_httpx = pytest.mark.skipif(httpx is None, reason="httpx[http2] is not installed")
+
+
+def fake_context(transport, **kwargs):
+    return ServerContext(
+        "example.com", "test_container", "test_context_path", transport=transport, **kwargs
+    )
+
+
+def test_default_transport():
+    server_context = ServerContext("example.com", "test_container", use_ssl=True, verify_ssl=False)
+
+    assert isinstance(server_context._transport, RequestsTransport)
+    assert server_context._transport.session.verify is False
+    assert server_context._transport.headers["User-Agent"].startswith("LabKey Python API/")
+
+
+def test_requests_transport_uses_session():
+    transport = RequestsTransport()
+
+    with mock.patch("labkey.transport.requests.Session.post") as mock_post:
+        transport.request("POST", "https://example.com/", data="{}", headers={"a": "b"}, timeout=30)
+
+    mock_post.assert_called_once_with(
+        "https://example.com/", data="{}", headers={"a": "b"}, timeout=30
+    )
+
+
+def test_fake_transport_select_rows():
+    transport = FakeTransport()
+    transport.add_json("POST", "query-getQuery.api", {"rows": [{"Key": 1}], "rowCount": 1})
+    server_context = fake_context(transport, api_key="secret")
+
+    result = select_rows(server_context, "lists", "Samples", max_rows=10)
+
+    assert result["rows"] == [{"Key": 1}]
+    assert [r.endpoint for r in transport.requests] == ["login-whoami.api", "query-getQuery.api"]
+    request = transport.requests[1]
+    assert request.data["query.maxRows"] == 10
+    assert transport.headers["apikey"] == "secret"
+    assert transport.headers["X-LABKEY-CSRF"] == "fake-csrf-token"
+
+
+def test_fake_transport_response_sequence():
+    transport = FakeTransport()
+    transport.add_response(
+        "POST",
+        "query-insertRows.api",
+        FakeResponse(500, {"exception": "Deadlock"}),
+        lambda request: FakeResponse(body={"rowsAffected": len(request.json()["rows"])}),
+    )
+    server_context = fake_context(transport, disable_csrf=True)
+    url = server_context.build_url("query", "insertRows.api")
+
+    with pytest.raises(ServerContextError) as e:
+        server_context.make_request(url, json={"rows": [{}, {}]})
+
+    assert e.value.exception.message == "500: Deadlock"
+    assert server_context.make_request(url, json={"rows": [{}, {}]}) == {"rowsAffected": 2}
+    assert server_context.make_request(url, json={"rows": [{}]}) == {"rowsAffected": 1}
+
+
+def test_fake_transport_unknown_endpoint():
+    server_context = fake_context(FakeTransport(), disable_csrf=True)
+
+    with pytest.raises(QueryNotFoundError):
+        server_context.make_request(server_context.build_url("query", "missing.api"))
+
+
+def test_recording_round_trip(tmp_path):
+    path = str(tmp_path / "recording.jsonl")
+    source = FakeTransport()
+    source.add_json("GET", "query-getQueryDetails.api", {"name": "Samples"})
+    server_context = fake_context(RecordingTransport(source, path))
+    url = server_context.build_url("query", "getQueryDetails.api")
+    server_context.make_request(url, {"queryName": "Samples"}, method="GET")
+
+    replay = fake_context(FakeTransport.from_recording(path))
+
+    assert replay.make_request(url, method="GET") == {"name": "Samples"}
+
+
+def test_recording_binary_response(tmp_path):
+    path = str(tmp_path / "recording.jsonl")
+    content = bytes(range(256))
+    source = FakeTransport()
+    source.add_response("GET", "core-download.api", FakeResponse(content=content))
+    url = fake_context(source).build_url("core", "download.api")
+    RecordingTransport(source, path).request("GET", url)
+
+    replay = FakeTransport.from_recording(path)
+
+    assert replay.request("GET", url).content == content
+
+
+def test_transport_requires_request():
+    with pytest.raises(TypeError):
+        Transport()
+
+
+def mock_transport(responses):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        response = responses[request.url.path.rsplit("/", 1)[-1]]
+
+        if isinstance(response, Exception):
+            raise response
+
+        return response
+
+    return httpx.MockTransport(handler), requests
+
+
+@requires_httpx
+def test_http2_option():
+    from labkey.transport import HttpxTransport
+
+    server_context = ServerContext("example.com", "test_container", http2=True)
+
+    assert isinstance(server_context._transport, HttpxTransport)
+    assert server_context._transport.headers["User-Agent"].startswith("LabKey Python API/")
+
+
+@requires_httpx
+def test_httpx_transport_request():
+    from labkey.transport import HttpxTransport
+
+    mock, requests = mock_transport(
+        {
+            "login-whoami.api": httpx.Response(200, json={"CSRF": "token"}),
+            "query-insertRows.api": httpx.Response(200, json={"rowsAffected": 1}),
+            "query-getQueryDetails.api": httpx.Response(200, json={"columns": []}),
+            "query-selectRows.api": httpx.Response(200, json={"rows": []}),
+        }
+    )
+    server_context = fake_context(HttpxTransport(http2=True, transport=mock), api_key="secret")
+
+    assert server_context.make_request(
+        server_context.build_url("query", "insertRows.api"), json={"rows": [{"a": 1}]}
+    ) == {"rowsAffected": 1}
+    server_context.make_request(
+        server_context.build_url("query", "getQueryDetails.api"),
+        {"queryName": "Samples"},
+        method="GET",
+    )
+    server_context.make_request(
+        server_context.build_url("query", "selectRows.api"), {"schemaName": "lists"}
+    )
+
+    csrf_request, insert, details, select = requests
+    assert csrf_request.method == "GET"
+    assert insert.headers["apikey"] == "secret"
+    assert insert.headers["X-LABKEY-CSRF"] == "token"
+    assert insert.headers["Content-Type"] == "application/json"
+    assert json.loads(insert.content) == {"rows": [{"a": 1}]}
+    assert dict(details.url.params) == {"queryName": "Samples"}
+    assert select.content == b"schemaName=lists"
+
+
+@requires_httpx
+def test_httpx_error_mapping():
+    from labkey.transport import HttpxTransport
+
+    mock, _ = mock_transport(
+        {
+            "query-notFound.api": httpx.Response(404, json={"exception": "Query not found"}),
+            "query-error.api": httpx.Response(500, json={"exception": "Server failure"}),
+            "query-offline.api": httpx.ConnectError("Connection refused"),
+            "query-slow.api": httpx.ReadTimeout("timed out"),
+        }
+    )
+    server_context = fake_context(HttpxTransport(transport=mock), disable_csrf=True)
+
+    with pytest.raises(QueryNotFoundError):
+        server_context.make_request(server_context.build_url("query", "notFound.api"))
+
+    # Like with requests, other error responses are wrapped in a ServerContextError
+    with pytest.raises(ServerContextError) as e:
+        server_context.make_request(server_context.build_url("query", "error.api"))
+
+    assert isinstance(e.value.exception, RequestError)
+    assert e.value.exception.message == "500: Server failure"
+
+    with pytest.raises(ServerContextError) as e:
+        server_context.make_request(server_context.build_url("query", "offline.api"))
+
+    assert e.value.message.startswith("Failed to connect to server.")
+
+    with pytest.raises(ServerContextError) as e:
+        server_context.make_request(server_context.build_url("query", "slow.api"))
+
+    assert e.value.message == "timed out"
+
+
+def query_values(url):
+    return form_values(urlsplit(url).query)
+
+
+def form_values(encoded):
+    # Empty values are kept, they are sent to the server too
+    return parse_qs(encoded, keep_blank_values=True)
+
+
+class CaptureAdapter(requests.adapters.BaseAdapter):
+    """
+    Records the requests a requests.Session would send, and answers them with an empty JSON object.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@requires_httpx
+def test_httpx_sends_what_requests_sends():
+    from labkey.transport import HttpxTransport
+
+    adapter = CaptureAdapter()
+    session = requests.Session()
+    session.mount("https://", adapter)
+    mock, sent = mock_transport(
+        {
+            "property-getDomainDetails.api": httpx.Response(200, json={}),
+            "query-selectRows.api": httpx.Response(200, json={}),
+        }
+    )
+    params = {"schemaName": "lists", "queryName": "Samples", "domainId": None, "domainKind": None}
+    form = {"schemaName": "lists", "query.maxRows": None, "query.columns": "Name"}
+
+    for transport in (RequestsTransport(session), HttpxTransport(transport=mock)):
+        server_context = fake_context(transport, disable_csrf=True)
+        server_context.make_request(
+            server_context.build_url("property", "getDomainDetails.api"), params, method="GET"
+        )
+        server_context.make_request(server_context.build_url("query", "selectRows.api"), form)
+
+    (requests_get, requests_post), (httpx_get, httpx_post) = adapter.requests, sent
+    assert query_values(str(httpx_get.url)) == query_values(requests_get.url)
+    assert query_values(requests_get.url) == {"schemaName": ["lists"], "queryName": ["Samples"]}
+    assert form_values(httpx_post.content.decode()) == form_values(requests_post.body)
+    assert form_values(requests_post.body) == {"schemaName": ["lists"], "query.columns": ["Name"]}
+
+
+@requires_httpx
+def test_httpx_follows_redirects():
+    from labkey.transport import AsyncHttpxTransport, HttpxTransport
+
+    def handler(request):
+        if request.url.scheme == "http":
+            return httpx.Response(
+                302, headers={"Location": str(request.url.copy_with(scheme="https"))}
+            )
+
+        return httpx.Response(200, json={"rows": []})
+
+    url = "http://example.com/home/query-selectRows.api"
+
+    with HttpxTransport(transport=httpx.MockTransport(handler)) as transport:
+        assert transport.request("GET", url).json() == {"rows": []}
+
+    with AsyncHttpxTransport(transport=httpx.MockTransport(handler)) as transport:
+        assert transport.request("GET", url).json() == {"rows": []}
+
+
+@requires_httpx
+def test_httpx_timeout_tuple():
+    from labkey.transport import HttpxTransport
+
+    transport = HttpxTransport(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    request = transport.request("GET", "https://example.com/", timeout=(3.05, 60)).request
+
+    assert request.extensions["timeout"] == {"connect": 3.05, "read": 60, "write": 60, "pool": 60}
+
+
+@requires_httpx
+def test_async_transport():
+    from labkey.transport import AsyncHttpxTransport
+
+    mock, _ = mock_transport({"query-selectRows.api": httpx.Response(200, json={"rows": []})})
+
+    with AsyncHttpxTransport(transport=mock) as transport:
+        server_context = fake_context(transport, disable_csrf=True)
+        url = server_context.build_url("query", "selectRows.api")
+
+        assert server_context.make_request(url, json={}) == {"rows": []}
+
+        futures = [transport.submit("POST", url, data="{}") for _ in range(10)]
+        assert [f.result().status_code for f in futures] == [200] * 10
+
+        response = asyncio.run(transport.request_async("POST", url, data="{}"))
+        assert response.json() == {"rows": []}